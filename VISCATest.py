@@ -8,35 +8,26 @@ def wait(s):
 		print(i)
 		sleep(1)
 
-def processSerialInput(serial):
-	if (serial.in_waiting > 0):
-		readbytes = serial.read(serial.in_waiting)
-		inputs = readbytes.split(bytes([0xFF]))
-		for input in inputs:
-			if (len(input) > 0):
-				s = ""
-				address = (list(input)[:1][0] - 0x80) >> 4
-				response = list(input)[1:]
-				if (response == [0x60, 0x02]):
-					s = "Syntax error"
-				elif (response == [0x61, 0x41]):
-					s = "Command not executable"
-				elif (response == [0x41]):
-					#s = "Command accepted"
-					pass
-				elif (response == [0x51]):
-					#s = "Command completed"
-					pass
-				else:
-					s = str([hex(c) for c in response])
-				if (s != ""):
-					print("RESPONSE (camera " + str(address) + "): " + s)
+def processResponse(address, response):
+	s = ""
+	if (response == [0x60, 0x02]):
+		s = "Syntax error"
+	elif (response == [0x61, 0x41]):
+		s = "Command not executable"
+	elif (response == [0x41]):
+		#s = "Command accepted"
+		pass
+	elif (response == [0x51]):
+		#s = "Command completed"
+		pass
+	else:
+		s = str([hex(c) for c in response])
+	if (s != ""):
+		print("RESPONSE (camera " + str(address) + "): " + s)
 
 SCREEN_WIDTH, SCREEN_HEIGHT = 640, 480
 
 quitNow = False
-cameraMoving = False
-cameraZooming = False
 cameraFocusing = False
 lastSettingsCheck = 0
 menuOn = False
@@ -47,6 +38,7 @@ print("Initializing stuff")
 cam = visca.Camera('/dev/tty.usbserial', 38400)
 
 cam.debug_mode=False
+cam.add_listener(processResponse)
 
 print(cam.getVersionInfo())
 
@@ -94,9 +86,6 @@ print("Starting main loop")
 while (not quitNow):
 	sleep(0.1)
 
-	# get serial input
-	processSerialInput(cam._serial)
-	
 	# get input
 	keys = pygame.key.get_pressed()
 	mods = pygame.key.get_mods()
@@ -117,61 +106,11 @@ while (not quitNow):
 			moveSpeed = 0x07
 			zoomSpeed = 0x03
 
-		# Handle movement keys (handled separately because we need to know when they're released, and they have unique combinations)
-		arrowKeys = [keys[pygame.K_UP], keys[pygame.K_DOWN], keys[pygame.K_RIGHT], keys[pygame.K_LEFT]]
-		if (arrowKeys == [True, False, False, False]):
-			#Up only
-			cam.move_up(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [False, True, False, False]):
-			#Down only
-			cam.move_down(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [False, False, True, False]):
-			#Right only
-			cam.move_right(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [False, False, False, True]):
-			#Left only
-			cam.move_left(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [True, False, True, False]):
-			#Up-right
-			cam.move_upright(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [True, False, False, True]):
-			#Up-left
-			cam.move_upleft(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [False, True, True, False]):
-			#Down-right
-			cam.move_downright(moveSpeed)
-			cameraMoving = True
-		elif (arrowKeys == [False, True, False, True]):
-			#Down-left
-			cam.move_downleft(moveSpeed)
-			cameraMoving = True
-		else:
-			#No movement or invalid combination
-			if (cameraMoving):
-				cam.move_stop()
-				cameraMoving = False
-
-		# Handle zooming (handled separately because we need to know when they're released)
-		if (keys[pygame.K_EQUALS] or keys[pygame.K_KP_PLUS]):
-			# zoom in
-			if (not cameraZooming):
-				cam.zoom_in(zoomSpeed)
-				cameraZooming = True
-		elif (keys[pygame.K_MINUS] or keys[pygame.K_KP_MINUS]):
-			# zoom out
-			if (not cameraZooming):
-				cam.zoom_out(zoomSpeed)
-				cameraZooming = True         
-		else:
-			if (cameraZooming):
-				cam.zoom_stop()
-				cameraZooming = False
+		# Handle movement and zoom keys, the motion controller only sends changes and stops as soon as they're released
+		pan = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * moveSpeed
+		tilt = (keys[pygame.K_UP] - keys[pygame.K_DOWN]) * moveSpeed
+		zoom = ((keys[pygame.K_EQUALS] or keys[pygame.K_KP_PLUS]) - (keys[pygame.K_MINUS] or keys[pygame.K_KP_MINUS])) * zoomSpeed
+		cam.motion.set(pan=pan, tilt=tilt, zoom=zoom)
 
 		# Handle focusing (handled separately because we need to know when they're released)
 		if (keys[pygame.K_RIGHTBRACKET]):
@@ -441,4 +380,5 @@ while (not quitNow):
 #end main while loop
 
 print("Quitting normally")
+cam.close()
 pygame.quit()
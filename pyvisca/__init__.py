@@ -1,2 +1,20 @@
 from .visca import Camera
+from .bus import Bus
+from .aio import AsyncCamera, AsyncBus
+from .engine import Engine, SelectorBus
+from .cache import StateCache
+from .metrics import Metrics, Histogram
+from .capture import Capture, CaptureFile, Record, replay
+from .remote import DaemonConnection, RemoteCamera
+from .motion import MotionController
+from .telemetry import Telemetry, Sample
+from .tour import Tour, Waypoint, Leg
+from .presets import PresetBank, Preset
+from .group import CameraGroup
+from .fleet import Fleet, Outcome
+from .calibration import Calibration, Table
+from .capabilities import CapabilityRegistry, Capabilities
+from .simulator import SimulatedCamera, SimulatedClock, SimulatedTransport, SimulatedPort, SimulatedIPCamera
+from .pipeline import Command, VISCAError
+from .transport import SerialTransport, VISCAOverIP, UDPTransport
 name = "pyvisca"
\ No newline at end of file
@@ -0,0 +1,172 @@
+import asyncio
+from time import monotonic
+from .visca import Camera
+from .bus import Bus
+from .pipeline import VISCAError
+
+class AsyncBus(Bus):
+	"""Bus read by a reader callback on the transport's file descriptor instead of a thread"""
+
+	# The port is only read when the loop says it is readable, so never block
+	READ_TIMEOUT = 0
+
+	def __init__(self, port=None, baudrate=None, transport=None, loop=None):
+		"""Opens the serial port at baudrate (or uses the given transport); await
+		discover() to number the cameras on it"""
+		self._loop = loop if loop else asyncio.get_running_loop()
+		super().__init__(port, baudrate, transport, discover=False)
+
+	def _start(self):
+		"""Registers a reader for the transport with the event loop"""
+		self._loop.add_reader(self._transport.fileno(), self._onreadable)
+
+	def _onreadable(self):
+		try:
+			readbytes = self._transport.read()
+		except (OSError, TypeError):
+			self.close()
+			return
+		self._feed(readbytes)
+
+	async def discover(self, timeout=1):
+		try:
+			reply = await asyncio.wait_for(asyncio.wrap_future(self._sendbroadcast(self.ADDRESSSET)), timeout)
+		except asyncio.TimeoutError:
+			reply = None
+		if (self._discovered(reply) > 0):
+			try:
+				await asyncio.wait_for(asyncio.wrap_future(self._sendbroadcast(self.IFCLEAR)), timeout)
+			except asyncio.TimeoutError:
+				pass
+		return self.count
+
+	def close(self):
+		"""Removes the reader from the event loop and closes the transport"""
+		self._loop.remove_reader(self._transport.fileno())
+		self._abort(VISCAError(VISCAError.TIMEOUT))
+		self._transport.close()
+		self.capture(None)
+
+class _LoopTimer:
+	"""A call_later() asked for from outside the loop's thread, cancellable from any thread"""
+
+	def __init__(self, loop, delay, callback):
+		self._loop = loop
+		self._handle = None
+		self._cancelled = False
+		loop.call_soon_threadsafe(self._start, delay, callback)
+
+	def _start(self, delay, callback):
+		if (not self._cancelled):
+			self._handle = self._loop.call_later(delay, callback)
+
+	def _stop(self):
+		if (self._handle != None):
+			self._handle.cancel()
+
+	def cancel(self):
+		self._cancelled = True
+		self._loop.call_soon_threadsafe(self._stop)
+
+class AsyncCamera(Camera):
+	"""Camera driven by an asyncio event loop instead of a background thread
+
+	Replies are read by a reader callback on the transport's file descriptor,
+	so one loop can drive any number of cameras. Every inquiry property, and
+	get_pantilt() and getVersionInfo(), returns an awaitable:
+
+		wb = await cam.white_balance
+
+	Command methods return the same Command handle as Camera, which can be
+	awaited for the command's completion. Property setters are available as
+	awaitable set_<name>() methods. Must be created while the loop is running,
+	unless the loop is passed in. Cameras sharing a daisy chain share an AsyncBus.
+	"""
+
+	def __init__(self, port=None, baudrate=None, address=1, pan_bytes=4, tilt_bytes=4, debugmode=False, transport=None, bus=None, loop=None):
+		self._loop = loop if loop else asyncio.get_running_loop()
+		self._timer = None
+		super().__init__(port, baudrate, address, pan_bytes, tilt_bytes, debugmode, transport, bus)
+
+	def _openbus(self, port, baudrate, transport):
+		return AsyncBus(port, baudrate, transport, self._loop)
+
+	def _onloop(self):
+		"""Whether the caller is on the loop's thread (submitting from MotionController, Tour
+		or Fleet threads isn't)"""
+		try:
+			return (asyncio.get_running_loop() is self._loop)
+		except RuntimeError:
+			return False
+
+	def _pump(self):
+		"""Writes the next queued frame and schedules a wakeup for the pipeline's next deadline"""
+		super()._pump()
+		if (self._onloop()):
+			self._reschedule()
+		else:
+			self._loop.call_soon_threadsafe(self._rescheduled)
+
+	def _reschedule(self):
+		"""Moves the wakeup to the pipeline's next deadline (call on the loop with the lock held)"""
+		if (self._timer != None):
+			self._timer.cancel()
+			self._timer = None
+		deadline = self._pipeline.deadline()
+		if (deadline != None):
+			self._timer = self._loop.call_later(max(0, deadline - monotonic()), self._expire)
+
+	def _rescheduled(self):
+		with self._lock:
+			self._reschedule()
+
+	def _after(self, delay, callback):
+		if (self._onloop()):
+			return self._loop.call_later(delay, callback)
+		return _LoopTimer(self._loop, delay, callback)
+
+	async def _query(self, name, timeout=2):
+		found, value = self._fromcache(name)
+		if (found):
+			return value
+		frame, inquiry = self._codec.inquiries[name]
+		return self._decode(name, await self._reply(self._submit(frame, True, timeout, name=name)))
+
+	async def _reply(self, handle):
+		try:
+			return await handle
+		except VISCAError as e:
+			self._dp("%s", e)
+			return None
+
+	async def _inquiremany(self, names, rejected=None):
+		handles = [self._submit(self._codec.inquiries[name][0], True, name=name) for name in names]
+		replies = await asyncio.gather(*[self._reply(handle) for handle in handles])
+		self._rejected(names, handles, rejected)
+		return dict((name, self._decode(name, reply)) for name, reply in zip(names, replies))
+
+	async def snapshot(self, blocks=True):
+		if (blocks) and (self._camerablock != False):
+			rejected = set()
+			snapshot = self._decodesnapshot(await self._inquiremany(self.SNAPSHOT_BLOCK_INQUIRIES, rejected), rejected)
+			if (snapshot != None):
+				return snapshot
+		return self._decodesnapshot(await self._inquiremany(self.SNAPSHOT_INQUIRIES))
+
+	def close(self):
+		"""Detaches from the bus, closing it if the camera opened it"""
+		if (self._timer != None):
+			self._timer.cancel()
+			self._timer = None
+		super().close()
+
+def _setter(prop):
+	def setter(self, value):
+		return prop.fset(self, value)
+	return setter
+
+# Awaitable equivalents of Camera's property setters
+for _name in ("picture_effect", "white_balance", "red_gain", "blue_gain", "ae_mode", "freeze", "preset_freeze",
+		"pan_reverse", "tilt_reverse", "power_on", "autofocus", "image_flip", "preset", "tally_on", "widescreen",
+		"shutter", "iris", "gain", "brightness", "exp", "aperture", "backlight"):
+	setattr(AsyncCamera, "set_" + _name, _setter(getattr(Camera, _name)))
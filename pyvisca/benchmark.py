@@ -0,0 +1,191 @@
+"""Benchmarks of pyvisca against a simulated camera, run with python -m pyvisca.benchmark
+
+Measures command throughput, inquiry latency percentiles and CPU time per
+command at several baud rates, plus microbenchmarks of the codec and frame
+parser, and writes the results as JSON (see --help) to compare across releases.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+from time import perf_counter, process_time
+from timeit import timeit
+from .visca import Camera
+from .codec import Codec, Nibbles, Lookup
+from .parser import FrameParser
+from .simulator import SimulatedCamera, SimulatedTransport, SimulatedPort
+
+def _listencode(address, pan, tilt):
+	"""Builds a move_to frame the way Camera used to, from lists"""
+	def split(v, n=4):
+		r = []
+		for i in range(0, n):
+			r = [(v >> (4 * i) & 0x0f)] + r
+		return r
+	return bytes([0x80 + address] + [0x01, 0x06, 0x02, 7, 7] + split(pan, 4) + split(tilt, 4) + [0xff])
+
+def _listdecode(ret):
+	"""Decodes a value inquiry reply the way Camera used to, with 16 ** n"""
+	if (ret == None) or (ret[0] != 0x50):
+		return 0
+	v = ret[3:5]
+	r = 0
+	n = len(v)
+	for i in range(0, n):
+		r += v[i] * 16 ** (n - i - 1)
+	return r
+
+def _listenum(ret, enum):
+	if (ret != None) and (len(ret) == 2) and (ret[0] == 0x50):
+		for member in enum:
+			if (ret[1] == member):
+				return member
+	return 0
+
+def codec(number=100000):
+	"""Times encoding a move_to frame and decoding value and mode replies, returns
+	a dict of microseconds per call for the list-based and table-driven versions
+
+	encode_template is a memo hit, encode_template_fresh a miss patching the
+	template, which is no faster than encode_list: the memo is the gain.
+	"""
+	move_to = Codec.compile(Camera.COMMANDS, Camera.INQUIRIES, 1, 4, 4).commands["move_to"]
+	value = Nibbles(3, 2)
+	mode = Lookup(Camera.WhiteBalance)
+	reply = [0x50, 0x00, 0x00, 0x01, 0x02]
+	modereply = [0x50, 0x05]
+	results = {
+		"encode_list": timeit(lambda: _listencode(1, 0x1234, -16), number=number),
+		"encode_template": timeit(lambda: move_to.encode(7, 7, 0x1234, -16), number=number),
+		"encode_template_fresh": timeit(lambda: (move_to._encoded.clear(), move_to.encode(7, 7, 0x1234, -16)), number=number),
+		"decode_value_list": timeit(lambda: _listdecode(reply), number=number),
+		"decode_value_table": timeit(lambda: value(reply), number=number),
+		"decode_enum_list": timeit(lambda: _listenum(modereply, Camera.WhiteBalance), number=number),
+		"decode_enum_table": timeit(lambda: mode(modereply), number=number),
+	}
+	return dict((name, 1e6 * seconds / number) for name, seconds in results.items())
+
+def _splitfeed(buffer, readbytes):
+	"""Splits reads into frames the way Bus used to, returns the frames and the leftover partial frame"""
+	frames = (buffer + readbytes).split(bytes([0xFF]))
+	return frames, frames.pop()
+
+def parser(count=20000, chunk=64):
+	"""Times splitting a stream of count acknowledge/completion/inquiry replies read
+	chunk bytes at a time, returns a dict of frames per second"""
+	replies = [bytes([0x90, 0x41, 0xFF]), bytes([0x90, 0x51, 0xFF]), bytes([0x90, 0x50, 0x00, 0x00, 0x01, 0x02, 0xFF])]
+	stream = b"".join(replies[i % len(replies)] for i in range(count))
+	chunks = [stream[i:i + chunk] for i in range(0, len(stream), chunk)]
+	def split():
+		buffer = b""
+		for readbytes in chunks:
+			frames, buffer = _splitfeed(buffer, readbytes)
+	def parse():
+		frameparser = FrameParser()
+		for readbytes in chunks:
+			frameparser.feed(readbytes)
+	return {
+		"split_frames_per_second": count / timeit(split, number=1),
+		"parser_frames_per_second": count / timeit(parse, number=1),
+	}
+
+# Inquiries that are read through a method rather than a property
+INQUIRY_METHODS = {"pantilt": "get_pantilt", "zoom_position": "get_zoom_position",
+	"focus_position": "get_focus_position", "version": "getVersionInfo"}
+
+def _open(transport, baudrate):
+	"""Opens a Camera on a fresh simulated camera, returns (camera, simulator)"""
+	if (transport == "pty"):
+		simulator = SimulatedPort(SimulatedCamera(), baudrate=baudrate)
+		return Camera(simulator.port, baudrate if baudrate else 115200), simulator
+	simulator = SimulatedTransport(SimulatedCamera(), baudrate=baudrate)
+	return Camera(transport=simulator), simulator
+
+def _percentiles(samples):
+	cuts = statistics.quantiles(samples, n=100, method="inclusive")
+	return {"p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000, "mean": statistics.mean(samples) * 1000}
+
+def throughput(camera, count=200):
+	"""Times count motion commands and count setter calls from submission to completion,
+	returns commands per second and CPU milliseconds per command for each"""
+	results = {}
+	calls = {
+		"motion": lambda i: camera.move_left(1 + i % 0x18) if (i % 2 == 0) else camera.move_stop(),
+		"setter": lambda i: Camera.red_gain.fset(camera, i & 0xFF),
+	}
+	for name, call in calls.items():
+		started = perf_counter()
+		cpu = process_time()
+		handles = [call(i) for i in range(count)]
+		for handle in handles:
+			handle.wait(10)
+		elapsed = perf_counter() - started
+		results[name] = {
+			"commands_per_second": count / elapsed,
+			"cpu_ms_per_command": 1000 * (process_time() - cpu) / count,
+			"failed": sum(1 for handle in handles if (not handle.wait(0))),
+		}
+	return results
+
+def latency(camera, samples=100):
+	"""Times each inquiry samples times, returns its latency percentiles in milliseconds"""
+	results = {}
+	for name in Camera.INQUIRIES:
+		if (name == "camera_block"):
+			continue
+		if (name in INQUIRY_METHODS):
+			read = getattr(camera, INQUIRY_METHODS[name])
+		else:
+			read = lambda: getattr(camera, name)
+		times = []
+		for i in range(samples):
+			started = perf_counter()
+			read()
+			times.append(perf_counter() - started)
+		results[INQUIRY_METHODS.get(name, name)] = _percentiles(times)
+	return results
+
+def run(transport="memory", baudrates=(9600, 38400, 115200, None), count=200, samples=100):
+	"""Runs every benchmark, returns the results as a dict ready for JSON"""
+	results = {
+		"python": sys.version.split()[0],
+		"platform": platform.platform(),
+		"machine": platform.machine(),
+		"transport": transport,
+		"note": "CPU time is the whole process, simulator included",
+		"codec_us": codec(),
+		"parser": parser(),
+		"baudrates": {},
+	}
+	for baudrate in baudrates:
+		camera, simulator = _open(transport, baudrate)
+		try:
+			results["baudrates"][str(baudrate) if baudrate else "unlimited"] = {
+				"throughput": throughput(camera, count),
+				"latency_ms": latency(camera, samples),
+			}
+		finally:
+			camera.close()
+			simulator.close()
+	return results
+
+def main(argv=None):
+	arguments = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	arguments.add_argument("--output", "-o", help="file to write the JSON results to (default: standard output)")
+	arguments.add_argument("--transport", choices=("memory", "pty"), default="memory", help="how to reach the simulated camera")
+	arguments.add_argument("--baudrates", default="9600,38400,115200,0", help="comma separated, 0 for no baud rate emulation")
+	arguments.add_argument("--count", type=int, default=200, help="commands per throughput run")
+	arguments.add_argument("--samples", type=int, default=100, help="readings of each inquiry")
+	options = arguments.parse_args(argv)
+	baudrates = [int(baudrate) or None for baudrate in options.baudrates.split(",")]
+	results = run(options.transport, baudrates, options.count, options.samples)
+	text = json.dumps(results, indent=2, default=float)
+	if (options.output):
+		with open(options.output, "w") as output:
+			output.write(text + "\n")
+	else:
+		print(text)
+
+if (__name__ == "__main__"):
+	main()
@@ -0,0 +1,192 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from .pipeline import VISCAError
+from .transport import SerialTransport
+from .parser import FrameParser
+from .capture import Capture
+
+log = logging.getLogger("pyvisca")
+
+class Bus:
+	"""A port shared by a daisy chain of up to 7 cameras
+
+	The bus owns the transport and the background thread reading it, and hands
+	each reply to the Camera with the address it came from. Create cameras on
+	it with Camera(bus=bus, address=n); discover() numbers the chain first.
+	"""
+
+	ADDRESSSET = [0x88, 0x30, 0x01, 0xFF]
+	IFCLEAR = [0x88, 0x01, 0x00, 0x01, 0xFF]
+	BROADCAST = 0x88
+	MAX_CAMERAS = 7
+
+	# How long the background reader blocks on the port before checking for shutdown
+	READ_TIMEOUT = 0.1
+
+	def __init__(self, port=None, baudrate=None, transport=None, discover=True):
+		"""Opens the serial port at baudrate (or uses the given transport) and, unless
+		discover is False, numbers the cameras on it"""
+		if (transport == None):
+			transport = SerialTransport(port, baudrate, self.READ_TIMEOUT)
+		self._transport = transport
+		self._writelock = threading.Lock()
+		self._cameras = {} # address -> Camera
+		self._listeners = []
+		self.parser = FrameParser()
+		self._broadcasts = deque() # futures for broadcast frames yet to come back round the chain, oldest first
+		self._capture = None # Capture recording the port's traffic, if any
+		self.count = 0
+		self._start()
+		if (discover):
+			self.discover()
+
+	def _start(self):
+		"""Starts the background thread that reads replies from the transport"""
+		self._running = True
+		self._reader = threading.Thread(target=self._readloop, name="visca-reader", daemon=True)
+		self._reader.start()
+
+	def _readloop(self):
+		"""Reads from the transport in the background and dispatches each complete frame
+
+		Anything a camera or listener raises is logged rather than let end the
+		thread; if it ends anyway, everything waiting on the bus is failed.
+		"""
+		try:
+			while (self._running):
+				try:
+					readbytes = self._transport.read()
+				except (OSError, TypeError):
+					break # port was closed underneath us
+				self._feed(readbytes)
+				for camera in list(self._cameras.values()):
+					try:
+						camera._expire()
+					except Exception:
+						log.exception("Error expiring commands for camera %d", camera.camera_address)
+		finally:
+			self._abort(VISCAError(VISCAError.TIMEOUT))
+
+	def _abort(self, error):
+		"""Fails everything queued for the cameras on the bus and any broadcast awaiting its echo"""
+		for camera in list(self._cameras.values()):
+			camera._abort(error)
+		while (len(self._broadcasts) > 0):
+			self._broadcasts.popleft().cancel()
+
+	def _feed(self, readbytes):
+		"""Passes bytes read from the transport through the parser and dispatches each complete frame"""
+		if (len(readbytes) == 0):
+			return
+		capture = self._capture
+		if (capture != None):
+			capture.record(Capture.IN, readbytes)
+		for frame in self.parser.feed(readbytes):
+			try:
+				self._dispatch(frame)
+			except Exception:
+				log.exception("Error handling frame %s", frame.hex(" "))
+
+	def _dispatch(self, frame):
+		"""Hands a received frame to the camera it came from"""
+		address = (frame[0] - 0x80) >> 4
+		response = list(frame[1:])
+		for listener in list(self._listeners):
+			try:
+				listener(address, response)
+			except Exception:
+				log.exception("Error in bus listener %r", listener)
+		if (frame[0] == self.BROADCAST):
+			while (len(self._broadcasts) > 0):
+				broadcast = self._broadcasts.popleft()
+				if (not broadcast.done()):
+					broadcast.set_result(response)
+					break
+			return
+		camera = self._cameras.get(address)
+		if (camera != None):
+			camera._receive(response)
+
+	def _sendbroadcast(self, frame):
+		"""Writes a broadcast frame, returns a future for the broadcast reply that comes back round
+		the chain (cancel it if giving up on the reply, so it isn't given the next one)"""
+		broadcast = Future()
+		self._broadcasts.append(broadcast)
+		self.write(bytes(frame))
+		return broadcast
+
+	def _discovered(self, reply):
+		"""Records the camera count from an address-set reply (88 30 0w FF, w being one past the last address)"""
+		if (reply != None) and (len(reply) > 1) and (reply[0] == 0x30):
+			self.count = min(reply[1] - 1, self.MAX_CAMERAS)
+		else:
+			self.count = 0
+		return self.count
+
+	def discover(self, timeout=1):
+		"""Numbers the cameras on the chain 1, 2, ... with the address-set broadcast, clears
+		their command buffers and returns how many cameras there are"""
+		broadcast = self._sendbroadcast(self.ADDRESSSET)
+		try:
+			reply = broadcast.result(timeout)
+		except FutureTimeoutError:
+			broadcast.cancel()
+			reply = None
+		if (self._discovered(reply) > 0):
+			broadcast = self._sendbroadcast(self.IFCLEAR)
+			try:
+				broadcast.result(timeout)
+			except FutureTimeoutError:
+				broadcast.cancel()
+		return self.count
+
+	@property
+	def byterate(self):
+		"""Bytes per second the link carries (8N1 serial takes 10 bits a byte), None if unknown"""
+		baudrate = getattr(self._transport, "baudrate", None)
+		return (baudrate / 10) if baudrate else None
+
+	def capture(self, path):
+		"""Records all traffic on the port to the file at path (see Capture) and returns the
+		Capture, or stops recording if path is None"""
+		capture = Capture(path) if (path != None) else None
+		with self._writelock:
+			previous = self._capture
+			self._capture = capture
+		if (previous != None):
+			previous.close()
+		return capture
+
+	def write(self, frame):
+		with self._writelock:
+			if (self._capture != None):
+				self._capture.record(Capture.OUT, frame)
+			self._transport.write(frame)
+
+	def attach(self, camera):
+		"""Routes replies from the camera's address to it"""
+		current = self._cameras.get(camera.camera_address)
+		if (current != None) and (current is not camera):
+			raise ValueError("Address " + str(camera.camera_address) + " is already in use on this bus")
+		self._cameras[camera.camera_address] = camera
+
+	def detach(self, camera):
+		if (self._cameras.get(camera.camera_address) is camera):
+			del self._cameras[camera.camera_address]
+
+	def add_listener(self, callback):
+		"""Calls callback(address, response) for every frame received from the transport"""
+		self._listeners.append(callback)
+
+	def remove_listener(self, callback):
+		self._listeners.remove(callback)
+
+	def close(self):
+		"""Stops the background reader and closes the transport"""
+		self._running = False
+		if (self._reader is not threading.current_thread()):
+			self._reader.join()
+		self._transport.close()
+		self.capture(None)
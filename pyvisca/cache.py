@@ -0,0 +1,46 @@
+import threading
+from time import monotonic
+
+class StateCache:
+	"""Last known camera settings, each trusted for a time-to-live before it is read again
+
+	Give a Camera one with cam.cache = StateCache(ttl=1.0, ttls={"power_on": 10}).
+	Property reads within a field's TTL are answered from the cache, setters
+	write their value through to it and relative commands (increase_gain(),
+	reset_iris(), ...) invalidate the field they change.
+	"""
+
+	def __init__(self, ttl=1.0, ttls=None):
+		"""ttl is the default time-to-live in seconds, ttls overrides it per field"""
+		self.ttl = ttl
+		self.ttls = dict(ttls) if ttls else {}
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+		self._values = {} # field -> (value, time stored)
+
+	def get(self, field):
+		"""Returns (True, value) if the field is cached and fresh, otherwise (False, None)"""
+		with self._lock:
+			entry = self._values.get(field)
+			if (entry != None) and (monotonic() - entry[1] < self.ttls.get(field, self.ttl)):
+				self.hits += 1
+				return (True, entry[0])
+			self.misses += 1
+			return (False, None)
+
+	def put(self, field, value):
+		with self._lock:
+			self._values[field] = (value, monotonic())
+
+	def invalidate(self, *fields):
+		"""Forgets the given fields, or everything if none are given"""
+		with self._lock:
+			if (len(fields) == 0):
+				self._values.clear()
+			for field in fields:
+				self._values.pop(field, None)
+
+	def stats(self):
+		with self._lock:
+			return {"hits": self.hits, "misses": self.misses, "fields": len(self._values)}
@@ -0,0 +1,163 @@
+from bisect import bisect_right
+try:
+	import numpy
+except ImportError:
+	numpy = None # batches are converted one value at a time instead
+
+def _interp(x, xp, fp):
+	"""Linear interpolation of x between the points (xp, fp), xp increasing, clamped at the ends"""
+	if (x <= xp[0]):
+		return fp[0]
+	if (x >= xp[-1]):
+		return fp[-1]
+	i = bisect_right(xp, x)
+	return fp[i - 1] + (fp[i] - fp[i - 1]) * (x - xp[i - 1]) / (xp[i] - xp[i - 1])
+
+def _isbatch(x):
+	"""Whether x is a sequence or array of values rather than one (a NumPy scalar being one)"""
+	if (numpy != None):
+		return numpy.ndim(x) > 0
+	return not isinstance(x, (int, float))
+
+class Table:
+	"""Measured points between raw codes and a physical quantity, interpolated linearly
+	between them (and clamped beyond them) in either direction
+
+	Both columns must be monotonic. Single values convert to a float; lists,
+	tuples and arrays convert to a NumPy array in one vectorized call, or to
+	a list if NumPy isn't installed.
+	"""
+
+	def __init__(self, points):
+		"""points is a sequence of (raw, value) pairs"""
+		points = sorted(points)
+		if (len(points) < 2):
+			raise ValueError("A calibration table needs at least two points")
+		self.raw = [float(raw) for raw, value in points]
+		self.values = [float(value) for raw, value in points]
+		# the inverse needs its x increasing too
+		if (self.values[0] > self.values[-1]):
+			self._inverse = (self.values[::-1], self.raw[::-1])
+		else:
+			self._inverse = (self.values, self.raw)
+		if (numpy != None):
+			self._arrays = (numpy.array(self.raw), numpy.array(self.values))
+			self._inversearrays = (numpy.array(self._inverse[0]), numpy.array(self._inverse[1]))
+
+	def _lookup(self, x, xp, fp, arrays):
+		if (not _isbatch(x)):
+			return _interp(x, xp, fp)
+		if (numpy != None):
+			return numpy.interp(numpy.asarray(x, dtype=float), *arrays)
+		return [_interp(value, xp, fp) for value in x]
+
+	def __call__(self, raw):
+		"""Converts raw codes to values"""
+		return self._lookup(raw, self.raw, self.values, self._arrays if (numpy != None) else None)
+
+	def inverse(self, value):
+		"""Converts values to raw codes (as floats; round them before sending)"""
+		return self._lookup(value, self._inverse[0], self._inverse[1], self._inversearrays if (numpy != None) else None)
+
+	def points(self):
+		return list(zip(self.raw, self.values))
+
+class Calibration:
+	"""Converts a camera model's raw positions to degrees, zoom ratio and focus distance and back
+
+	Pan and tilt are in degrees (right and up positive), zoom as the
+	magnification (1.0 at wide end) and focus as the distance in metres
+	(inf at infinity), each through a Table of measured points. Focus is
+	tabulated in dioptres (1 / metres) so that infinity interpolates.
+	Raw pan and tilt are taken as the camera reports them, two's complement
+	in pan_bytes/tilt_bytes nibbles, and given back signed as move_to() takes
+	them. Use MODELS[name], or measure a camera and pass the points in.
+	Give a Camera one with cam.calibration = Calibration.model("EVI-D70").
+	"""
+
+	# Published ranges; the lens tables are approximate and worth measuring for the camera in hand
+	MODELS = {
+		"EVI-D70": {
+			"pan": [(-0x08DB, -170.0), (0x08DB, 170.0)],
+			"tilt": [(-0x0190, -30.0), (0x04B0, 90.0)],
+			"zoom": [(0x0000, 1.0), (0x16A1, 2.0), (0x2063, 3.0), (0x2628, 4.0), (0x2A1D, 5.0), (0x2D13, 6.0),
+				(0x2F6D, 7.0), (0x3161, 8.0), (0x330D, 9.0), (0x3486, 10.0), (0x35D7, 11.0), (0x3709, 12.0),
+				(0x3820, 13.0), (0x3920, 14.0), (0x3ACA, 15.0), (0x3C4A, 16.0), (0x3D94, 17.0), (0x4000, 18.0)],
+			"focus": [(0x1000, 0.0), (0xC000, 100.0)],
+		},
+	}
+
+	def __init__(self, pan, tilt, zoom, focus, pan_bytes=4, tilt_bytes=4):
+		"""pan, tilt, zoom and focus are Tables or lists of (raw, value) points, focus values in dioptres"""
+		self.pan = pan if isinstance(pan, Table) else Table(pan)
+		self.tilt = tilt if isinstance(tilt, Table) else Table(tilt)
+		self.zoom = zoom if isinstance(zoom, Table) else Table(zoom)
+		self.focus = focus if isinstance(focus, Table) else Table(focus)
+		self.pan_bytes = pan_bytes
+		self.tilt_bytes = tilt_bytes
+
+	@classmethod
+	def model(cls, name, pan_bytes=4, tilt_bytes=4):
+		tables = cls.MODELS[name]
+		return cls(tables["pan"], tables["tilt"], tables["zoom"], tables["focus"], pan_bytes, tilt_bytes)
+
+	def _signed(self, raw, nibbles):
+		"""Reads raw positions as two's complement values of the given number of nibbles"""
+		full = 1 << (4 * nibbles)
+		if (not _isbatch(raw)):
+			return raw - full if (raw >= full >> 1) else raw
+		if (numpy != None):
+			raw = numpy.asarray(raw)
+			return numpy.where(raw >= full >> 1, raw - full, raw)
+		return [value - full if (value >= full >> 1) else value for value in raw]
+
+	def _round(self, raw):
+		if (not _isbatch(raw)):
+			return int(round(raw))
+		if (numpy != None):
+			return numpy.rint(raw).astype(int)
+		return [int(round(value)) for value in raw]
+
+	def pan_degrees(self, raw):
+		return self.pan(self._signed(raw, self.pan_bytes))
+
+	def tilt_degrees(self, raw):
+		return self.tilt(self._signed(raw, self.tilt_bytes))
+
+	def pan_raw(self, degrees):
+		return self._round(self.pan.inverse(degrees))
+
+	def tilt_raw(self, degrees):
+		return self._round(self.tilt.inverse(degrees))
+
+	def zoom_ratio(self, raw):
+		return self.zoom(raw)
+
+	def zoom_raw(self, ratio):
+		return self._round(self.zoom.inverse(ratio))
+
+	def focus_distance(self, raw):
+		"""Converts raw focus positions to metres, inf at infinity"""
+		dioptres = self.focus(raw)
+		if (not _isbatch(dioptres)):
+			return (1 / dioptres) if (dioptres > 0) else float("inf")
+		if (numpy != None):
+			with numpy.errstate(divide="ignore"):
+				return 1 / dioptres
+		return [(1 / value) if (value > 0) else float("inf") for value in dioptres]
+
+	def focus_raw(self, metres):
+		"""Converts distances in metres (inf for infinity) to raw focus positions"""
+		if (not _isbatch(metres)):
+			dioptres = 1 / metres if (metres > 0) else float("inf")
+		elif (numpy != None):
+			with numpy.errstate(divide="ignore"):
+				dioptres = 1 / numpy.asarray(metres, dtype=float)
+		else:
+			dioptres = [1 / value if (value > 0) else float("inf") for value in metres]
+		return self._round(self.focus.inverse(dioptres))
+
+	def samples(self, samples):
+		"""Converts a list of Telemetry Samples to (pan degrees, tilt degrees, zoom ratio, focus metres), each a batch"""
+		return (self.pan_degrees([sample.pan for sample in samples]), self.tilt_degrees([sample.tilt for sample in samples]),
+			self.zoom_ratio([sample.zoom for sample in samples]), self.focus_distance([sample.focus for sample in samples]))
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from .pipeline import VISCAError
+
+log = logging.getLogger("pyvisca")
+
+class Capabilities:
+	"""What one camera model (vendor, model) takes: its pan/tilt widths, if known, and the
+	COMMANDS and INQUIRIES it answers with a syntax error
+
+	Shared by every camera of the model that a CapabilityRegistry attaches.
+	Commands and inquiries in unsupported fail at once with
+	VISCAError.SYNTAX_ERROR instead of going to the camera. More are learned
+	once the camera has rejected them CONFIRMATIONS times running, and the
+	widths from its first pan/tilt reply; forget() takes back what was
+	learned wrongly.
+	"""
+
+	def __init__(self, registry, vendor, model, pan_bytes=None, tilt_bytes=None, unsupported=()):
+		self._registry = registry
+		self.vendor = vendor
+		self.model = model
+		self.pan_bytes = pan_bytes
+		self.tilt_bytes = tilt_bytes
+		self.unsupported = set(unsupported)
+		self._rejections = {} # name -> syntax errors in a row, for those not yet unsupported
+
+	def supports(self, name):
+		return name not in self.unsupported
+
+	def forget(self, name=None):
+		"""Lets the named command or inquiry (or every one, if None) be sent to the camera again"""
+		self._registry._forget(self, name)
+
+	def _admit(self, camera, command):
+		"""Fails command at once if the model doesn't take it, returns whether it should be sent"""
+		name = command.name
+		if (name == None):
+			return True
+		if (name in self.unsupported):
+			command.set_exception(VISCAError(VISCAError.SYNTAX_ERROR))
+			return False
+		command.add_done_callback(lambda command: self._learn(camera, command))
+		return True
+
+	def _learn(self, camera, command):
+		if (command.cancelled()):
+			return
+		error = command.exception()
+		if (error == None):
+			if (command.name in self._rejections):
+				self._registry._answered(self, command.name)
+			if (command.name == "pantilt") and (self.pan_bytes == None):
+				self._widths(camera, command.result())
+		elif (isinstance(error, VISCAError)) and (error.code == VISCAError.SYNTAX_ERROR) and (self._fixed(camera, command)):
+			self._registry._rejected(self, command.name)
+
+	def _fixed(self, camera, command):
+		"""Whether a frame is the same whatever is asked of it, so a syntax error can't be down
+		to the values it carried"""
+		if (command.inquiry):
+			return True
+		spec = camera.COMMANDS.get(command.name)
+		return isinstance(spec, str) and (not any(c.islower() for c in spec))
+
+	def _widths(self, camera, ret):
+		"""Works the pan/tilt widths out from a pan/tilt reply (pan taking the odd nibble) and applies them;
+		applied even if already known, as the reply's done callback may have learned them first"""
+		if (self.pan_bytes == None) and (ret != None) and (len(ret) >= 3) and (ret[0] == 0x50):
+			nibbles = len(ret) - 1
+			self._registry._learned(self, (nibbles + 1) // 2, nibbles // 2)
+		self._apply(camera)
+
+	def _apply(self, camera):
+		if (self.pan_bytes != None) and (camera.pan_bytes != self.pan_bytes):
+			camera.pan_bytes = self.pan_bytes
+		if (self.tilt_bytes != None) and (camera.tilt_bytes != self.tilt_bytes):
+			camera.tilt_bytes = self.tilt_bytes
+
+	def todict(self):
+		return {"vendor": self.vendor, "model": self.model, "pan_bytes": self.pan_bytes, "tilt_bytes": self.tilt_bytes,
+			"unsupported": sorted(self.unsupported)}
+
+class CapabilityRegistry:
+	"""Capabilities of camera models, keyed by the vendor and model IDs of getVersionInfo()
+
+	attach() reads a camera's version, sets its pan_bytes and tilt_bytes
+	(reading its pan/tilt position once if they aren't known yet) and gives
+	it the model's Capabilities, so that anything the model is known not to
+	take returns at once rather than costing a round trip or a timeout.
+	Capabilities learned at runtime are saved to the JSON file at path, if
+	given, shortly afterwards (call flush() before exiting to be sure), and
+	picked up from it next time.
+	"""
+
+	# (vendor, model) -> {"pan_bytes": n, "tilt_bytes": n, "unsupported": [names]} known in advance
+	MODELS = {}
+
+	# Syntax errors in a row, with no successful reply between, before a name is taken as unsupported
+	CONFIRMATIONS = 3
+
+	# How long learned capabilities are gathered before being saved together, on a timer thread
+	SAVE_DELAY = 1
+
+	def __init__(self, path=None):
+		"""Loads the capabilities saved at path, if given and the file exists; learned ones are saved back there"""
+		self.path = path
+		self._lock = threading.Lock()
+		self._savelock = threading.Lock() # one save() writing the file at a time, apart from _lock
+		self._models = {} # (vendor, model) -> Capabilities
+		self._saving = None # Timer of the save pending, if any
+		for (vendor, model), known in self.MODELS.items():
+			self._models[vendor, model] = Capabilities(self, vendor, model, **known)
+		if (path != None) and (os.path.exists(path)):
+			self.load(path)
+
+	def get(self, vendor, model):
+		"""Returns the Capabilities of a model, empty if nothing is known about it yet"""
+		with self._lock:
+			capabilities = self._models.get((vendor, model))
+			if (capabilities == None):
+				capabilities = Capabilities(self, vendor, model)
+				self._models[vendor, model] = capabilities
+			return capabilities
+
+	def apply(self, camera, vendor, model):
+		"""Gives camera the Capabilities of model without asking it anything, returns them"""
+		capabilities = self.get(vendor, model)
+		capabilities._apply(camera)
+		camera.capabilities = capabilities
+		return capabilities
+
+	def _applyversion(self, camera, version):
+		if (version["vendor"] == None):
+			return None # no answer, so nothing to go on
+		return self.apply(camera, version["vendor"], version["model"])
+
+	def _probe(self, camera):
+		return camera._submit(camera._codec.inquiries["pantilt"][0], True, name="pantilt")
+
+	def attach(self, camera):
+		"""Identifies camera from its version and applies its model's Capabilities, returning them, or
+		None if the camera didn't answer (awaitable from an AsyncCamera)"""
+		version = camera.getVersionInfo()
+		if (asyncio.iscoroutine(version)):
+			return self._attachasync(camera, version)
+		capabilities = self._applyversion(camera, version)
+		if (capabilities != None) and (capabilities.pan_bytes == None):
+			capabilities._widths(camera, camera._reply(self._probe(camera)))
+		return capabilities
+
+	async def _attachasync(self, camera, version):
+		capabilities = self._applyversion(camera, await version)
+		if (capabilities != None) and (capabilities.pan_bytes == None):
+			capabilities._widths(camera, await camera._reply(self._probe(camera)))
+		return capabilities
+
+	def _rejected(self, capabilities, name):
+		"""Counts a syntax error in reply to name, marking it unsupported once confirmed"""
+		with self._lock:
+			if (name in capabilities.unsupported):
+				return
+			rejections = capabilities._rejections.get(name, 0) + 1
+			if (rejections < self.CONFIRMATIONS):
+				capabilities._rejections[name] = rejections
+				return
+			capabilities._rejections.pop(name, None)
+			capabilities.unsupported = capabilities.unsupported | {name} # replaced whole, for readers without the lock
+		log.info("Camera model %04x:%04x doesn't support %s", capabilities.vendor, capabilities.model, name)
+		self._savesoon()
+
+	def _answered(self, capabilities, name):
+		"""Clears the syntax errors counted against name, which the camera has now answered"""
+		with self._lock:
+			capabilities._rejections.pop(name, None)
+
+	def _learned(self, capabilities, pan_bytes, tilt_bytes):
+		with self._lock:
+			capabilities.pan_bytes = pan_bytes
+			capabilities.tilt_bytes = tilt_bytes
+		self._savesoon()
+
+	def _forget(self, capabilities, name):
+		with self._lock:
+			if (name == None):
+				capabilities.unsupported = set()
+				capabilities._rejections.clear()
+			else:
+				capabilities.unsupported = capabilities.unsupported - {name}
+				capabilities._rejections.pop(name, None)
+		self._savesoon()
+
+	def forget(self, vendor, model, name=None):
+		"""Lets the named command or inquiry (or every one, if None) be sent to cameras of model again"""
+		self.get(vendor, model).forget(name)
+
+	def _savesoon(self):
+		"""Saves in SAVE_DELAY seconds on a timer thread, so file I/O is kept off the bus's thread"""
+		if (self.path == None):
+			return
+		with self._lock:
+			if (self._saving != None):
+				return
+			self._saving = threading.Timer(self.SAVE_DELAY, self.flush)
+			self._saving.daemon = True
+			self._saving.start()
+
+	def flush(self):
+		"""Saves now if anything learned is waiting to be saved"""
+		with self._lock:
+			saving = self._saving
+			self._saving = None
+		if (saving == None):
+			return
+		saving.cancel()
+		try:
+			self.save()
+		except OSError:
+			log.exception("Couldn't save camera capabilities to %s", self.path)
+
+	def load(self, path):
+		"""Adds the capabilities saved in the JSON file at path to those already known"""
+		with open(path, "r") as file:
+			models = json.load(file)["models"]
+		with self._lock:
+			for saved in models:
+				key = (saved["vendor"], saved["model"])
+				capabilities = self._models.get(key)
+				if (capabilities == None):
+					capabilities = Capabilities(self, *key)
+					self._models[key] = capabilities
+				if (saved.get("pan_bytes") != None):
+					capabilities.pan_bytes = saved["pan_bytes"]
+					capabilities.tilt_bytes = saved["tilt_bytes"]
+				capabilities.unsupported = capabilities.unsupported | set(saved.get("unsupported", []))
+
+	def save(self, path=None):
+		"""Writes every model's capabilities to path, or the path the registry was loaded from;
+		the file is replaced in one step"""
+		path = path if (path != None) else self.path
+		with self._lock:
+			models = [capabilities.todict() for key, capabilities in sorted(self._models.items())]
+		with self._savelock: # not _lock, which the bus's thread takes to learn from replies
+			with open(path + ".tmp", "w") as file:
+				json.dump({"models": models}, file, indent="\t")
+			os.replace(path + ".tmp", path)
@@ -0,0 +1,138 @@
+import mmap
+import os
+import threading
+from struct import Struct
+from time import monotonic, sleep
+from typing import NamedTuple
+from .parser import FrameParser
+
+class Record(NamedTuple):
+	"""Bytes written to (OUT) or read from (IN) a transport, time being monotonic() then"""
+	time: float
+	direction: int
+	data: bytes
+
+class Capture:
+	"""Append-only recording of the traffic on a transport
+
+	The file is a MAGIC header followed by one record per write() or read():
+	a little-endian float64 timestamp, a direction byte (OUT or IN) and a
+	uint16 length, then that many bytes. Outgoing records hold one frame
+	each, incoming ones whatever the read returned, which the parser splits
+	into frames on replay. Captures appended to an existing file keep its
+	header. Start one with cam.capture(path) or bus.capture(path).
+	"""
+
+	MAGIC = b"VISCAP\x01\n"
+	RECORD = Struct("<dBH")
+	OUT = 0
+	IN = 1
+
+	def __init__(self, path):
+		self.path = path
+		self._file = open(path, "ab")
+		if (self._file.tell() == 0):
+			self._file.write(self.MAGIC)
+		self._lock = threading.Lock()
+		self.records = 0
+
+	def record(self, direction, data, time=None):
+		"""Appends data as travelling in direction, at time (now if None)"""
+		if (len(data) == 0):
+			return
+		with self._lock:
+			if (self._file.closed):
+				return # stopped while the bus was mid-read
+			self._file.write(self.RECORD.pack(monotonic() if (time == None) else time, direction, len(data)))
+			self._file.write(data)
+			self.records += 1
+
+	def flush(self):
+		with self._lock:
+			self._file.flush()
+
+	def close(self):
+		with self._lock:
+			self._file.close()
+
+class CaptureFile:
+	"""Reads a Capture's file through mmap
+
+	Iterating yields every Record in order; frames() runs one direction
+	through a FrameParser. A record still being written when the file was
+	opened is left out.
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		with open(path, "rb") as file:
+			size = os.fstat(file.fileno()).st_size
+			self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if (size > 0) else b""
+		if (self._map[:len(Capture.MAGIC)] != Capture.MAGIC):
+			self.close()
+			raise ValueError(path + " is not a VISCA capture")
+
+	def __iter__(self):
+		data = self._map
+		unpack = Capture.RECORD.unpack_from
+		header = Capture.RECORD.size
+		offset = len(Capture.MAGIC)
+		end = len(data)
+		while (offset + header <= end):
+			time, direction, length = unpack(data, offset)
+			offset += header
+			if (offset + length > end):
+				return
+			yield Record(time, direction, data[offset:offset + length])
+			offset += length
+
+	def frames(self, direction=Capture.IN):
+		"""Yields (time, frame) for every frame travelling in direction, frames as FrameParser returns them"""
+		parser = FrameParser()
+		for record in self:
+			if (record.direction == direction):
+				for frame in parser.feed(record.data):
+					yield (record.time, frame)
+
+	def duration(self):
+		"""Returns the seconds between the first record and the last"""
+		first = last = None
+		for record in self:
+			if (first == None):
+				first = record.time
+			last = record.time
+		return 0 if (first == None) else last - first
+
+	def close(self):
+		if (isinstance(self._map, mmap.mmap)):
+			self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def replay(records, target, speed=1.0, direction=Capture.OUT):
+	"""Writes the data of the records travelling in direction to target (anything with write(),
+	such as a Bus or a SimulatedTransport) with their original spacing divided by speed, or
+	as fast as possible if speed is None; records may be a CaptureFile or its path. Returns
+	how many records were written."""
+	if (isinstance(records, str)):
+		with CaptureFile(records) as capture:
+			return replay(capture, target, speed, direction)
+	started = monotonic()
+	first = None
+	count = 0
+	for record in records:
+		if (record.direction != direction):
+			continue
+		if (first == None):
+			first = record.time
+		if (speed != None):
+			delay = started + (record.time - first) / speed - monotonic()
+			if (delay > 0):
+				sleep(delay)
+		target.write(record.data)
+		count += 1
+	return count
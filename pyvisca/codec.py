@@ -0,0 +1,148 @@
+from typing import NamedTuple
+
+class Template:
+	"""A VISCA frame compiled for one camera address from a spec like "01 04 47 0p 0p 0p 0p"
+
+	Each token of the spec is one byte after the address byte; uppercase hex
+	digits are literal and lowercase letters (g to z) are nibbles of a value
+	passed to encode(). Values are taken in order of each letter's first
+	appearance, most significant nibble first, so "0p 0p 0p 0p" is a 16 bit
+	value spread over four bytes and "pp" is a whole byte.
+
+	Patching a frame for new values costs about the same as building it
+	from lists did; what saves time is the memo of the last MEMO frames
+	encoded, as the same speeds and positions come up again and again.
+	"""
+
+	# How many encoded frames to remember before starting afresh
+	MEMO = 256
+
+	def __init__(self, spec, address):
+		frame = bytearray([0x80 + address])
+		mask = bytearray([0xFF])
+		positions = {} # letter -> [(byte offset, bits to shift the nibble up by)]
+		for token in spec.split():
+			offset = len(frame)
+			byte = 0
+			literal = 0
+			for shift, digit in ((4, token[0]), (0, token[1])):
+				if (digit.islower()):
+					positions.setdefault(digit, []).append((offset, shift))
+				else:
+					byte |= int(digit, 16) << shift
+					literal |= 0x0F << shift
+			frame.append(byte)
+			mask.append(literal)
+		frame.append(0xFF)
+		mask.append(0xFF)
+		self.frame = bytes(frame)
+		self._mask = bytes(mask) # bits of each byte that are literal
+		self.arity = len(positions)
+		# flattened to (value index, byte offset, bits to shift the value down by, bits to shift the nibble up by)
+		self._patches = []
+		for index, nibbles in enumerate(positions.values()):
+			for i, (offset, shift) in enumerate(nibbles):
+				self._patches.append((index, offset, 4 * (len(nibbles) - 1 - i), shift))
+		self._encoded = {} # recently encoded values -> frame
+
+	def encode(self, *values):
+		"""Returns the frame with the given values patched in, from the memo if encoded recently"""
+		if (self.arity == 0):
+			return self.frame
+		frame = self._encoded.get(values)
+		if (frame == None):
+			buffer = bytearray(self.frame)
+			for index, offset, down, up in self._patches:
+				buffer[offset] |= ((values[index] >> down) & 0x0F) << up
+			frame = bytes(buffer)
+			if (len(self._encoded) >= self.MEMO):
+				self._encoded.clear()
+			self._encoded[values] = frame
+		return frame
+
+	def match(self, frame):
+		"""Returns the values encoded in a frame (from any address) if it is one of this
+		template's, otherwise None"""
+		if (len(frame) != len(self.frame)):
+			return None
+		for i in range(1, len(frame)):
+			if ((frame[i] & self._mask[i]) != self.frame[i]):
+				return None
+		values = [0] * self.arity
+		for index, offset, down, up in self._patches:
+			values[index] |= ((frame[offset] >> up) & 0x0F) << down
+		return tuple(values)
+
+class Inquiry(NamedTuple):
+	"""An inquiry in a command table: its spec, the decoder for its reply, and whether
+	the reply is a setting a StateCache may keep"""
+	spec: str
+	decode: object
+	cached: bool = True
+
+class Codec:
+	"""Every command and inquiry of a table compiled for one camera address and pan/tilt width
+
+	Codecs are shared by all cameras with the same settings, see compile().
+	"""
+
+	_compiled = {}
+
+	def __init__(self, commands, inquiries, address, pan_bytes, tilt_bytes):
+		widths = {"pan": " ".join(["0p"] * pan_bytes), "tilt": " ".join(["0t"] * tilt_bytes)}
+		self.commands = dict((name, Template(spec.format(**widths), address)) for name, spec in commands.items())
+		self.inquiries = dict((name, (Template(inquiry.spec, address).frame, inquiry)) for name, inquiry in inquiries.items())
+
+	@classmethod
+	def compile(cls, commands, inquiries, address, pan_bytes, tilt_bytes):
+		"""Returns the codec for the given table and settings, compiling it the first time"""
+		key = (id(commands), id(inquiries), address, pan_bytes, tilt_bytes)
+		codec = cls._compiled.get(key)
+		if (codec == None):
+			codec = cls._compiled[key] = cls(commands, inquiries, address, pan_bytes, tilt_bytes)
+		return codec
+
+def combine(ret, start, count):
+	"""Combines count nibbles of a reply, starting at index start, to an integer"""
+	value = 0
+	for i in range(start, start + count):
+		value = (value << 4) | ret[i]
+	return value
+
+class Flag:
+	"""Decodes an on/off inquiry reply to True, False or None"""
+
+	def __init__(self, on=0x02, off=0x03):
+		self.on = on
+		self.off = off
+		self._values = {on: True, off: False}
+
+	def __call__(self, ret):
+		if (ret != None) and (len(ret) == 2) and (ret[0] == 0x50):
+			return self._values.get(ret[1])
+		return None
+
+class Lookup:
+	"""Decodes a mode inquiry reply to a member of an enum, or default if it isn't one"""
+
+	def __init__(self, enum, default=0):
+		self._members = dict((member.value, member) for member in enum)
+		self._default = default
+
+	def __call__(self, ret):
+		if (ret != None) and (len(ret) == 2) and (ret[0] == 0x50):
+			return self._members.get(ret[1], self._default)
+		return self._default
+
+class Nibbles:
+	"""Decodes a value held in count nibbles of an inquiry reply, or default if there is no reply"""
+
+	def __init__(self, start, count, default=0):
+		self.start = start
+		self.count = count
+		self._default = default
+
+	def __call__(self, ret):
+		if (ret != None) and (len(ret) >= self.start + self.count) and (ret[0] == 0x50):
+			return combine(ret, self.start, self.count)
+		return self._default
@@ -0,0 +1,287 @@
+"""Serves cameras to other processes over a Unix socket, run with python -m pyvisca.daemon
+
+The daemon owns the ports; clients open RemoteCamera(path, camera=n), which
+behaves like Camera but sends its frames through the daemon. Each request is
+a VISCA frame, queued to the camera's pipeline alongside every other
+client's, and its reply is sent back once the camera completes or answers it.
+"""
+import argparse
+import errno
+import os
+import queue
+import socket
+import threading
+from time import monotonic
+from .visca import Camera
+from .bus import Bus
+from .pipeline import Command, VISCAError
+from .remote import SOCKET, REQUEST, REPLY, INQUIRY, URGENT, CAPTURE, CANCEL, CANCEL_ID, PRIORITY_SHIFT, OK, ERROR, TIMEOUT, _receive
+
+class _Client:
+	"""One connection to the daemon
+
+	Replies are queued to a writer thread of the client's own, as they are
+	made on the bus's thread, which a slow client mustn't hold up. A client
+	that falls MAX_BACKLOG replies behind is disconnected.
+	"""
+
+	MAX_BACKLOG = 1024
+
+	def __init__(self, daemon, sock):
+		self._daemon = daemon
+		self._socket = sock
+		self._outbox = queue.SimpleQueue() # reply messages, None to stop the writer
+		self._commands = {} # request id -> (Camera, Command) of the client's commands yet to finish, to cancel
+		self._writer = threading.Thread(target=self._writeloop, name="visca-daemon-writer", daemon=True)
+		self._writer.start()
+
+	def serve(self):
+		try:
+			while (True):
+				header = _receive(self._socket, REQUEST.size)
+				if (header == None):
+					break
+				length, ident, index, flags, timeout = REQUEST.unpack(header)
+				frame = _receive(self._socket, length)
+				if (frame == None):
+					break
+				self._daemon._request(self, ident, index, flags, timeout / 1000, frame)
+		except OSError:
+			pass # the client went away mid-request
+		finally:
+			self._daemon._disconnected(self)
+			self._outbox.put(None)
+			self._writer.join()
+			self._socket.close()
+
+	def _writeloop(self):
+		while (True):
+			message = self._outbox.get()
+			if (message == None):
+				return
+			try:
+				self._socket.sendall(message)
+			except OSError:
+				pass # disconnected; serve() cleans up, and the rest are dropped until it does
+
+	def track(self, ident, camera, handle):
+		"""Keeps a command of the client's until it finishes, so the client can cancel it"""
+		self._commands[ident] = (camera, handle)
+		handle.add_done_callback(lambda handle: self._commands.pop(ident, None))
+
+	def command(self, ident):
+		"""Returns (camera, Command) of the client's unfinished request ident, or (None, None)"""
+		return self._commands.get(ident, (None, None))
+
+	def reply(self, ident, handle):
+		"""Queues the outcome of a finished Command to be sent back to the client"""
+		try:
+			response = handle.result(0)
+			status, code, data = OK, 0, bytes(response if (response != None) else [])
+		except VISCAError as e:
+			status, code, data = ERROR, TIMEOUT if (e.code == None) else e.code, b""
+		except Exception:
+			status, code, data = ERROR, VISCAError.CANCELLED, b""
+		if (self._outbox.qsize() >= self.MAX_BACKLOG):
+			self.disconnect() # not reading its replies
+			return
+		self._outbox.put(REPLY.pack(len(data), ident, status, code) + data)
+
+	def disconnect(self):
+		try:
+			self._socket.shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+
+class Daemon:
+	"""Shares cameras between processes through a Unix socket
+
+	Requests from every client are queued to the same Camera, so they are
+	multiplexed onto its bus in order. Identical inquiries in flight at the
+	same time go to the camera once, and replies to cacheable inquiries (as
+	marked in Camera.INQUIRIES) are shared for SHARE seconds, until a command
+	is sent to that camera.
+	"""
+
+	# How long an inquiry reply may be handed to other clients
+	SHARE = 0.2
+
+	def __init__(self, cameras, path=SOCKET):
+		"""cameras is a list of open Cameras, numbered from 0 for clients in that order"""
+		self.cameras = list(cameras)
+		self.path = path
+		self._lock = threading.Lock()
+		self._inflight = {} # (camera index, frame) -> Command
+		self._replies = {} # (camera index, frame) -> (reply, time received)
+		self._names = [dict((frame, name) for name, (frame, inquiry) in camera._codec.inquiries.items()) for camera in self.cameras]
+		self._clients = set()
+		if (os.path.exists(path)):
+			self._claim(path)
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._socket.bind(path)
+		self._socket.listen()
+		self._thread = None
+
+	def _claim(self, path):
+		"""Removes a socket left behind by a daemon that didn't shut down cleanly, raising
+		OSError if a daemon is still serving on it"""
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(path)
+		except ConnectionRefusedError:
+			os.unlink(path) # nothing listening
+			return
+		finally:
+			probe.close()
+		raise OSError(errno.EADDRINUSE, "A daemon is already serving on " + path)
+
+	def _capture(self, index, path):
+		"""Starts recording the traffic on a camera's port to the file at path for a client, or
+		stops if path is empty; returns a finished Command"""
+		handle = Command(path)
+		try:
+			self.cameras[index].capture(path.decode("utf-8") or None)
+			handle.set_result(None)
+		except (IndexError, OSError, UnicodeDecodeError):
+			handle.set_exception(VISCAError(VISCAError.NOT_EXECUTABLE))
+		return handle
+
+	def _cancel(self, client, payload):
+		"""Cancels one of client's commands, named by its request id; returns a finished Command,
+		failed with NOT_EXECUTABLE if there was nothing to cancel"""
+		handle = Command(payload)
+		camera, command = client.command(CANCEL_ID.unpack(payload)[0]) if (len(payload) == CANCEL_ID.size) else (None, None)
+		if (command != None) and (camera.cancel(command)):
+			handle.set_result(None)
+		else:
+			handle.set_exception(VISCAError(VISCAError.NOT_EXECUTABLE))
+		return handle
+
+	def _request(self, client, ident, index, flags, timeout, frame):
+		if (flags & CAPTURE):
+			handle = self._capture(index, frame)
+		elif (flags & CANCEL):
+			handle = self._cancel(client, frame)
+		elif (index >= len(self.cameras)) or (len(frame) < 2):
+			handle = Command(frame)
+			handle.set_exception(VISCAError(VISCAError.NO_SOCKET)) # no such camera
+		else:
+			camera = self.cameras[index]
+			frame = bytes([0x80 + camera.camera_address]) + frame[1:]
+			if (flags & INQUIRY):
+				handle = self._inquire(index, camera, frame, timeout)
+			else:
+				self._forget(index)
+				handle = camera._submit(frame, False, timeout, bool(flags & URGENT), priority=flags >> PRIORITY_SHIFT)
+				client.track(ident, camera, handle)
+		handle.add_done_callback(lambda handle: client.reply(ident, handle))
+
+	def _inquire(self, index, camera, frame, timeout):
+		"""Returns a Command for an inquiry, shared with any other client asking the same"""
+		key = (index, frame)
+		name = self._names[index].get(frame)
+		with self._lock:
+			shared = self._replies.get(key)
+			if (shared != None) and (monotonic() - shared[1] < self.SHARE):
+				handle = Command(frame, True, timeout, name)
+				handle.set_result(shared[0])
+				return handle
+			handle = self._inflight.get(key)
+			if (handle != None):
+				return handle
+			handle = camera._submit(frame, True, timeout, name=name)
+			self._inflight[key] = handle
+		def received(handle):
+			with self._lock:
+				self._inflight.pop(key, None)
+				if (name != None) and (camera.INQUIRIES[name].cached) and (handle.wait(0)):
+					self._replies[key] = (handle.result(), monotonic())
+		handle.add_done_callback(received)
+		return handle
+
+	def _forget(self, index):
+		"""Drops the shared replies from a camera a command is about to change"""
+		with self._lock:
+			for key in [key for key in self._replies if (key[0] == index)]:
+				del self._replies[key]
+
+	def _disconnected(self, client):
+		with self._lock:
+			self._clients.discard(client)
+
+	def serve_forever(self):
+		"""Accepts clients until close() is called"""
+		while (True):
+			try:
+				sock, address = self._socket.accept()
+			except OSError:
+				return # closed
+			client = _Client(self, sock)
+			with self._lock:
+				self._clients.add(client)
+			threading.Thread(target=client.serve, name="visca-daemon-client", daemon=True).start()
+
+	def start(self):
+		"""Serves clients on a background thread"""
+		self._thread = threading.Thread(target=self.serve_forever, name="visca-daemon", daemon=True)
+		self._thread.start()
+		return self
+
+	def close(self):
+		"""Stops accepting clients, disconnects the ones connected and removes the socket; the
+		cameras are left open"""
+		try:
+			self._socket.shutdown(socket.SHUT_RDWR) # wakes accept(), which close() alone doesn't
+		except OSError:
+			pass
+		self._socket.close()
+		if (os.path.exists(self.path)):
+			os.unlink(self.path)
+		with self._lock:
+			clients = list(self._clients)
+		for client in clients:
+			client.disconnect()
+		if (self._thread != None):
+			self._thread.join()
+
+def _cameras(ports, simulate):
+	"""Opens the cameras on each PORT[:BAUD] (numbering each daisy chain) and simulate simulated
+	ones, returns (cameras, buses)"""
+	cameras = []
+	buses = []
+	for port in ports:
+		name, baudrate = (port.rsplit(":", 1) + ["9600"])[:2]
+		bus = Bus(name, int(baudrate))
+		buses.append(bus)
+		for address in range(1, max(1, bus.count) + 1):
+			cameras.append(Camera(bus=bus, address=address))
+	if (simulate > 0):
+		from .simulator import SimulatedCamera, SimulatedTransport
+		for i in range(simulate):
+			cameras.append(Camera(transport=SimulatedTransport(SimulatedCamera())))
+	return cameras, buses
+
+def main(argv=None):
+	arguments = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	arguments.add_argument("ports", nargs="*", metavar="PORT[:BAUD]", help="serial ports to serve, 9600 baud unless given")
+	arguments.add_argument("--socket", default=SOCKET, help="path of the Unix socket (default: %(default)s)")
+	arguments.add_argument("--simulate", type=int, default=0, metavar="N", help="also serve N simulated cameras")
+	options = arguments.parse_args(argv)
+	cameras, buses = _cameras(options.ports, options.simulate)
+	if (len(cameras) == 0):
+		arguments.error("no cameras to serve")
+	daemon = Daemon(cameras, options.socket)
+	print("Serving " + str(len(cameras)) + " camera(s) on " + options.socket)
+	try:
+		daemon.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		daemon.close()
+		for camera in cameras:
+			camera.close()
+		for bus in buses:
+			bus.close()
+
+if (__name__ == "__main__"):
+	main()
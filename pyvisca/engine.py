@@ -0,0 +1,215 @@
+import heapq
+import logging
+import selectors
+import socket
+import threading
+from collections import deque
+from time import monotonic
+from .bus import Bus
+from .visca import Camera
+from .pipeline import VISCAError
+
+log = logging.getLogger("pyvisca")
+
+class SelectorBus(Bus):
+	"""Bus serviced by an Engine's thread instead of a reader thread of its own"""
+
+	# The port is only read when the selector says it is readable, so never block
+	READ_TIMEOUT = 0
+
+	def __init__(self, port=None, baudrate=None, transport=None, engine=None, discover=False):
+		"""Opens the serial port at baudrate (or uses the given transport) and hands it to
+		the engine; unless discover is False, numbers the cameras on it"""
+		self._engine = engine
+		self._outbox = deque()
+		super().__init__(port, baudrate, transport, discover)
+
+	def _start(self):
+		self._engine._call(self._engine._register, self)
+
+	def _onreadable(self):
+		try:
+			readbytes = self._transport.read()
+		except (OSError, TypeError):
+			self._engine._unregister(self)
+			self._abort(VISCAError(VISCAError.TIMEOUT))
+			return
+		self._feed(readbytes)
+
+	def _flush(self):
+		"""Writes the frames queued by other threads (called on the engine's thread)"""
+		while (len(self._outbox) > 0):
+			Bus.write(self, self._outbox.popleft())
+
+	def _expire(self):
+		for camera in list(self._cameras.values()):
+			camera._expire()
+
+	def _deadline(self):
+		"""Returns the earliest pipeline deadline of the cameras on the bus, or None"""
+		deadlines = [camera._pipeline.deadline() for camera in list(self._cameras.values())]
+		deadlines = [deadline for deadline in deadlines if (deadline != None)]
+		return min(deadlines) if deadlines else None
+
+	def write(self, frame):
+		if (self._engine._onthread()):
+			Bus.write(self, frame)
+		else:
+			self._outbox.append(frame)
+			self._engine.call_soon(self._flush, self)
+
+	def close(self):
+		"""Takes the port out of the engine and closes it"""
+		self._engine._call(self._engine._unregister, self)
+		self._abort(VISCAError(VISCAError.TIMEOUT))
+		self._transport.close()
+		self.capture(None)
+
+class Engine:
+	"""One thread servicing the reads, writes and timeouts of any number of serial ports
+
+	Every port's descriptor is registered with a selector, so the thread
+	sleeps until a reply arrives or a camera's pipeline has a deadline to
+	keep; frames written from other threads are handed to it through a
+	wakeup socket. Open cameras with engine.camera(port, baudrate), or
+	share a daisy chain through engine.bus(port, baudrate).
+	"""
+
+	def __init__(self):
+		self._selector = selectors.DefaultSelector()
+		self._wakeread, self._wakewrite = socket.socketpair()
+		self._wakeread.setblocking(False)
+		self._wakewrite.setblocking(False)
+		self._selector.register(self._wakeread, selectors.EVENT_READ, None)
+		self._callbacks = deque() # (callback, bus) to run on the engine's thread
+		self._deadlines = [] # heap of (deadline, sequence, bus)
+		self._sequence = 0
+		self._buses = set()
+		self._running = True
+		self._thread = threading.Thread(target=self._run, name="visca-engine", daemon=True)
+		self._thread.start()
+
+	def _onthread(self):
+		return (threading.current_thread() is self._thread)
+
+	def call_soon(self, callback, bus=None):
+		"""Runs callback() on the engine's thread, then reschedules bus's deadline if given"""
+		self._callbacks.append((callback, bus))
+		try:
+			self._wakewrite.send(b"\0")
+		except BlockingIOError:
+			pass # already plenty of wakeups pending
+
+	def _call(self, callback, *args):
+		"""Runs callback(*args) on the engine's thread and waits for it, raising what it raised"""
+		if (self._onthread()) or (not self._running):
+			return callback(*args)
+		done = threading.Event()
+		raised = []
+		def call():
+			try:
+				callback(*args)
+			except Exception as e:
+				raised.append(e)
+			finally:
+				done.set()
+		self.call_soon(call)
+		done.wait()
+		if (len(raised) > 0):
+			raise raised[0]
+
+	def _register(self, bus):
+		self._selector.register(bus._transport.fileno(), selectors.EVENT_READ, bus)
+		self._buses.add(bus)
+
+	def _unregister(self, bus):
+		if (bus in self._buses):
+			self._buses.discard(bus)
+			# looked up rather than asking the transport, whose port may already be closed
+			for key in list(self._selector.get_map().values()):
+				if (key.data is bus):
+					self._selector.unregister(key.fileobj)
+
+	def _fail(self, bus):
+		"""Takes a bus that raised out of the engine and fails what its cameras were waiting on,
+		leaving the other ports running (call from an except clause)"""
+		log.exception("Error servicing a port, removing it from the engine")
+		try:
+			self._unregister(bus)
+		except (OSError, ValueError, KeyError):
+			self._buses.discard(bus)
+		bus._abort(VISCAError(VISCAError.TIMEOUT))
+
+	def _schedule(self, bus):
+		"""Pushes the bus's next deadline onto the heap; stale entries are skipped when popped"""
+		deadline = bus._deadline()
+		if (deadline != None):
+			self._sequence += 1
+			heapq.heappush(self._deadlines, (deadline, self._sequence, bus))
+
+	def _timeout(self):
+		if (len(self._callbacks) > 0):
+			return 0
+		if (len(self._deadlines) == 0):
+			return None
+		return max(0, self._deadlines[0][0] - monotonic())
+
+	def _run(self):
+		while (self._running):
+			for key, events in self._selector.select(self._timeout()):
+				if (key.data == None):
+					try:
+						self._wakeread.recv(4096)
+					except BlockingIOError:
+						pass
+				elif (key.data in self._buses):
+					try:
+						key.data._onreadable()
+						self._schedule(key.data)
+					except Exception:
+						self._fail(key.data)
+			while (len(self._callbacks) > 0):
+				callback, bus = self._callbacks.popleft()
+				try:
+					callback()
+					if (bus != None):
+						self._schedule(bus)
+				except Exception:
+					if (bus != None):
+						self._fail(bus)
+					else:
+						log.exception("Error in engine callback %r", callback)
+			now = monotonic()
+			due = set()
+			while (len(self._deadlines) > 0) and (self._deadlines[0][0] <= now):
+				due.add(heapq.heappop(self._deadlines)[2])
+			for bus in due:
+				if (bus in self._buses):
+					try:
+						bus._expire()
+						self._schedule(bus)
+					except Exception:
+						self._fail(bus)
+
+	def bus(self, port=None, baudrate=None, transport=None, discover=True):
+		"""Opens a port shared by a daisy chain of cameras, serviced by the engine"""
+		return SelectorBus(port, baudrate, transport, self, discover)
+
+	def camera(self, port=None, baudrate=None, transport=None, cls=Camera, **kwargs):
+		"""Opens a Camera (or cls) that has the port to itself, serviced by the engine; kwargs
+		are passed on to the camera"""
+		camera = cls(bus=self.bus(port, baudrate, transport, discover=False), **kwargs)
+		camera._ownsbus = True
+		return camera
+
+	def close(self):
+		"""Closes every port and stops the engine's thread"""
+		for bus in list(self._buses):
+			bus.close()
+		self._running = False
+		self.call_soon(lambda: None)
+		if (not self._onthread()):
+			self._thread.join()
+		self._selector.close()
+		self._wakeread.close()
+		self._wakewrite.close()
@@ -0,0 +1,99 @@
+from concurrent import futures
+from time import monotonic
+from typing import NamedTuple, Any
+from .pipeline import VISCAError
+
+class Outcome(NamedTuple):
+	"""What an operation did on one camera: its value, or the error it failed with, and how long it took"""
+	value: Any
+	error: Exception
+	elapsed: float
+
+class Fleet:
+	"""Runs the same operation on many cameras at once through a bounded thread pool
+
+	Cameras on ports of their own each block only their own worker, so an
+	operation across the fleet takes about as long as the slowest camera
+	rather than the sum of them all. Results come back as {key: Outcome},
+	keys being the names given with the cameras (as a dict) or the cameras
+	themselves.
+	"""
+
+	def __init__(self, cameras, workers=16):
+		"""cameras is a dict of name -> Camera, or a list of Cameras"""
+		self.cameras = dict(cameras) if isinstance(cameras, dict) else dict((camera, camera) for camera in cameras)
+		self._executor = futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="visca-fleet")
+		self._stop = futures.Future() # resolved by cancel()
+
+	def _call(self, operation, key, args, started, timeout):
+		"""Runs operation on a camera (on a worker), waiting for any Command it returns"""
+		started[key] = monotonic()
+		if (self._stop.done()):
+			raise VISCAError(VISCAError.CANCELLED)
+		camera = self.cameras[key]
+		if (callable(operation)):
+			value = operation(camera, *args)
+		else:
+			value = getattr(camera, operation)
+			if (callable(value)):
+				value = value(*args)
+		if (isinstance(value, futures.Future)):
+			value = value.result(max(0, started[key] + timeout - monotonic()))
+		return value
+
+	def run(self, operation, *args, timeout=5):
+		"""Runs operation on every camera, returning {key: Outcome} once each has finished or
+		spent timeout seconds since it started
+
+		operation is the name of a Camera method (called with args) or property
+		(read), or a function called as operation(camera, *args). Commands are
+		waited for until the camera completes them.
+		"""
+		self._stop = futures.Future()
+		started = {} # key -> when its worker picked it up
+		tasks = dict((self._executor.submit(self._call, operation, key, args, started, timeout), key) for key in self.cameras)
+		outcomes = {}
+		pending = set(tasks)
+		while (len(pending) > 0) and (not self._stop.done()):
+			now = monotonic()
+			for task in list(pending):
+				key = tasks[task]
+				if (key in started) and (now - started[key] >= timeout):
+					pending.discard(task) # its worker carries on until the camera gives up, but we don't wait
+					outcomes[key] = Outcome(None, VISCAError(VISCAError.TIMEOUT), now - started[key])
+			# tasks still waiting for a worker have no deadline yet, so check back for them within timeout
+			deadline = min([started[tasks[task]] + timeout for task in pending if (tasks[task] in started)] + [now + timeout])
+			done, waiting = futures.wait(pending | {self._stop}, max(0, deadline - now), futures.FIRST_COMPLETED)
+			for task in done:
+				if (task is self._stop):
+					continue
+				pending.discard(task)
+				key = tasks[task]
+				elapsed = monotonic() - started.get(key, now)
+				try:
+					outcomes[key] = Outcome(task.result(), None, elapsed)
+				except futures.TimeoutError:
+					outcomes[key] = Outcome(None, VISCAError(VISCAError.TIMEOUT), elapsed)
+				except Exception as e:
+					outcomes[key] = Outcome(None, e, elapsed)
+		for task in pending:
+			task.cancel()
+			key = tasks[task]
+			outcomes[key] = Outcome(None, VISCAError(VISCAError.CANCELLED), monotonic() - started.get(key, monotonic()))
+		return outcomes
+
+	def set(self, name, value, timeout=5):
+		"""Sets the named Camera property to value on every camera, waiting for each to complete the command"""
+		setter = lambda camera, value: getattr(type(camera), name).fset(camera, value)
+		return self.run(setter, value, timeout=timeout)
+
+	def cancel(self):
+		"""Makes the operation running (from another thread) return at once, with the cameras that
+		hadn't finished failed with VISCAError.CANCELLED"""
+		if (not self._stop.done()):
+			self._stop.set_result(None)
+
+	def close(self):
+		"""Cancels anything still queued for a worker and shuts the pool down"""
+		self.cancel()
+		self._executor.shutdown(wait=False, cancel_futures=True)
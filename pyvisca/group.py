@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import Future
+from .codec import Codec
+from .pipeline import VISCAError
+
+class CameraGroup:
+	"""Sends the same command to several cameras at once
+
+	When the group is every camera on one discovered daisy chain and the
+	command is in BROADCAST, it goes out as a single broadcast frame (address
+	0x88), which the cameras pass round the chain back to the controller.
+	Otherwise it is queued to every member together. Either way the result
+	is a Future resolved with {camera: None, or the VISCAError it failed
+	with} once every camera has answered.
+	"""
+
+	# Commands every camera can be sent at once, none of them needing a reply of its own
+	BROADCAST = {"power_on", "power_off", "tally_on", "tally_off", "white_balance", "white_balance_trigger",
+		"ae_mode", "picture_effect", "freeze_on", "freeze_off", "preset_recall", "home",
+		"move_stop", "zoom_stop", "focus_stop", "backlight_on", "backlight_off"}
+
+	# How long a broadcast frame may take to come back round the chain
+	TIMEOUT = 1
+
+	def __init__(self, cameras):
+		self.cameras = list(cameras)
+
+	def _broadcastable(self, name):
+		"""Returns the bus to broadcast name on, or None if it has to go to each camera"""
+		if (name not in self.BROADCAST) or (len(self.cameras) < 2):
+			return None
+		bus = self.cameras[0]._bus
+		if (not hasattr(bus, "_sendbroadcast")) or (bus.count != len(self.cameras)):
+			return None # not a bus, or cameras on the chain that aren't in the group
+		if (any((camera._bus is not bus) for camera in self.cameras)):
+			return None
+		if (set(camera.camera_address for camera in self.cameras) != set(range(1, bus.count + 1))):
+			return None
+		return bus
+
+	def send(self, name, *values):
+		"""Sends the named command from Camera.COMMANDS with the given values to every camera"""
+		bus = self._broadcastable(name)
+		if (bus != None):
+			return self._broadcast(bus, name, values)
+		return self._collect(dict((camera, camera._change(camera._send(name, *values))) for camera in self.cameras))
+
+	def call(self, method, *args):
+		"""Calls the named Camera method with args on every camera, for commands that aren't
+		broadcast, and collects the handles it returns"""
+		return self._collect(dict((camera, getattr(camera, method)(*args)) for camera in self.cameras))
+
+	def _broadcast(self, bus, name, values):
+		camera = self.cameras[0]
+		codec = Codec.compile(camera.COMMANDS, camera.INQUIRIES, bus.BROADCAST - 0x80, camera._pan_bytes, camera._tilt_bytes)
+		frame = codec.commands[name].encode(*values)
+		for member in self.cameras:
+			if (member.cache != None):
+				member.cache.invalidate()
+		result = Future()
+		lock = threading.Lock()
+		def finish(error):
+			with lock:
+				if (not result.done()):
+					result.set_result(dict((member, error) for member in self.cameras))
+		echo = bus._sendbroadcast(frame)
+		echo.add_done_callback(lambda echo: finish(VISCAError(VISCAError.TIMEOUT) if (echo.cancelled()) else None))
+		camera._after(self.TIMEOUT, echo.cancel)
+		return result
+
+	def _collect(self, handles):
+		"""Returns a Future resolved with {camera: error or None} once every handle has finished"""
+		result = Future()
+		outcomes = {}
+		lock = threading.Lock()
+		def finished(camera, handle):
+			error = handle.exception() if (not handle.cancelled()) else VISCAError(VISCAError.CANCELLED)
+			with lock:
+				outcomes[camera] = error
+				done = (len(outcomes) == len(handles))
+			if (done):
+				result.set_result(outcomes)
+		for camera, handle in handles.items():
+			handle.add_done_callback(lambda handle, camera=camera: finished(camera, handle))
+		if (len(handles) == 0):
+			result.set_result(outcomes)
+		return result
+
+	def power(self, on=True):
+		return self.send("power_on" if on else "power_off")
+
+	def tally(self, on=True):
+		return self.send("tally_on" if on else "tally_off")
+
+	def white_balance(self, mode):
+		return self.send("white_balance", int(mode))
+
+	def recall_preset(self, slot):
+		return self.send("preset_recall", slot)
+
+	def stop(self):
+		"""Stops every camera's pan/tilt, zoom and focus, returns the result of each of the three"""
+		return [self.send("move_stop"), self.send("zoom_stop"), self.send("focus_stop")]
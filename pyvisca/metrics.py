@@ -0,0 +1,139 @@
+import threading
+from bisect import bisect_left
+from .pipeline import VISCAError
+
+class Histogram:
+	"""Counts of observed values at or below each bucket's upper bound, with their sum"""
+
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1) # the last counts values above every bound
+		self.count = 0
+		self.sum = 0.0
+
+	def observe(self, value):
+		self.counts[bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+
+	def cumulative(self):
+		"""Returns [(upper bound, count of values at or below it)], ending with infinity"""
+		total = 0
+		result = []
+		for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+			total += count
+			result.append((bound, total))
+		return result
+
+class Metrics:
+	"""Counters and latency histograms for the commands a camera sends
+
+	Give a Camera one with cam.metrics = Metrics(); until then nothing is
+	recorded, at the cost of one None check per command. Latency runs from
+	a frame being written to the reply that finishes it, per command name
+	(as in Camera.COMMANDS and Camera.INQUIRIES). Read it with snapshot()
+	or prometheus().
+	"""
+
+	# Upper bounds of the latency histogram buckets, in seconds
+	BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+	ERRORS = {
+		VISCAError.TIMEOUT: "timeout",
+		VISCAError.SYNTAX_ERROR: "syntax_error",
+		VISCAError.BUFFER_FULL: "buffer_full",
+		VISCAError.CANCELLED: "cancelled",
+		VISCAError.NO_SOCKET: "no_socket",
+		VISCAError.NOT_EXECUTABLE: "not_executable",
+	}
+
+	def __init__(self, buckets=None):
+		self.buckets = tuple(buckets) if buckets else self.BUCKETS
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self.latency = {} # command name -> Histogram
+			self.errors = dict((name, 0) for name in self.ERRORS.values())
+			self.errors["other"] = 0
+			self.commands = 0
+			self.bytes_out = 0
+			self.bytes_in = 0
+			self.queue_depth = 0
+			self.max_queue_depth = 0
+
+	def _submitted(self, command, depth):
+		"""Records a command queued behind depth others and watches for it finishing (called by the camera)"""
+		with self._lock:
+			self.commands += 1
+			self.queue_depth = depth
+			self.max_queue_depth = max(self.max_queue_depth, depth)
+		command.add_done_callback(self._finished)
+
+	def _finished(self, command):
+		if (command.cancelled()):
+			return
+		error = command.exception()
+		with self._lock:
+			if (error != None):
+				name = self.ERRORS.get(error.code, "other") if isinstance(error, VISCAError) else "other"
+				self.errors[name] += 1
+			elif (command.sent != None) and (command.completed != None):
+				name = command.name if (command.name != None) else "raw"
+				histogram = self.latency.get(name)
+				if (histogram == None):
+					histogram = self.latency[name] = Histogram(self.buckets)
+				histogram.observe(command.completed - command.sent)
+
+	def _written(self, size, depth):
+		with self._lock:
+			self.bytes_out += size
+			self.queue_depth = depth
+
+	def _read(self, size):
+		with self._lock:
+			self.bytes_in += size
+
+	def snapshot(self):
+		"""Returns every metric as a dict of plain values"""
+		with self._lock:
+			return {
+				"commands": self.commands,
+				"errors": dict(self.errors),
+				"bytes_out": self.bytes_out,
+				"bytes_in": self.bytes_in,
+				"queue_depth": self.queue_depth,
+				"max_queue_depth": self.max_queue_depth,
+				"latency": dict((name, {"count": histogram.count, "sum": histogram.sum, "buckets": histogram.cumulative()})
+					for name, histogram in self.latency.items()),
+			}
+
+	def prometheus(self, prefix="visca", labels=None):
+		"""Returns every metric in the Prometheus text exposition format, with labels (a dict,
+		such as {"camera": "stage-left"}) added to each sample"""
+		snapshot = self.snapshot()
+		base = "".join(',{}="{}"'.format(key, value) for key, value in sorted((labels or {}).items()))
+		def sample(name, value, extra=""):
+			text = (extra + base).lstrip(",")
+			return "{}_{}{} {}".format(prefix, name, ("{" + text + "}") if text else "", value)
+		lines = []
+		def metric(name, kind, help, samples):
+			lines.append("# HELP {}_{} {}".format(prefix, name, help))
+			lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+			lines.extend(samples)
+		metric("commands_total", "counter", "Frames queued to the camera", [sample("commands_total", snapshot["commands"])])
+		metric("errors_total", "counter", "Commands that failed, by reason",
+			[sample("errors_total", count, ',reason="{}"'.format(reason)) for reason, count in sorted(snapshot["errors"].items())])
+		metric("bytes_out_total", "counter", "Bytes written to the camera", [sample("bytes_out_total", snapshot["bytes_out"])])
+		metric("bytes_in_total", "counter", "Bytes received from the camera", [sample("bytes_in_total", snapshot["bytes_in"])])
+		metric("queue_depth", "gauge", "Frames waiting to be written", [sample("queue_depth", snapshot["queue_depth"])])
+		histograms = []
+		for name, histogram in sorted(snapshot["latency"].items()):
+			command = ',command="{}"'.format(name)
+			for bound, count in histogram["buckets"]:
+				histograms.append(sample("command_seconds_bucket", count, command + ',le="{}"'.format("+Inf" if (bound == float("inf")) else bound)))
+			histograms.append(sample("command_seconds_sum", histogram["sum"], command))
+			histograms.append(sample("command_seconds_count", histogram["count"], command))
+		metric("command_seconds", "histogram", "Time from a frame being written to the reply that finished it", histograms)
+		return "\n".join(lines) + "\n"
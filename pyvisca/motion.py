@@ -0,0 +1,150 @@
+import threading
+from collections import deque
+from time import monotonic
+from .pipeline import Command
+
+class MotionController:
+	"""Drives a camera's pan/tilt, zoom and focus from continuous velocity set-points
+
+	Call set() as often as the joystick is polled, from any thread; only
+	changes are sent. A move still waiting in the camera's queue when a newer
+	set-point arrives is dropped in favour of it, stops jump the queue, and
+	moves are held back to what the link can carry (stops never are). Get one
+	with cam.motion.
+
+	Pan is positive to the right, tilt positive up, zoom positive towards
+	telephoto and focus positive towards far; the magnitude is the speed.
+	"""
+
+	MAX_PAN_SPEED = 0x18
+	MAX_TILT_SPEED = 0x18
+	MAX_ZOOM_SPEED = 0x07
+	MAX_FOCUS_SPEED = 0x07
+
+	# Share of the link's bytes motion commands may use, leaving room for everything else
+	SHARE = 0.5
+
+	def __init__(self, camera, byterate=None):
+		"""byterate is the link's capacity in bytes per second, taken from the camera's bus if
+		not given; None leaves pacing to the camera's acknowledgements alone"""
+		self._camera = camera
+		self.byterate = byterate if (byterate != None) else camera._bus.byterate
+		self._lock = threading.Lock()
+		self._velocity = {"pan": 0, "tilt": 0, "zoom": 0, "focus": 0}
+		self._sent = dict((group, frame) for group, (frame, stop) in self._frames().items()) # axis group -> last frame submitted
+		self._queued = {} # axis group -> Command handle of that frame
+		self._failed = deque() # (group, frame) the camera didn't run, for _flush() to forget
+		self._allowance = 0
+		self._refilled = monotonic()
+		self._timer = None
+		self.sent = 0
+		self.dropped = 0
+
+	def _clamp(self, value, limit):
+		return max(-limit, min(limit, int(value)))
+
+	def _frames(self):
+		"""Returns the frame each axis group should be running, as {group: (frame, is a stop)}"""
+		commands = self._camera._codec.commands
+		pan = self._velocity["pan"]
+		tilt = self._velocity["tilt"]
+		zoom = self._velocity["zoom"]
+		focus = self._velocity["focus"]
+		frames = {}
+		if (pan == 0) and (tilt == 0):
+			frames["pantilt"] = (commands["move_stop"].encode(), True)
+		else:
+			pandirection = 0x03 if (pan == 0) else (0x02 if (pan > 0) else 0x01)
+			tiltdirection = 0x03 if (tilt == 0) else (0x01 if (tilt > 0) else 0x02)
+			frames["pantilt"] = (commands["pantilt_drive"].encode(max(1, abs(pan)), max(1, abs(tilt)), pandirection, tiltdirection), False)
+		if (zoom == 0):
+			frames["zoom"] = (commands["zoom_stop"].encode(), True)
+		else:
+			frames["zoom"] = (commands["zoom_tele" if (zoom > 0) else "zoom_wide"].encode(abs(zoom)), False)
+		if (focus == 0):
+			frames["focus"] = (commands["focus_stop"].encode(), True)
+		else:
+			frames["focus"] = (commands["focus_far_variable" if (focus > 0) else "focus_near_variable"].encode(abs(focus)), False)
+		return frames
+
+	def _refill(self, now):
+		"""Tops up the bytes motion commands may send, returns how many are available"""
+		rate = self.byterate * self.SHARE
+		burst = max(16, rate / 10)
+		self._allowance = min(burst, self._allowance + (now - self._refilled) * rate)
+		self._refilled = now
+		return self._allowance
+
+	def _flush(self):
+		"""Submits whatever differs from what was last sent (call with the lock held)"""
+		while (len(self._failed) > 0):
+			group, frame = self._failed.popleft()
+			if (self._sent.get(group) == frame):
+				del self._sent[group]
+		now = monotonic()
+		wait = None
+		for group, (frame, stop) in self._frames().items():
+			if (frame == self._sent.get(group)):
+				continue
+			if (not stop) and (self.byterate != None) and (self._refill(now) < len(frame)):
+				short = (len(frame) - self._allowance) / (self.byterate * self.SHARE)
+				wait = short if (wait == None) else min(wait, short)
+				continue
+			queued = self._queued.get(group)
+			if (queued != None) and (queued.cancel()):
+				self.dropped += 1 # never written, so nothing to undo
+			handle = self._camera._submit(frame, urgent=stop, name="motion_" + group, priority=Command.STOP if (stop) else Command.MOTION)
+			handle.add_done_callback(self._finished(group, frame))
+			self._sent[group] = frame
+			self._queued[group] = handle
+			self.sent += 1
+			if (self.byterate != None):
+				self._allowance -= len(frame)
+		if (wait != None) and (self._timer == None):
+			self._timer = self._camera._after(wait, self._wake)
+
+	def _finished(self, group, frame):
+		"""Makes a callback that has a frame the camera didn't run forgotten, so it is sent again"""
+		def finished(handle):
+			if (handle.cancelled()) or (handle.wait(0)):
+				return
+			# _sent is only touched under the lock, but taking it here (on the bus's thread,
+			# holding the camera's lock) would deadlock against _flush() submitting, so the
+			# next _flush() forgets it instead
+			self._failed.append((group, frame))
+		return finished
+
+	def _wake(self):
+		with self._lock:
+			self._timer = None
+			self._flush()
+
+	def set(self, pan=None, tilt=None, zoom=None, focus=None):
+		"""Sets the velocity of the given axes, leaving the others as they are"""
+		with self._lock:
+			if (pan != None):
+				self._velocity["pan"] = self._clamp(pan, self.MAX_PAN_SPEED)
+			if (tilt != None):
+				self._velocity["tilt"] = self._clamp(tilt, self.MAX_TILT_SPEED)
+			if (zoom != None):
+				self._velocity["zoom"] = self._clamp(zoom, self.MAX_ZOOM_SPEED)
+			if (focus != None):
+				self._velocity["focus"] = self._clamp(focus, self.MAX_FOCUS_SPEED)
+			self._flush()
+
+	def stop(self):
+		"""Stops every axis, whether or not it was moved through the controller"""
+		with self._lock:
+			self._sent.clear()
+		self.set(0, 0, 0, 0)
+
+	def stats(self):
+		with self._lock:
+			return {"sent": self.sent, "dropped": self.dropped}
+
+	def close(self):
+		"""Cancels any held back set-point"""
+		with self._lock:
+			if (self._timer != None):
+				self._timer.cancel()
+				self._timer = None
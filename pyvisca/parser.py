@@ -0,0 +1,97 @@
+from operator import itemgetter
+
+_first = itemgetter(0)
+
+class FrameParser:
+	"""Splits the byte stream read from a transport into VISCA frames
+
+	Bytes are fed in as they arrive and complete frames come out, however the
+	stream was chunked: a frame split across reads is held until the rest
+	arrives and joined to it in one step. Frames are returned as the header
+	byte and payload, without the 0xFF terminator. Bytes that can't start a
+	frame are skipped up to the next header byte (0x80 to 0xFE), and runts
+	and over-long frames are dropped; each of these counts as one framing
+	error.
+	"""
+
+	# VISCA frames are at most 16 bytes; leave room for vendor extensions
+	MAX_FRAME = 32
+
+	def __init__(self):
+		self._partial = b"" # the start of a frame whose terminator hasn't arrived, beginning with its header
+		self._skipping = False # dropping the rest of an over-long frame
+		self.frames = 0
+		self.errors = 0
+		self.discarded = 0
+
+	def reset(self):
+		"""Drops any partial frame, as after the port was reopened"""
+		self._partial = b""
+		self._skipping = False
+
+	def _error(self, count):
+		self.errors += 1
+		self.discarded += count
+
+	def feed(self, data):
+		"""Takes bytes read from the transport and returns a list of the frames they complete"""
+		if (self._skipping):
+			end = data.find(b"\xff")
+			if (end < 0):
+				self.discarded += len(data)
+				return []
+			self.discarded += end + 1
+			self._skipping = False
+			data = data[end + 1:]
+		if (len(self._partial) > 0):
+			data = self._partial + data
+		parts = data.split(b"\xff")
+		self._hold(parts.pop())
+		if (len(parts) == 0):
+			return parts
+		# the usual read, nothing but well-formed frames, is checked in C-level passes and taken whole
+		if (min(map(len, parts)) > 1) and (max(map(len, parts)) < self.MAX_FRAME) and (min(map(_first, parts)) >= 0x80):
+			self.frames += len(parts)
+			return parts
+		frames = []
+		for part in parts:
+			part = self._skipgarbage(part, True)
+			if (part == None):
+				continue
+			if (len(part) < 2) or (len(part) >= self.MAX_FRAME):
+				self._error(len(part) + 1) # a runt, or over-long
+				continue
+			self.frames += 1
+			frames.append(part)
+		return frames
+
+	def _skipgarbage(self, part, complete):
+		"""Drops the bytes before the header of a part (counting them as an error), returns
+		what is left, or None if nothing (its terminator too, if complete)"""
+		header = 0
+		while (header < len(part)) and (part[header] < 0x80):
+			header += 1
+		if (header == len(part)):
+			if (header > 0) or (complete):
+				self._error(header + complete)
+			return None
+		if (header > 0):
+			self._error(header)
+			part = part[header:]
+		return part
+
+	def _hold(self, tail):
+		"""Keeps the bytes after the last terminator as the start of the next frame"""
+		self._partial = b""
+		if (len(tail) > 0) and (tail[0] < 0x80):
+			tail = self._skipgarbage(tail, False)
+			if (tail == None):
+				return
+		if (len(tail) >= self.MAX_FRAME):
+			self._error(len(tail))
+			self._skipping = True
+			return
+		self._partial = tail
+
+	def stats(self):
+		return {"frames": self.frames, "errors": self.errors, "discarded": self.discarded}
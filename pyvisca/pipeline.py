@@ -0,0 +1,267 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, CancelledError, TimeoutError as FutureTimeoutError
+
+class VISCAError(Exception):
+	"""Error reply (or missing reply) from a camera"""
+
+	SYNTAX_ERROR = 0x02
+	BUFFER_FULL = 0x03
+	CANCELLED = 0x04
+	NO_SOCKET = 0x05
+	NOT_EXECUTABLE = 0x41
+	TIMEOUT = None
+
+	MESSAGES = {
+		SYNTAX_ERROR: "Syntax error",
+		BUFFER_FULL: "Command buffer full",
+		CANCELLED: "Command cancelled",
+		NO_SOCKET: "No socket",
+		NOT_EXECUTABLE: "Command not executable",
+		TIMEOUT: "Timeout waiting for response",
+	}
+
+	def __init__(self, code, socket=0):
+		self.code = code
+		self.socket = socket
+		if (code in self.MESSAGES):
+			super().__init__(self.MESSAGES[code])
+		else:
+			super().__init__("Error " + hex(code))
+
+class Command(Future):
+	"""Handle for a frame queued to a camera, resolved with the reply that completes it
+
+	For commands this is the completion (0x5y) reply, for inquiries the inquiry
+	reply. Errors are raised from result() as VISCAError. name is the
+	COMMANDS or INQUIRIES entry the frame came from, if any, and priority
+	one of the levels below (LOW for inquiries and NORMAL for commands
+	unless given).
+	"""
+
+	# Priorities, queued frames being written highest first
+	LOW = 0 # inquiries, dropped if they wait longer than their timeout to be written
+	NORMAL = 1 # settings
+	MOTION = 2
+	STOP = 3 # may have an executing command cancelled to make room
+
+	def __init__(self, frame, inquiry=False, timeout=2, name=None, priority=None):
+		super().__init__()
+		self.frame = frame
+		self.name = name
+		self.inquiry = inquiry
+		self.timeout = timeout
+		self.priority = priority if (priority != None) else (self.LOW if (inquiry) else self.NORMAL)
+		self.socket = None
+		self.queued = None
+		self.sent = None
+		self.completed = None
+		self.accepted = threading.Event()
+
+	def wait(self, timeout=None):
+		"""Waits for the command to finish, returns True if the camera completed it"""
+		try:
+			self.result(timeout)
+		except (VISCAError, CancelledError, FutureTimeoutError):
+			return False
+		return True
+
+	def __await__(self):
+		"""Lets asyncio code await the command directly"""
+		return asyncio.wrap_future(self).__await__()
+
+class Pipeline:
+	"""Tracks the frames queued for one camera, the one awaiting its first reply
+	and the commands executing in the camera's command sockets
+
+	This does no I/O of its own: the owner writes a cancel for each socket
+	in cancels and then whatever next() hands out, feeds every reply for the
+	camera to receive() and calls expire() periodically, all while holding
+	its own lock. The queue is kept in order of priority, and a STOP that
+	finds every socket busy has the least important executing command
+	cancelled to make room for it.
+	"""
+
+	# How long to back off after the camera reports its command buffer full
+	BUSY_RETRY = 0.05
+
+	def __init__(self, sockets=2):
+		self.sockets = sockets
+		self.queue = deque()
+		self.pending = None
+		self.executing = {} # socket number -> Command
+		self.cancels = deque() # sockets to send a cancel for
+		self._cancelling = set() # sockets a cancel has been sent for
+		self._retryat = 0
+		self._fullsince = None
+
+	def submit(self, command, urgent=False, now=None):
+		"""Queues a command behind those of the same or higher priority, or ahead of
+		everything already queued if urgent; LOW ones only go stale if now is given"""
+		command.queued = now
+		if (urgent):
+			self.queue.appendleft(command)
+			return
+		index = len(self.queue)
+		while (index > 0) and (self.queue[index - 1].priority < command.priority):
+			index -= 1
+		if (index == len(self.queue)):
+			self.queue.append(command)
+		else:
+			self.queue.insert(index, command)
+
+	def cancel(self, command):
+		"""Drops a queued command, or arranges for the camera to cancel an executing one;
+		returns False if it is too late for either"""
+		if (command in self.queue):
+			self.queue.remove(command)
+			if (not command.cancel()):
+				command.set_exception(VISCAError(VISCAError.CANCELLED)) # already running, put back after a full buffer
+			return True
+		if (self.executing.get(command.socket) is command):
+			if (command.socket not in self._cancelling):
+				self._cancelling.add(command.socket)
+				self.cancels.append(command.socket)
+			return True
+		return False
+
+	def _preempt(self):
+		"""Has the least important (then oldest) executing command below STOP cancelled, unless
+		one is already being cancelled"""
+		if (len(self._cancelling) > 0):
+			return
+		candidates = [command for command in self.executing.values() if (command.priority < Command.STOP)]
+		if (len(candidates) > 0):
+			self.cancel(min(candidates, key=lambda command: (command.priority, command.sent)))
+
+	def _dropstale(self, now):
+		"""Fails queued inquiries that have waited longer than their timeout to be written"""
+		stale = [command for command in self.queue if (command.priority == Command.LOW) and (command.queued != None) and (now - command.queued >= command.timeout)]
+		for command in stale:
+			self.queue.remove(command)
+			if (command.running() or command.set_running_or_notify_cancel()):
+				command.completed = now
+				command.set_exception(VISCAError(VISCAError.TIMEOUT))
+
+	def next(self, now):
+		"""Returns the next command to write, or None if it has to wait"""
+		if (self.pending != None) or (len(self.queue) == 0) or (now < self._retryat):
+			return None
+		self._dropstale(now)
+		if (len(self.queue) == 0):
+			return None
+		command = self.queue[0]
+		if (not command.inquiry) and (len(self.executing) >= self.sockets):
+			if (command.priority == Command.STOP):
+				self._preempt()
+			# every socket is busy, but don't wait forever on a completion the camera may never send
+			if (self._fullsince == None):
+				self._fullsince = now
+			if (now - self._fullsince < command.timeout):
+				return None
+		self._fullsince = None
+		self.queue.popleft()
+		if (command.running() or command.set_running_or_notify_cancel()):
+			command.sent = now
+			self.pending = command
+			return command
+		return self.next(now)
+
+	def deadline(self):
+		"""Returns the time at which expire() or next() next has something to do, or None"""
+		deadlines = [command.queued + command.timeout for command in self.queue if (command.priority == Command.LOW) and (command.queued != None)]
+		if (self.pending != None):
+			deadlines.append(self.pending.sent + self.pending.timeout)
+		elif (len(self.queue) > 0):
+			if (self._fullsince != None):
+				deadlines.append(max(self._retryat, self._fullsince + self.queue[0].timeout))
+			else:
+				deadlines.append(self._retryat)
+		return min(deadlines) if deadlines else None
+
+	def expire(self, now):
+		"""Fails the command awaiting its first reply if it has waited too long, and queued
+		inquiries that have waited too long to be written"""
+		self._dropstale(now)
+		command = self.pending
+		if (command != None) and (now - command.sent >= command.timeout):
+			self.pending = None
+			command.completed = now
+			command.set_exception(VISCAError(VISCAError.TIMEOUT))
+
+	def receive(self, response, now):
+		"""Applies a reply from the camera (without the address byte or terminator)"""
+		kind = response[0] & 0xF0
+		socket = response[0] & 0x0F
+		if (kind == 0x40):
+			command = self.pending
+			if (command == None):
+				return
+			self.pending = None
+			if (socket in self.executing):
+				# the camera reused the socket, so the old command finished without telling us
+				finished = self.executing.pop(socket)
+				finished.completed = now
+				finished.set_result(None)
+			command.socket = socket
+			self.executing[socket] = command
+			command.accepted.set()
+		elif (kind == 0x50):
+			if (socket == 0):
+				command = self.pending
+				self.pending = None
+			else:
+				command = self.executing.pop(socket, None)
+				self._retryat = 0
+				self._cancelling.discard(socket)
+			if (command != None):
+				command.completed = now
+				command.accepted.set()
+				command.set_result(response)
+		elif (kind == 0x60):
+			code = response[1] if (len(response) > 1) else None
+			self._cancelling.discard(socket)
+			if (code == VISCAError.NO_SOCKET):
+				return # answer to a cancel for a command that had already finished
+			if (code == VISCAError.BUFFER_FULL) and (self.pending != None):
+				# flow control: put the command back and retry once a socket frees up
+				command = self.pending
+				self.pending = None
+				self.queue.appendleft(command)
+				self._retryat = now + (command.timeout if self.executing else self.BUSY_RETRY)
+				return
+			if (socket in self.executing) and ((code == VISCAError.CANCELLED) or (self.pending == None)):
+				command = self.executing.pop(socket)
+				self._retryat = 0
+			else:
+				command = self.pending
+				self.pending = None
+			if (command != None):
+				command.completed = now
+				command.set_exception(VISCAError(code, socket))
+
+	def fail(self, command, error):
+		"""Forgets a command wherever it is and fails it with error, unless it has already finished"""
+		if (command in self.queue):
+			self.queue.remove(command)
+		if (self.pending is command):
+			self.pending = None
+		if (command.socket != None) and (self.executing.get(command.socket) is command):
+			del self.executing[command.socket]
+		if (not command.done()):
+			command.set_exception(error)
+
+	def abort(self, error):
+		"""Fails every queued, pending and executing command"""
+		commands = list(self.queue) + list(self.executing.values())
+		if (self.pending != None):
+			commands.append(self.pending)
+		self.queue.clear()
+		self.executing.clear()
+		self.cancels.clear()
+		self._cancelling.clear()
+		self.pending = None
+		for command in commands:
+			if (not command.done()):
+				command.set_exception(error)
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from struct import Struct
+from typing import NamedTuple
+
+class Preset(NamedTuple):
+	"""A stored position: pan and tilt as the camera reports them, zoom and focus 0 to 0x4000 (or beyond)"""
+	pan: int
+	tilt: int
+	zoom: int
+	focus: int
+
+def _arrival(handles):
+	"""Returns a Future resolved with True once every handle has completed, or with the
+	first handle's error if any fails"""
+	arrived = Future()
+	remaining = [len(handles)]
+	lock = threading.Lock()
+	def finished(handle):
+		error = handle.exception() if (not handle.cancelled()) else None
+		with lock:
+			remaining[0] -= 1
+			last = (remaining[0] == 0)
+		if (arrived.done()):
+			return
+		if (error != None):
+			arrived.set_exception(error)
+		elif (last):
+			arrived.set_result(True)
+	for handle in handles:
+		handle.add_done_callback(finished)
+	return arrived
+
+class PresetBank:
+	"""Presets kept in software, any number of them, for any number of cameras
+
+	Presets are stored by (camera, name), camera being whatever key the
+	caller uses to tell its cameras apart. capture() reads a camera's
+	position in one pipelined pass and recall() drives it back there at a
+	chosen speed. A whole fleet's presets load from and save to one file
+	(a MAGIC header, then per preset a length-prefixed UTF-8 camera key and
+	name and the position packed as RECORD).
+	"""
+
+	MAGIC = b"VISCAPRE\x01\n"
+	RECORD = Struct("<IIHH")
+	LENGTH = Struct("<BB")
+	# The most each field of a RECORD holds
+	LIMITS = (0xFFFFFFFF, 0xFFFFFFFF, 0xFFFF, 0xFFFF)
+
+	INQUIRIES = ["pantilt", "zoom_position", "focus_position"]
+
+	def __init__(self, path=None):
+		"""Loads the presets saved at path, if given and the file exists; save() writes them back there"""
+		self.path = path
+		self._lock = threading.Lock()
+		self._presets = {} # (camera key, name) -> Preset
+		if (path != None) and (os.path.exists(path)):
+			self.load(path)
+
+	def _store(self, camera, key, name, replies):
+		if (None in replies):
+			raise ValueError("The camera didn't report its position")
+		pantilt, zoom, focus = [camera._decode(inquiry, reply) for inquiry, reply in zip(self.INQUIRIES, replies)]
+		preset = Preset(pantilt["pan"], pantilt["tilt"], zoom, focus)
+		self[key, name] = preset
+		return preset
+
+	async def _storeasync(self, camera, key, name, replies):
+		return self._store(camera, key, name, [await reply for reply in replies])
+
+	def capture(self, camera, name, key=""):
+		"""Reads the camera's pan/tilt, zoom and focus positions and stores them as preset name,
+		returning the Preset (awaitable from an AsyncCamera); raises ValueError if the camera
+		doesn't answer"""
+		handles = [camera._submit(camera._codec.inquiries[inquiry][0], True, name=inquiry) for inquiry in self.INQUIRIES]
+		replies = [camera._reply(handle) for handle in handles] # checked before decoding, which defaults to 0
+		if (asyncio.iscoroutine(replies[0])):
+			return self._storeasync(camera, key, name, replies)
+		return self._store(camera, key, name, replies)
+
+	def recall(self, camera, name, key="", speed=0x18):
+		"""Moves the camera to preset name, panning and tilting at speed (1 to 0x18) while zooming
+		and focusing; returns a Future resolved with True when it arrives"""
+		preset = self[key, name]
+		return _arrival([
+			camera.move_to(speed, preset.pan, preset.tilt),
+			camera._send("zoomfocus_direct", preset.zoom, preset.focus), # the raw positions, exactly as captured
+		])
+
+	def __getitem__(self, keyname):
+		with self._lock:
+			return self._presets[keyname]
+
+	def __setitem__(self, keyname, preset):
+		"""Stores a preset as (camera key, name); each must be at most 255 bytes as UTF-8, the
+		most a file's LENGTH can hold, and the position within the LIMITS of a RECORD"""
+		for part in keyname:
+			if (len(part.encode("utf-8")) > 0xFF):
+				raise ValueError("Preset keys and names are limited to 255 bytes of UTF-8: " + repr(part))
+		preset = Preset(*preset)
+		for field, value, limit in zip(Preset._fields, preset, self.LIMITS):
+			if (not 0 <= value <= limit):
+				raise ValueError("Preset " + field + " out of range (0 to " + hex(limit) + "): " + repr(value))
+		with self._lock:
+			self._presets[keyname] = preset
+
+	def __delitem__(self, keyname):
+		with self._lock:
+			del self._presets[keyname]
+
+	def __contains__(self, keyname):
+		return keyname in self._presets
+
+	def __len__(self):
+		return len(self._presets)
+
+	def names(self, key=""):
+		"""Returns the names of the presets stored for camera key"""
+		with self._lock:
+			return [name for (camera, name) in self._presets if (camera == key)]
+
+	def update(self, other, keys=None):
+		"""Copies the presets of another PresetBank (only those of the given camera keys, if
+		given) into this one, replacing any of the same name"""
+		with other._lock:
+			presets = [(keyname, preset) for keyname, preset in other._presets.items() if (keys == None) or (keyname[0] in keys)]
+		with self._lock:
+			self._presets.update(presets)
+
+	def load(self, path):
+		"""Adds the presets saved in the file at path, replacing any of the same name"""
+		with open(path, "rb") as file:
+			data = file.read()
+		if (data[:len(self.MAGIC)] != self.MAGIC):
+			raise ValueError(path + " is not a preset file")
+		presets = {}
+		unpack = self.RECORD.unpack_from
+		lengths = self.LENGTH.unpack_from
+		offset = len(self.MAGIC)
+		while (offset < len(data)):
+			keylength, namelength = lengths(data, offset)
+			offset += self.LENGTH.size
+			key = data[offset:offset + keylength].decode("utf-8")
+			offset += keylength
+			name = data[offset:offset + namelength].decode("utf-8")
+			offset += namelength
+			presets[key, name] = Preset(*unpack(data, offset))
+			offset += self.RECORD.size
+		with self._lock:
+			self._presets.update(presets)
+
+	def save(self, path=None, keys=None):
+		"""Writes the presets (only those of the given camera keys, if given) to path, or the
+		path the bank was loaded from; the file is replaced in one step"""
+		path = path if (path != None) else self.path
+		parts = [self.MAGIC]
+		with self._lock:
+			for (key, name), preset in self._presets.items():
+				if (keys != None) and (key not in keys):
+					continue
+				key = key.encode("utf-8")
+				name = name.encode("utf-8")
+				parts.append(self.LENGTH.pack(len(key), len(name)) + key + name + self.RECORD.pack(*preset))
+		with open(path + ".tmp", "wb") as file:
+			file.write(b"".join(parts))
+		os.replace(path + ".tmp", path)
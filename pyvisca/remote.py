@@ -0,0 +1,214 @@
+import logging
+import os
+import socket
+import threading
+from struct import Struct
+from concurrent.futures import InvalidStateError, TimeoutError as FutureTimeoutError
+from time import monotonic
+from .visca import Camera
+from .pipeline import Command, VISCAError
+
+log = logging.getLogger("pyvisca")
+
+SOCKET = "/tmp/pyvisca.sock"
+
+# Request: payload length, request id, camera index, flags, timeout in milliseconds, then the frame
+REQUEST = Struct("<HIBBH")
+# Reply: payload length, request id, status, error code, then the reply (without the address byte)
+REPLY = Struct("<HIBB")
+
+INQUIRY = 0x01
+URGENT = 0x02
+# Not a frame but the path of a file to capture the camera's port to, empty to stop
+CAPTURE = 0x04
+# Not a frame but the request id of one of the client's commands to cancel, as a CANCEL_ID
+CANCEL = 0x08
+CANCEL_ID = Struct("<I")
+# The request's Command priority is in the flags' upper nibble
+PRIORITY_SHIFT = 4
+
+OK = 0
+ERROR = 1
+
+# Error code sent for a timeout, whose VISCAError code is None
+TIMEOUT = 0xFF
+
+def _receive(sock, size):
+	"""Reads exactly size bytes, returns None if the socket closed first"""
+	data = bytearray()
+	while (len(data) < size):
+		chunk = sock.recv(size - len(data))
+		if (len(chunk) == 0):
+			return None
+		data += chunk
+	return bytes(data)
+
+class DaemonConnection:
+	"""A client's connection to a Daemon, shared by the RemoteCameras using it
+
+	Stands in for the Bus of a RemoteCamera: frames go to the daemon as
+	requests and replies come back on a reader thread. Listeners are called
+	with every reply, which (unlike on a Bus) never includes acknowledgements.
+	"""
+
+	def __init__(self, path=SOCKET):
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._socket.connect(path)
+		self._sendlock = threading.Lock()
+		self._lock = threading.Lock()
+		self._pending = {} # request id -> (Command, camera address)
+		self._ident = 0
+		self._cameras = set()
+		self._listeners = []
+		self.byterate = None # unknown from here, and the daemon paces the port anyway
+		self._reader = threading.Thread(target=self._readloop, name="visca-daemon-reader", daemon=True)
+		self._reader.start()
+
+	def request(self, index, address, command, urgent=False, flags=0):
+		"""Sends command to the daemon's camera index (with any other flags given), resolving
+		it when the reply arrives"""
+		if (not command.set_running_or_notify_cancel()):
+			return # cancelled before it was sent
+		with self._lock:
+			self._ident = (self._ident + 1) & 0xFFFFFFFF
+			ident = self._ident
+			self._pending[ident] = (command, address)
+		flags |= (INQUIRY if (command.inquiry) else 0) | (URGENT if (urgent) else 0) | (command.priority << PRIORITY_SHIFT)
+		timeout = min(0xFFFF, int(command.timeout * 1000))
+		command.sent = monotonic()
+		try:
+			with self._sendlock:
+				self._socket.sendall(REQUEST.pack(len(command.frame), ident, index, flags, timeout) + command.frame)
+		except OSError:
+			with self._lock:
+				self._pending.pop(ident, None)
+			command.set_exception(VISCAError(VISCAError.TIMEOUT))
+
+	def cancel(self, index, command, timeout=2):
+		"""Has the daemon cancel command (see Camera.cancel), returns False if it has already
+		finished or the daemon couldn't"""
+		with self._lock:
+			ident = next((ident for ident, (pending, address) in self._pending.items() if (pending is command)), None)
+		if (ident == None):
+			return False
+		handle = Command(CANCEL_ID.pack(ident), timeout=timeout)
+		self.request(index, None, handle, flags=CANCEL)
+		return handle.wait(timeout)
+
+	def _readloop(self):
+		try:
+			while (True):
+				header = _receive(self._socket, REPLY.size)
+				if (header == None):
+					break
+				length, ident, status, code = REPLY.unpack(header)
+				data = _receive(self._socket, length) if (length > 0) else b""
+				if (data == None):
+					break
+				self._resolve(ident, status, code, list(data))
+		except OSError:
+			pass
+		except Exception:
+			log.exception("Error reading from the daemon")
+		with self._lock:
+			pending = list(self._pending.values())
+			self._pending.clear()
+		for command, address in pending:
+			self._settle(command, exception=VISCAError(VISCAError.TIMEOUT))
+
+	def _resolve(self, ident, status, code, response):
+		with self._lock:
+			command, address = self._pending.pop(ident, (None, None))
+		if (command == None):
+			return
+		if (not command.done()):
+			command.completed = monotonic()
+			command.accepted.set()
+		if (status == OK):
+			for listener in list(self._listeners):
+				try:
+					listener(address, response)
+				except Exception:
+					log.exception("Error in daemon connection listener %r", listener)
+			self._settle(command, response)
+		else:
+			self._settle(command, exception=VISCAError(None if (code == TIMEOUT) else code))
+
+	def _settle(self, command, result=None, exception=None):
+		"""Resolves command unless it was already given up on (timed out waiting, or failed by
+		the camera) while its reply was on the way"""
+		if (command.done()):
+			return
+		try:
+			if (exception != None):
+				command.set_exception(exception)
+			else:
+				command.set_result(result)
+		except InvalidStateError:
+			pass # given up on from another thread in between
+
+	def attach(self, camera):
+		self._cameras.add(camera)
+
+	def detach(self, camera):
+		self._cameras.discard(camera)
+
+	def add_listener(self, callback):
+		self._listeners.append(callback)
+
+	def remove_listener(self, callback):
+		self._listeners.remove(callback)
+
+	def close(self):
+		try:
+			self._socket.shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+		self._socket.close()
+		if (self._reader is not threading.current_thread()):
+			self._reader.join()
+
+class RemoteCamera(Camera):
+	"""Camera whose frames go through a Daemon instead of a port of its own
+
+	Every Camera method and property works as usual, capture() recording
+	and cancel() cancelling through the daemon, which owns the port (and
+	whose pipeline has STOP commands preempt others as usual). camera is the daemon's
+	index for the camera; address only needs to match for cameras whose
+	replies are decoded by address. Cameras in one process can share a
+	DaemonConnection by passing it as connection.
+	"""
+
+	def __init__(self, path=SOCKET, camera=0, address=1, pan_bytes=4, tilt_bytes=4, debugmode=False, connection=None):
+		self._index = camera
+		self._connection = connection if (connection != None) else DaemonConnection(path)
+		super().__init__(address=address, pan_bytes=pan_bytes, tilt_bytes=tilt_bytes, debugmode=debugmode, bus=self._connection)
+		self._ownsbus = (connection == None)
+
+	def _submit(self, frame, inquiry=False, timeout=2, urgent=False, name=None, priority=None):
+		cmd = Command(frame, inquiry, timeout, name, priority if (priority != None) else self.PRIORITIES.get(name))
+		if (self.capabilities != None) and (not self.capabilities._admit(self, cmd)):
+			return cmd
+		if (self.metrics != None):
+			self.metrics._submitted(cmd, 0)
+			self.metrics._written(len(frame), 0)
+		self._connection.request(self._index, self.camera_address, cmd, urgent)
+		return cmd
+
+	def cancel(self, handle, timeout=2):
+		"""Cancels a command through the daemon, as Camera.cancel() does; returns False if it had
+		already finished, or no answer came from the daemon within timeout"""
+		return self._connection.cancel(self._index, handle, timeout)
+
+	def capture(self, path, timeout=2):
+		"""Has the daemon record all traffic on the camera's port to the file at path (see
+		Capture), returning the absolute path the daemon writes, or stops it if path is None;
+		raises VISCAError if the daemon can't"""
+		path = os.path.abspath(path) if (path != None) else None
+		handle = Command((path or "").encode("utf-8"), timeout=timeout)
+		self._connection.request(self._index, self.camera_address, handle, flags=CAPTURE)
+		try:
+			handle.result(timeout)
+		except FutureTimeoutError:
+			raise VISCAError(VISCAError.TIMEOUT)
+		return path
@@ -0,0 +1,618 @@
+import heapq
+import os
+import socket
+import threading
+from collections import deque
+from struct import pack, unpack_from
+from time import monotonic
+from .visca import Camera
+from .codec import Codec, Flag, Nibbles
+from .parser import FrameParser
+from .transport import VISCAOverIP
+
+class SimulatedClock:
+	"""Time for simulated cameras, running rate times faster than real time
+
+	advance() jumps ahead. With a rate of 0 the clock only moves when
+	advanced, stepping through each event due on the way so that replies
+	scheduled by earlier events still fall within the jump. Every simulated
+	event runs on the clock's own thread, in time order.
+	"""
+
+	def __init__(self, rate=1.0):
+		self.rate = rate
+		self._started = monotonic()
+		self._offset = 0.0
+		self._horizon = 0.0 # how far advance() has taken a stopped clock
+		self._events = [] # heap of (time, sequence, callback)
+		self._sequence = 0
+		self._condition = threading.Condition()
+		self._running = True
+		self._thread = threading.Thread(target=self._run, name="visca-simulator", daemon=True)
+		self._thread.start()
+
+	def now(self):
+		return (monotonic() - self._started) * self.rate + self._offset
+
+	def advance(self, seconds):
+		"""Moves the clock ahead, running everything that falls due"""
+		with self._condition:
+			if (self.rate == 0):
+				self._horizon = max(self._horizon, self._offset) + seconds
+			else:
+				self._offset += seconds
+			self._condition.notify()
+
+	def call_at(self, when, callback):
+		with self._condition:
+			self._sequence += 1
+			heapq.heappush(self._events, (when, self._sequence, callback))
+			self._condition.notify()
+
+	def call_later(self, delay, callback):
+		self.call_at(self.now() + delay, callback)
+
+	def _run(self):
+		while (True):
+			with self._condition:
+				while (self._running):
+					horizon = self._horizon if (self.rate == 0) else self.now()
+					if (len(self._events) > 0) and (self._events[0][0] <= horizon):
+						break
+					if (self.rate == 0):
+						self._offset = max(self._offset, self._horizon) # nothing more due, so finish the jump
+					if (len(self._events) == 0) or (self.rate == 0):
+						self._condition.wait()
+					else:
+						self._condition.wait((self._events[0][0] - self.now()) / self.rate)
+				if (not self._running):
+					return
+				when, sequence, callback = heapq.heappop(self._events)
+				if (self.rate == 0):
+					self._offset = max(self._offset, when)
+			callback()
+
+	def close(self):
+		with self._condition:
+			self._running = False
+			self._condition.notify()
+
+class _Axis:
+	"""Position of one axis, moving at a constant rate towards a target"""
+
+	def __init__(self, position, low, high):
+		self.low = low
+		self.high = high
+		self._from = position
+		self._since = 0
+		self._rate = 0
+		self._target = position
+
+	def at(self, now):
+		if (self._rate == 0):
+			return self._from
+		position = self._from + self._rate * (now - self._since)
+		return min(position, self._target) if (self._rate > 0) else max(position, self._target)
+
+	def goto(self, now, target, rate):
+		"""Starts moving towards target at rate units per second, returns the time it will take"""
+		start = self.at(now)
+		target = max(self.low, min(self.high, target))
+		self._from = start
+		self._since = now
+		self._target = target
+		if (target == start) or (rate <= 0):
+			self._rate = 0
+			return 0
+		self._rate = rate if (target > start) else -rate
+		return abs(target - start) / rate
+
+	def drive(self, now, rate):
+		"""Starts moving at a signed rate until stopped or a limit is reached"""
+		if (rate == 0):
+			self.stop(now)
+		else:
+			self.goto(now, self.high if (rate > 0) else self.low, abs(rate))
+
+	def stop(self, now):
+		self.goto(now, self.at(now), 0)
+
+class SimulatedCamera:
+	"""A VISCA camera in software, to put behind a SimulatedTransport or SimulatedPort
+
+	Commands are recognised from Camera.COMMANDS and acknowledged after
+	latency seconds in one of sockets command sockets, then completed once
+	carried out: straight away for settings and continuous moves, once the
+	position is reached for absolute moves and preset recalls. A command
+	arriving with every socket busy gets a buffer full error. Pan, tilt,
+	zoom and focus move at a rate set by the command's speed, and every
+	inquiry in Camera.INQUIRIES is answered from the simulated state.
+	"""
+
+	PAN_LIMITS = (-0x0990, 0x0990)
+	TILT_LIMITS = (-0x0480, 0x0480)
+	ZOOM_LIMITS = (0x0000, 0x4000)
+	FOCUS_LIMITS = (0x1000, 0xC000)
+
+	# Units per second per step of speed
+	PAN_RATE = 100
+	TILT_RATE = 100
+	ZOOM_RATE = 0x400
+	FOCUS_RATE = 0x1600
+
+	# How long a setting takes to apply
+	EXECUTION = 0.01
+
+	VERSION = [0x00, 0x01, 0x00, 0x04, 0x00, 0x03]
+
+	# Settings commands, as command name -> (state field, value set, or None to take the command's value)
+	SETTINGS = {
+		"power_on": ("power_on", True),
+		"power_off": ("power_on", False),
+		"autofocus_on": ("autofocus", True),
+		"autofocus_off": ("autofocus", False),
+		"picture_effect": ("picture_effect", None),
+		"white_balance": ("white_balance", None),
+		"ae_mode": ("ae_mode", None),
+		"pan_reverse": ("pan_reverse", None),
+		"tilt_reverse": ("tilt_reverse", None),
+		"flip_on": ("image_flip", True),
+		"flip_off": ("image_flip", False),
+		"reverse_on": ("image_reverse", True),
+		"reverse_off": ("image_reverse", False),
+		"freeze_on": ("freeze", True),
+		"freeze_off": ("freeze", False),
+		"preset_freeze_on": ("preset_freeze", True),
+		"preset_freeze_off": ("preset_freeze", False),
+		"tally_on": ("tally_on", True),
+		"tally_off": ("tally_on", False),
+		"wide_on": ("widescreen", True),
+		"wide_off": ("widescreen", False),
+		"backlight_on": ("backlight", True),
+		"backlight_off": ("backlight", False),
+		"menu_on": ("menu", True),
+		"menu_off": ("menu", False),
+		"video_system": ("video_system", None),
+		"title_position": ("title_position", None),
+		"title_line1": ("title_line1", None),
+		"title_line2": ("title_line2", None),
+		"title_clear": ("title", False),
+		"title_on": ("title", True),
+	}
+	# Image settings with a direct command and up, down and reset commands
+	ADJUSTABLE = {"red_gain": 0x80, "blue_gain": 0x80, "shutter": 0x00, "iris": 0x00, "gain": 0x00,
+		"brightness": 0x00, "exp": 0x07, "aperture": 0x00}
+
+	MOVES = {
+		"move_left": (-1, 0),
+		"move_right": (1, 0),
+		"move_up": (0, 1),
+		"move_down": (0, -1),
+		"move_upleft": (-1, 1),
+		"move_upright": (1, 1),
+		"move_downleft": (-1, -1),
+		"move_downright": (1, -1),
+	}
+
+	def __init__(self, address=1, sockets=2, latency=0.002, pan_bytes=4, tilt_bytes=4):
+		self.address = address
+		self.sockets = sockets
+		self.latency = latency
+		self.state = {
+			"power_on": True,
+			"autofocus": True,
+			"picture_effect": 0,
+			"preset": 0,
+			"white_balance": 0,
+			"ae_mode": 0,
+			"image_flip": False,
+			"pan_reverse": 0,
+			"tilt_reverse": 0,
+			"tally_on": False,
+			"widescreen": False,
+			"backlight": False,
+		}
+		self.state.update(self.ADJUSTABLE)
+		self.pan = _Axis(0, *self.PAN_LIMITS)
+		self.tilt = _Axis(0, *self.TILT_LIMITS)
+		self.zoom = _Axis(0, *self.ZOOM_LIMITS)
+		self.focus = _Axis(0x1000, *self.FOCUS_LIMITS)
+		self.presets = {} # slot -> (pan, tilt, zoom, focus)
+		self.received = [] # every frame addressed to the camera
+		self._pan_bytes = pan_bytes
+		self._tilt_bytes = tilt_bytes
+		codec = Codec.compile(Camera.COMMANDS, Camera.INQUIRIES, 0, pan_bytes, tilt_bytes)
+		# fixed frames first, so move_stop isn't taken for a pan/tilt drive
+		self._commands = sorted(codec.commands.items(), key=lambda item: item[1].arity)
+		self._inquiries = dict((frame[1:], name) for name, (frame, inquiry) in codec.inquiries.items())
+		self._executing = {} # socket -> name of the command running in it
+		self._link = None
+		self._clock = None
+
+	def _attach(self, link, clock):
+		self._link = link
+		self._clock = clock
+
+	def _reply(self, payload):
+		"""Sends a reply from the camera after latency seconds"""
+		frame = bytes([(self.address + 8) << 4] + payload + [0xFF])
+		self._clock.call_later(self.latency, lambda: self._link._tocontroller(frame))
+
+	def receive(self, frame):
+		"""Handles a frame addressed to the camera (called on the clock's thread)"""
+		self.received.append(frame)
+		body = frame[1:-1]
+		if (len(body) == 0):
+			return self._reply([0x60, 0x02])
+		if (body[0] == 0x09):
+			return self._inquiry(body)
+		if (len(body) == 1) and ((body[0] & 0xF0) == 0x20):
+			return self._cancel(body[0] & 0x0F)
+		if (list(body) == [0x01, 0x00, 0x01]):
+			return self._reply([0x50]) # IF_Clear
+		for name, template in self._commands:
+			values = template.match(frame)
+			if (values != None):
+				return self._command(name, values)
+		self._reply([0x60, 0x02])
+
+	def broadcast(self, frame):
+		"""Carries out a command broadcast to the whole chain, which no camera replies to"""
+		self.received.append(frame)
+		for name, template in self._commands:
+			values = template.match(frame)
+			if (values != None):
+				if (self.state["power_on"]) or (name == "power_on"):
+					self._execute(name, values, self._clock.now() + self.latency)
+				return
+
+	def _command(self, name, values):
+		if (not self.state["power_on"]) and (name != "power_on"):
+			return self._reply([0x60, 0x41])
+		free = [socket for socket in range(1, self.sockets + 1) if (socket not in self._executing)]
+		if (len(free) == 0):
+			return self._reply([0x60, 0x03])
+		socket = free[0]
+		self._executing[socket] = name
+		self._reply([0x40 + socket])
+		duration = self._execute(name, values, self._clock.now() + self.latency)
+		self._clock.call_later(self.latency + max(self.EXECUTION, duration), lambda: self._complete(socket, name))
+
+	def _complete(self, socket, name):
+		if (self._executing.get(socket) == name):
+			del self._executing[socket]
+			self._reply([0x50 + socket])
+
+	def _cancel(self, socket):
+		if (socket in self._executing):
+			del self._executing[socket]
+			now = self._clock.now()
+			for axis in (self.pan, self.tilt, self.zoom, self.focus):
+				axis.stop(now)
+			self._reply([0x60 + socket, 0x04])
+		else:
+			self._reply([0x60 + socket, 0x05])
+
+	def _signed(self, value, nibbles):
+		"""Reads a two's complement value of the given number of nibbles"""
+		if (value >= 1 << (4 * nibbles - 1)):
+			return value - (1 << (4 * nibbles))
+		return value
+
+	def _gotoall(self, now, pan, tilt, zoom, focus, panspeed=0x18, tiltspeed=0x18, zoomspeed=7, focusspeed=7):
+		"""Starts an absolute move of any axes given, returns how long the slowest will take"""
+		durations = [0]
+		if (pan != None):
+			durations.append(self.pan.goto(now, pan, panspeed * self.PAN_RATE))
+		if (tilt != None):
+			durations.append(self.tilt.goto(now, tilt, tiltspeed * self.TILT_RATE))
+		if (zoom != None):
+			durations.append(self.zoom.goto(now, zoom, (zoomspeed + 1) * self.ZOOM_RATE))
+		if (focus != None):
+			durations.append(self.focus.goto(now, focus, (focusspeed + 1) * self.FOCUS_RATE))
+		return max(durations)
+
+	def _execute(self, name, values, now):
+		"""Carries out a command, returns how long it takes to complete"""
+		if (name in self.SETTINGS):
+			field, value = self.SETTINGS[name]
+			if (value == None):
+				value = values[0] if (len(values) == 1) else values
+			self.state[field] = value
+			return 0
+		if (name in self.ADJUSTABLE):
+			self.state[name] = values[0]
+			return 0
+		if (name.endswith(("_up", "_down", "_reset"))):
+			field, change = name.rsplit("_", 1)
+			if (field in self.ADJUSTABLE):
+				if (change == "reset"):
+					self.state[field] = self.ADJUSTABLE[field]
+				else:
+					self.state[field] = max(0, min(0xFF, self.state[field] + (1 if (change == "up") else -1)))
+				return 0
+		if (name in self.MOVES):
+			pan, tilt = self.MOVES[name]
+			self.pan.drive(now, pan * values[0] * self.PAN_RATE)
+			self.tilt.drive(now, tilt * values[1] * self.TILT_RATE)
+			return 0
+		if (name == "pantilt_drive"):
+			directions = {0x01: -1, 0x02: 1, 0x03: 0}
+			self.pan.drive(now, directions.get(values[2], 0) * values[0] * self.PAN_RATE)
+			self.tilt.drive(now, -directions.get(values[3], 0) * values[1] * self.TILT_RATE)
+			return 0
+		if (name == "move_stop"):
+			self.pan.stop(now)
+			self.tilt.stop(now)
+			return 0
+		if (name == "move_to"):
+			pan = self._signed(values[2], self._pan_bytes)
+			tilt = self._signed(values[3], self._tilt_bytes)
+			return self._gotoall(now, pan, tilt, None, None, values[0], values[1])
+		if (name in ("home", "reset")):
+			return self._gotoall(now, 0, 0, None, None)
+		if (name in ("zoom_tele", "zoom_wide")):
+			self.zoom.drive(now, (values[0] + 1) * self.ZOOM_RATE * (1 if (name == "zoom_tele") else -1))
+			return 0
+		if (name == "zoom_stop"):
+			self.zoom.stop(now)
+			return 0
+		if (name in ("focus_far", "focus_near", "focus_far_variable", "focus_near_variable")):
+			speed = values[0] if (len(values) > 0) else 2
+			self.focus.drive(now, (speed + 1) * self.FOCUS_RATE * (1 if (name.startswith("focus_far")) else -1))
+			self.state["autofocus"] = False
+			return 0
+		if (name == "focus_stop"):
+			self.focus.stop(now)
+			return 0
+		if (name == "focus_infinity"):
+			return self._gotoall(now, None, None, None, self.FOCUS_LIMITS[1])
+		if (name == "zoom_direct"):
+			return self._gotoall(now, None, None, values[0], None)
+		if (name == "focus_direct"):
+			return self._gotoall(now, None, None, None, values[0])
+		if (name == "zoomfocus_direct"):
+			return self._gotoall(now, None, None, values[0], values[1])
+		if (name == "preset_set"):
+			self.presets[values[0]] = (self.pan.at(now), self.tilt.at(now), self.zoom.at(now), self.focus.at(now))
+			return 0
+		if (name == "preset_reset"):
+			self.presets.pop(values[0], None)
+			return 0
+		if (name == "preset_recall"):
+			self.state["preset"] = values[0]
+			pan, tilt, zoom, focus = self.presets.get(values[0], (0, 0, 0, 0x1000))
+			return self._gotoall(now, pan, tilt, zoom, focus)
+		return 0 # accepted without any effect worth simulating (menus, one-push triggers, ...)
+
+	def _nibbles(self, value, count):
+		return [(int(value) >> (4 * i)) & 0x0F for i in range(count - 1, -1, -1)]
+
+	def _inquiry(self, body):
+		name = self._inquiries.get(bytes(body) + b"\xff")
+		if (name == None):
+			return self._reply([0x60, 0x02])
+		self._reply([0x50] + self._answer(name, self._clock.now() + self.latency))
+
+	def _answer(self, name, now):
+		"""Encodes the state an inquiry asks about, for the reply after 0x50"""
+		state = self.state
+		if (name == "pantilt"):
+			return self._nibbles(round(self.pan.at(now)), self._pan_bytes) + self._nibbles(round(self.tilt.at(now)), self._tilt_bytes)
+		if (name == "zoom_position"):
+			return self._nibbles(round(self.zoom.at(now)), 4)
+		if (name == "focus_position"):
+			return self._nibbles(round(self.focus.at(now)), 4)
+		if (name == "version"):
+			return self.VERSION + [self.sockets]
+		if (name == "preset"):
+			return [state["preset"]]
+		if (name == "widescreen"):
+			return [0x02 if state["widescreen"] else 0x00]
+		if (name == "backlight"):
+			return [0x02 if state["backlight"] else 0x03]
+		if (name == "camera_block"):
+			flags = 0x04 if state["backlight"] else 0x00
+			return (self._nibbles(state["red_gain"], 2) + self._nibbles(state["blue_gain"], 2) +
+				[state["white_balance"], state["aperture"], state["ae_mode"], flags, state["shutter"],
+				state["iris"], state["gain"], state["brightness"], state["exp"]])
+		decode = Camera.INQUIRIES[name].decode
+		value = state.get(name, 0)
+		if (isinstance(decode, Flag)):
+			if (decode.on == 0x01):
+				return [int(value)]
+			return [decode.on if value else decode.off]
+		if (isinstance(decode, Nibbles)):
+			return [0x00] * (decode.start - 1) + self._nibbles(value, decode.count)
+		return [int(value)]
+
+class _Chain:
+	"""The cable between a controller and a daisy chain of simulated cameras, at an
+	emulated baud rate (8N1, so 10 bits a byte) or as fast as it goes if baudrate is None"""
+
+	def __init__(self, cameras, baudrate, clock):
+		self.cameras = list(cameras)
+		self.baudrate = baudrate
+		self.clock = clock if (clock != None) else SimulatedClock()
+		self._ownsclock = (clock == None)
+		self._down = 0 # when the line to the cameras is next free
+		self._up = 0 # and the line back
+		for camera in self.cameras:
+			camera._attach(self, self.clock)
+
+	def _arrival(self, free, count):
+		"""Returns when count bytes sent on a line that is free from time free will have arrived"""
+		now = self.clock.now()
+		if (self.baudrate == None):
+			return now
+		return max(now, free) + count * 10 / self.baudrate
+
+	def _fromcontroller(self, frame):
+		"""Carries a frame to the camera it is addressed to, after it has crossed the line"""
+		self._down = self._arrival(self._down, len(frame))
+		self.clock.call_at(self._down, lambda: self._deliver(frame))
+
+	def _deliver(self, frame):
+		address = frame[0] & 0x0F
+		if (address == 8):
+			return self._broadcast(frame)
+		for camera in self.cameras:
+			if (camera.address == address):
+				camera.receive(frame)
+
+	def _broadcast(self, frame):
+		if (list(frame[1:3]) == [0x30, 0x01]):
+			for i, camera in enumerate(self.cameras):
+				camera.address = i + 1
+			self._tocontroller(bytes([0x88, 0x30, len(self.cameras) + 1, 0xFF]))
+		else:
+			if (list(frame[1:4]) != [0x01, 0x00, 0x01]): # anything but IF_Clear
+				for camera in self.cameras:
+					camera.broadcast(frame)
+			self._tocontroller(bytes(frame)) # broadcasts pass round the chain unchanged
+
+	def _tocontroller(self, reply):
+		self._up = self._arrival(self._up, len(reply))
+		self.clock.call_at(self._up, lambda: self._write(reply))
+
+	def close(self):
+		if (self._ownsclock):
+			self.clock.close()
+
+class SimulatedTransport(_Chain):
+	"""In-memory transport to a chain of SimulatedCameras, for Camera(transport=...)
+
+	Replies come through a socket pair, so the transport has a real
+	descriptor for AsyncBus and Engine.
+	"""
+
+	def __init__(self, *cameras, baudrate=None, clock=None, timeout=0.1):
+		super().__init__(cameras if cameras else [SimulatedCamera()], baudrate, clock)
+		self._controller, self._simulator = socket.socketpair()
+		self._controller.settimeout(timeout if (timeout > 0) else 0)
+		self._parser = FrameParser()
+
+	def read(self):
+		try:
+			return self._controller.recv(4096)
+		except (socket.timeout, BlockingIOError):
+			return b""
+
+	def write(self, frame):
+		for frame in self._parser.feed(bytes(frame)):
+			self._fromcontroller(frame + b"\xff")
+
+	def _write(self, reply):
+		try:
+			self._simulator.sendall(reply)
+		except OSError:
+			pass # closed
+
+	def fileno(self):
+		return self._controller.fileno()
+
+	def close(self):
+		self._controller.close()
+		self._simulator.close()
+		super().close()
+
+class SimulatedPort(_Chain):
+	"""A pseudo-terminal with a chain of SimulatedCameras on the far end, for
+	Camera(sim.port, baudrate) with no changes at all (POSIX only)"""
+
+	def __init__(self, *cameras, baudrate=None, clock=None):
+		import tty
+		super().__init__(cameras if cameras else [SimulatedCamera()], baudrate, clock)
+		self._master, self._slave = os.openpty()
+		tty.setraw(self._slave)
+		self.port = os.ttyname(self._slave)
+		self._parser = FrameParser()
+		self._running = True
+		self._reader = threading.Thread(target=self._readloop, name="visca-simulated-port", daemon=True)
+		self._reader.start()
+
+	def _readloop(self):
+		while (self._running):
+			try:
+				readbytes = os.read(self._master, 1024)
+			except OSError:
+				break
+			for frame in self._parser.feed(readbytes):
+				self._fromcontroller(frame + b"\xff")
+
+	def _write(self, reply):
+		try:
+			os.write(self._master, reply)
+		except OSError:
+			pass # closed
+
+	def close(self):
+		self._running = False
+		os.close(self._master)
+		os.close(self._slave)
+		super().close()
+
+class SimulatedIPCamera(_Chain):
+	"""A SimulatedCamera behind a local UDP socket speaking Sony VISCA-over-IP, for
+	VISCAOverIP().connect(sim.host, sim.port)
+
+	Every reply carries the sequence number of the message it answers, and
+	a control reset is acknowledged; retransmitted messages are carried out
+	again, as a real camera that missed the first one would.
+	"""
+
+	def __init__(self, camera=None, host="127.0.0.1", port=0, clock=None):
+		super().__init__([camera if (camera != None) else SimulatedCamera()], None, clock)
+		self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._socket.bind((host, port))
+		self._socket.settimeout(0.1) # to notice close()
+		self.host, self.port = self._socket.getsockname()
+		self._controller = None # address of the last controller heard from
+		self._answering = deque() # sequence numbers of the messages awaiting their first reply, oldest first
+		self._sockets = {} # command socket -> sequence number of the command executing in it
+		self._running = True
+		self._reader = threading.Thread(target=self._readloop, name="visca-simulated-ip", daemon=True)
+		self._reader.start()
+
+	def _readloop(self):
+		while (self._running):
+			try:
+				datagram, address = self._socket.recvfrom(2048)
+			except socket.timeout:
+				continue
+			except OSError:
+				break
+			if (len(datagram) < 8):
+				continue
+			payloadtype, length, sequence = unpack_from(">HHI", datagram)
+			payload = datagram[8:8 + length]
+			self._controller = address
+			if (payloadtype == VISCAOverIP.CONTROL_COMMAND):
+				self._send(VISCAOverIP.CONTROL_REPLY, sequence, bytes(VISCAOverIP.CONTROL_RESET))
+			elif (payloadtype in (VISCAOverIP.VISCA_COMMAND, VISCAOverIP.VISCA_INQUIRY)) and (len(payload) > 1):
+				self._answering.append(sequence)
+				self._fromcontroller(payload)
+
+	def _send(self, payloadtype, sequence, payload):
+		try:
+			self._socket.sendto(pack(">HHI", payloadtype, len(payload), sequence) + payload, self._controller)
+		except OSError:
+			pass # closed
+
+	def _write(self, reply):
+		"""Sends a reply back tagged with the sequence number of the message it answers"""
+		kind = reply[1] & 0xF0
+		socket = reply[1] & 0x0F
+		if (kind == 0x40) or (socket == 0) or (socket not in self._sockets):
+			sequence = self._answering.popleft() if (len(self._answering) > 0) else 0
+			if (kind == 0x40):
+				self._sockets[socket] = sequence
+		else:
+			sequence = self._sockets.pop(socket)
+		self._send(VISCAOverIP.VISCA_REPLY, sequence, reply)
+
+	def close(self):
+		self._running = False
+		self._reader.join()
+		self._socket.close()
+		super().close()
@@ -0,0 +1,129 @@
+import logging
+import threading
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from queue import Queue, Empty
+from time import monotonic
+from typing import NamedTuple
+from .pipeline import VISCAError
+
+log = logging.getLogger("pyvisca")
+
+class Sample(NamedTuple):
+	"""Positions read by Telemetry, time being monotonic() when the replies came in"""
+	time: float
+	pan: int
+	tilt: int
+	zoom: int
+	focus: int
+
+class Telemetry:
+	"""Polls a camera's pan, tilt, zoom and focus positions on a background thread
+
+	The three position inquiries go out back to back each round. Rounds come
+	every FAST seconds while the position is changing (or a command was just
+	accepted) and every SLOW seconds once it has been still for IDLE seconds.
+	Only samples that differ from the last one are passed on, to callbacks
+	given to subscribe() or through the samples() generator. Get one with
+	cam.telemetry and start() it; an AsyncCamera's is polled from a thread
+	the same way, its callbacks running on that thread rather than the loop.
+	"""
+
+	FAST = 1 / 30
+	SLOW = 1.0
+	IDLE = 1.0
+
+	INQUIRIES = ["pantilt", "zoom_position", "focus_position"]
+
+	def __init__(self, camera):
+		self._camera = camera
+		self._subscribers = []
+		self._lock = threading.Lock()
+		self._wake = threading.Event()
+		self._thread = None
+		self._running = False
+		self.last = None # the most recent Sample
+		self._changed = 0 # when the position last changed
+
+	def _onframe(self, address, response):
+		"""Wakes the poller when the camera accepts a command, as it may be about to move (called by the bus)"""
+		if (address == self._camera.camera_address) and (len(response) > 0) and ((response[0] & 0xF0) == 0x40):
+			self._changed = monotonic()
+			self._wake.set()
+
+	def _read(self):
+		"""Reads the positions, returns a Sample or None if any inquiry went unanswered"""
+		camera = self._camera
+		handles = [camera._submit(camera._codec.inquiries[name][0], True, self.SLOW, name=name) for name in self.INQUIRIES]
+		replies = [self._reply(handle) for handle in handles]
+		if (None in replies):
+			return None
+		pantilt, zoom, focus = [camera._decode(name, reply) for name, reply in zip(self.INQUIRIES, replies)]
+		return Sample(monotonic(), pantilt["pan"], pantilt["tilt"], zoom, focus)
+
+	def _reply(self, handle):
+		"""Waits for an inquiry's reply on the polling thread, None if there was none; unlike
+		camera._reply(), this works the same for an AsyncCamera, whose handles are futures too"""
+		try:
+			return handle.result(2 * handle.timeout + self._camera.REPLY_MARGIN)
+		except (VISCAError, CancelledError, FutureTimeoutError):
+			return None
+
+	def _poll(self):
+		while (self._running):
+			started = monotonic()
+			sample = self._read()
+			if (sample != None) and ((self.last == None) or (sample[1:] != self.last[1:])):
+				if (self.last != None):
+					self._changed = sample.time
+				self.last = sample
+				with self._lock:
+					subscribers = list(self._subscribers)
+				for callback in subscribers:
+					try:
+						callback(sample)
+					except Exception:
+						log.exception("Error in telemetry subscriber %r", callback)
+			interval = self.FAST if (monotonic() - self._changed < self.IDLE) else self.SLOW
+			self._wake.wait(max(0, started + interval - monotonic()))
+			self._wake.clear()
+
+	def start(self):
+		"""Starts polling, if it isn't already"""
+		if (self._running):
+			return
+		self._running = True
+		self._camera.add_listener(self._onframe)
+		self._thread = threading.Thread(target=self._poll, name="visca-telemetry", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		"""Stops polling, waiting for the current round to finish"""
+		if (not self._running):
+			return
+		self._running = False
+		self._camera.remove_listener(self._onframe)
+		self._wake.set()
+		if (self._thread is not threading.current_thread()):
+			self._thread.join()
+
+	def subscribe(self, callback):
+		"""Calls callback(sample) from the polling thread for every changed Sample"""
+		with self._lock:
+			self._subscribers.append(callback)
+
+	def unsubscribe(self, callback):
+		with self._lock:
+			self._subscribers.remove(callback)
+
+	def samples(self, timeout=None):
+		"""Yields each changed Sample as it comes in, until timeout seconds pass without one"""
+		queue = Queue()
+		self.subscribe(queue.put)
+		try:
+			while (True):
+				try:
+					yield queue.get(timeout=timeout)
+				except Empty:
+					return
+		finally:
+			self.unsubscribe(queue.put)
@@ -0,0 +1,126 @@
+import threading
+from concurrent import futures
+from time import monotonic
+from typing import NamedTuple
+from .pipeline import VISCAError
+
+class Waypoint(NamedTuple):
+	"""One stop of a Tour: a preset to recall, or a pan/tilt position (moved to at speed)
+	with an optional zoom and focus (0 to 1, as for zoom_to()), then dwell seconds to stay"""
+	pan: int = None
+	tilt: int = None
+	speed: int = 0x07
+	zoom: float = None
+	focus: float = None
+	preset: int = None
+	dwell: float = 0
+
+class Leg(NamedTuple):
+	"""Timing of one leg of a Tour: when its commands went out, when the last of them
+	completed, and the error that stopped it if one did"""
+	index: int
+	started: float
+	completed: float
+	error: Exception = None
+
+	@property
+	def elapsed(self):
+		return self.completed - self.started
+
+class Tour:
+	"""Runs a camera through a list of Waypoints on a background thread
+
+	Each leg's commands go out the moment the previous leg's have all
+	completed (their 0x5y replies arrived) and its dwell time has passed,
+	so there are no sleeps to tune. Timing for every leg is kept in legs
+	and passed to on_leg(leg) if given. Start one with cam.tour(waypoints).
+	"""
+
+	# Longest a leg may take before it is counted as failed
+	LEG_TIMEOUT = 60
+	# How often a running leg checks for abort()
+	POLL = 0.05
+
+	def __init__(self, camera, waypoints, loop=False, on_leg=None):
+		self._camera = camera
+		self.waypoints = list(waypoints)
+		self.loop = loop
+		self.on_leg = on_leg
+		self.legs = []
+		self._aborted = threading.Event()
+		self._thread = None
+
+	def _send(self, waypoint):
+		"""Sends the commands for a waypoint, returns their handles"""
+		camera = self._camera
+		handles = []
+		if (waypoint.preset != None):
+			handles.append(camera.recall_preset(waypoint.preset))
+		if (waypoint.pan != None) and (waypoint.tilt != None):
+			handles.append(camera.move_to(waypoint.speed, waypoint.pan, waypoint.tilt))
+		if (waypoint.zoom != None) and (waypoint.focus != None):
+			handles.append(camera.zoomfocus_to(waypoint.zoom, waypoint.focus))
+		elif (waypoint.zoom != None):
+			handles.append(camera.zoom_to(waypoint.zoom))
+		elif (waypoint.focus != None):
+			handles.append(camera.focus_to(waypoint.focus))
+		return handles
+
+	def _leg(self, index, waypoint):
+		"""Runs one leg, returns its Leg or None if the tour was aborted during it"""
+		started = monotonic()
+		handles = self._send(waypoint)
+		pending = set(handles)
+		while (len(pending) > 0):
+			if (self._aborted.is_set()):
+				return None
+			if (monotonic() - started > self.LEG_TIMEOUT):
+				return Leg(index, started, monotonic(), VISCAError(VISCAError.TIMEOUT))
+			done, pending = futures.wait(pending, self.POLL)
+			pending = {handle for handle in pending if (not handle.cancelled())} # cancelled while still queued
+		# failed, timed out or cancelled handles have no completion time, and cancelled ones raise from exception()
+		completed = max([handle.completed for handle in handles if (handle.completed != None)] + [started])
+		errors = [futures.CancelledError() if handle.cancelled() else handle.exception() for handle in handles]
+		errors = [error for error in errors if (error != None)]
+		return Leg(index, started, completed, errors[0] if errors else None)
+
+	def _run(self):
+		while (not self._aborted.is_set()):
+			for index, waypoint in enumerate(self.waypoints):
+				leg = self._leg(index, waypoint)
+				if (leg == None):
+					return
+				self.legs.append(leg)
+				if (self.on_leg != None):
+					self.on_leg(leg)
+				if (self._aborted.wait(waypoint.dwell)):
+					return
+			if (not self.loop):
+				return
+
+	def start(self):
+		"""Starts the tour from its first waypoint"""
+		self._aborted.clear()
+		self._thread = threading.Thread(target=self._run, name="visca-tour", daemon=True)
+		self._thread.start()
+		return self
+
+	def abort(self):
+		"""Stops the tour and the camera's pan/tilt, zoom and focus movement"""
+		self._aborted.set()
+		self._camera.move_stop()
+		self._camera.zoom_stop()
+		self._camera.focus_stop()
+		if (self._thread != None) and (self._thread is not threading.current_thread()):
+			self._thread.join()
+
+	def wait(self, timeout=None):
+		"""Waits for the tour to finish, returns True if it has (a looping tour only finishes when aborted)"""
+		if (self._thread == None):
+			return True
+		self._thread.join(timeout)
+		return not self._thread.is_alive()
+
+	@property
+	def running(self):
+		return (self._thread != None) and (self._thread.is_alive())
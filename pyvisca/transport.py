@@ -0,0 +1,205 @@
+import serial
+import socket
+import threading
+from queue import Queue, Empty
+from time import monotonic
+from struct import pack, unpack_from
+
+class SerialTransport:
+	"""Carries VISCA frames over an RS-232/RS-422 serial port
+
+	A transport moves raw VISCA frames (address byte through 0xFF terminator)
+	between a Camera and the hardware: write(frame) sends one frame, read()
+	returns whatever bytes have arrived, waiting up to the transport's timeout
+	for the first one, and fileno() exposes a descriptor for event loops.
+	"""
+
+	def __init__(self, port, baudrate, timeout=0.1):
+		self._serial = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
+		self.baudrate = baudrate
+
+	def read(self):
+		return self._serial.read(self._serial.in_waiting or 1)
+
+	def write(self, frame):
+		self._serial.write(frame)
+
+	def fileno(self):
+		return self._serial.fileno()
+
+	def close(self):
+		self._serial.close()
+
+class VISCAOverIP:
+	"""One UDP socket shared by any number of Sony VISCA-over-IP cameras
+
+	Call connect() for each camera to get the UDPTransport to hand to Camera.
+	A background thread receives every datagram, routes it to the transport
+	of the camera it came from and retransmits messages that go unanswered.
+	"""
+
+	PORT = 52381
+
+	# Payload types of the 8-byte VISCA-over-IP header
+	VISCA_COMMAND = 0x0100
+	VISCA_INQUIRY = 0x0110
+	VISCA_REPLY = 0x0111
+	CONTROL_COMMAND = 0x0200
+	CONTROL_REPLY = 0x0201
+
+	CONTROL_RESET = [0x01]
+	CONTROL_SEQUENCE_ERROR = [0x0F, 0x01]
+
+	# How long to wait for a reply before resending a message, and how often to try
+	RETRANSMIT = 0.1
+	RETRIES = 3
+
+	def __init__(self, bind=("", 0)):
+		self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._socket.bind(bind)
+		self._socket.settimeout(self.RETRANSMIT / 2)
+		self._lock = threading.Lock()
+		self._transports = {} # (host, port) -> UDPTransport
+		self._running = True
+		self._reader = threading.Thread(target=self._readloop, name="visca-udp", daemon=True)
+		self._reader.start()
+
+	def connect(self, host, port=PORT, timeout=0.1):
+		"""Returns the transport for the camera at host:port, resetting its sequence number"""
+		address = (socket.gethostbyname(host), port)
+		with self._lock:
+			if (address not in self._transports):
+				self._transports[address] = UDPTransport(self, address, timeout)
+			transport = self._transports[address]
+		transport.reset()
+		return transport
+
+	def _send(self, datagram, address):
+		self._socket.sendto(datagram, address)
+
+	def _readloop(self):
+		while (self._running):
+			try:
+				datagram, address = self._socket.recvfrom(2048)
+			except socket.timeout:
+				datagram = None
+			except OSError:
+				break # socket was closed
+			if (datagram != None) and (len(datagram) >= 8):
+				with self._lock:
+					transport = self._transports.get(address)
+				if (transport != None):
+					transport._receive(datagram)
+			now = monotonic()
+			with self._lock:
+				transports = list(self._transports.values())
+			for transport in transports:
+				transport._retransmit(now)
+
+	def close(self):
+		"""Stops the receiver thread and closes the shared socket"""
+		self._running = False
+		if (self._reader is not threading.current_thread()):
+			self._reader.join()
+		self._socket.close()
+
+class UDPTransport:
+	"""Carries VISCA frames to one camera over a shared VISCAOverIP socket
+
+	The hub's thread hands each reply over through a queue and rings a
+	socket pair, whose far end is the transport's fileno(), so AsyncBus
+	and Engine can wait on the camera like on a port of its own.
+	"""
+
+	def __init__(self, hub, address, timeout=0.1):
+		self._hub = hub
+		self.address = address
+		self.timeout = timeout
+		self._lock = threading.Lock()
+		self._received = Queue()
+		self._bell, self._ring = socket.socketpair() # one byte rung per reply queued
+		self._bell.setblocking(False)
+		self._ring.setblocking(False)
+		self._sequence = 0
+		self._outstanding = {} # sequence number -> [datagram, time sent, tries]
+
+	def _message(self, payloadtype, payload):
+		"""Wraps a payload in the VISCA-over-IP header with the next sequence number (call with the lock held)"""
+		self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+		datagram = pack(">HHI", payloadtype, len(payload), self._sequence) + bytes(payload)
+		self._outstanding[self._sequence] = [datagram, monotonic(), 1]
+		return datagram
+
+	def write(self, frame):
+		payloadtype = VISCAOverIP.VISCA_INQUIRY if (frame[1] == 0x09) else VISCAOverIP.VISCA_COMMAND
+		with self._lock:
+			datagram = self._message(payloadtype, frame)
+		self._hub._send(datagram, self.address)
+
+	def reset(self):
+		"""Resets the camera's expected sequence number along with ours"""
+		with self._lock:
+			self._outstanding.clear()
+			self._sequence = 0xFFFFFFFF # the reset message itself goes out as 0
+			datagram = self._message(VISCAOverIP.CONTROL_COMMAND, VISCAOverIP.CONTROL_RESET)
+		self._hub._send(datagram, self.address)
+
+	def _receive(self, datagram):
+		"""Handles a datagram from the camera (called on the hub's thread)"""
+		payloadtype, length, sequence = unpack_from(">HHI", datagram)
+		payload = datagram[8:8 + length]
+		with self._lock:
+			self._outstanding.pop(sequence, None)
+		if (payloadtype == VISCAOverIP.VISCA_REPLY):
+			self._received.put(payload)
+			try:
+				self._ring.send(b"\0")
+			except (BlockingIOError, OSError):
+				pass # already rung plenty, or closed
+		elif (payloadtype == VISCAOverIP.CONTROL_REPLY) and (list(payload) == VISCAOverIP.CONTROL_SEQUENCE_ERROR):
+			self.reset()
+
+	def _retransmit(self, now):
+		"""Resends messages the camera hasn't answered in time (called on the hub's thread)"""
+		resend = []
+		with self._lock:
+			for sequence, message in list(self._outstanding.items()):
+				if (now - message[1] >= VISCAOverIP.RETRANSMIT):
+					if (message[2] >= VISCAOverIP.RETRIES):
+						del self._outstanding[sequence] # give up, the pipeline will time the frame out
+					else:
+						message[1] = now
+						message[2] += 1
+						resend.append(message[0])
+		for datagram in resend:
+			self._hub._send(datagram, self.address)
+
+	def _answer(self):
+		"""Empties the bell, returns whether it had been rung"""
+		rung = False
+		try:
+			while (len(self._bell.recv(4096)) > 0):
+				rung = True
+		except (BlockingIOError, OSError):
+			pass
+		return rung
+
+	def read(self):
+		# the bell is emptied first, so a reply queued after it is left rung
+		blocking = (not self._answer()) and (self.timeout > 0)
+		try:
+			payload = self._received.get(timeout=self.timeout) if (blocking) else self._received.get_nowait()
+		except Empty:
+			return b""
+		while (not self._received.empty()):
+			payload += self._received.get_nowait()
+		return payload
+
+	def fileno(self):
+		return self._bell.fileno()
+
+	def close(self):
+		with self._hub._lock:
+			self._hub._transports.pop(self.address, None)
+		self._bell.close()
+		self._ring.close()
@@ -1,11 +1,21 @@
-import serial
+import logging
 import threading
-from time import sleep, time
+from time import monotonic
 from enum import IntEnum
+from typing import NamedTuple
 from struct import pack, unpack
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from .pipeline import Command, Pipeline, VISCAError
+from .bus import Bus
+from .codec import Codec, Inquiry, Flag, Lookup, Nibbles, combine
+from .motion import MotionController
+from .telemetry import Telemetry
+from .tour import Tour
+
+log = logging.getLogger("pyvisca")
 
 class Camera:
-	"""Sony VISCA camera communications protocol over a serial port"""
+	"""Sony VISCA camera communications protocol over a serial port or other transport"""
 
 	class PictureEffects(IntEnum):
 		NONE = 0x00
@@ -26,6 +36,22 @@ class Camera:
 		IRIS_PRIORITY = 0x0B
 		BRIGHT = 0x0D
 
+	class Snapshot(NamedTuple):
+		"""Image settings read in one go by snapshot()"""
+		white_balance: int
+		ae_mode: int
+		red_gain: int
+		blue_gain: int
+		shutter: int
+		iris: int
+		gain: int
+		brightness: int
+		exp: int
+		aperture: int
+		backlight: bool
+		autofocus: bool
+		widescreen: bool
+
 	# All of these commands DO NOT include the address byte
 	# because it will be added later when the command is sent
 	POWERON = [0x01, 0x04, 0x00, 0x02, 0xFF]
@@ -56,7 +82,7 @@ class Camera:
 	MOVESTOP = [0x01, 0x06, 0x01, 0x01, 0x01, 0x03, 0x03, 0xFF]
 	TALLYON = [0x01, 0x7E, 0x01, 0x0A, 0x00, 0x02, 0xFF]
 	TALLYOFF = [0x01, 0x7E, 0x01, 0x0A, 0x00, 0x03, 0xFF]
-	WBONEPUSHTRIGGER = [0x01, 0x04, 0x10, 0x05]
+	WBONEPUSHTRIGGER = [0x01, 0x04, 0x10, 0x05, 0xFF]
 	REDGAINRESET = [0x01, 0x04, 0x03, 0x00, 0xFF]
 	REDGAINUP = [0x01, 0x04, 0x03, 0x02, 0xFF]
 	REDGAINDOWN = [0x01, 0x04, 0x03, 0x03, 0xFF]
@@ -100,6 +126,8 @@ class Camera:
 	INQ_PANREVERSE = [0x09, 0x7E, 0x01, 0x06, 0xFF]
 	INQ_TILTREVERSE = [0x09, 0x7E, 0x01, 0x09, 0xFF]
 	INQ_PANTILT = [0x09, 0x06, 0x12, 0xFF]
+	INQ_ZOOMPOS = [0x09, 0x04, 0x47, 0xFF]
+	INQ_FOCUSPOS = [0x09, 0x04, 0x48, 0xFF]
 	INQ_VERSION = [0x09, 0x00, 0x02, 0xFF]
 	INQ_REDGAIN = [0x09, 0x04, 0x43, 0xFF]
 	INQ_BLUEGAIN = [0x09, 0x04, 0x44, 0xFF]
@@ -107,22 +135,227 @@ class Camera:
 	INQ_SHUTTER = [0x09, 0x04, 0x4A, 0xFF]
 	INQ_IRIS = [0x09, 0x04, 0x4B, 0xFF]
 	INQ_GAIN = [0x09, 0x04, 0x4C, 0xFF]
-	INQ_BRIGHTNESS = [0x09, 0x0D, 0x4C, 0xFF]
+	INQ_BRIGHTNESS = [0x09, 0x04, 0x4D, 0xFF]
 	INQ_EXP = [0x09, 0x04, 0x4E, 0xFF]
 	INQ_APERTURE = [0x09, 0x04, 0x42, 0xFF]
 	INQ_BACKLIGHT = [0x09, 0x04, 0x33, 0xFF]
-	
-	def _dp(self, text):
-		"""Print if in debug mode"""
+	INQ_LENSBLOCK = [0x09, 0x7E, 0x7E, 0x00, 0xFF]
+	INQ_CAMERABLOCK = [0x09, 0x7E, 0x7E, 0x01, 0xFF]
+	INQ_OTHERBLOCK = [0x09, 0x7E, 0x7E, 0x02, 0xFF]
+	INQ_ENLARGEMENTBLOCK = [0x09, 0x7E, 0x7E, 0x03, 0xFF]
+
+	# Every command the camera class sends, as specs for codec.Template: one token per
+	# byte after the address byte, lowercase letters being nibbles of the values
+	# passed to _send() ("pp" a whole byte, "0p 0p 0p 0p" a 16 bit value)
+	COMMANDS = {
+		"power_on": "01 04 00 02",
+		"power_off": "01 04 00 03",
+		"zoom_tele": "01 04 07 2p",
+		"zoom_wide": "01 04 07 3p",
+		"zoom_stop": "01 04 07 00",
+		"zoom_direct": "01 04 47 0p 0p 0p 0p",
+		"focus_stop": "01 04 08 00",
+		"focus_far": "01 04 08 02",
+		"focus_near": "01 04 08 03",
+		"focus_far_variable": "01 04 08 2p",
+		"focus_near_variable": "01 04 08 3p",
+		"focus_direct": "01 04 48 0p 0p 0p 0p",
+		"focus_infinity": "01 04 18 02",
+		"focus_onepush": "01 04 18 01",
+		"autofocus_on": "01 04 38 02",
+		"autofocus_off": "01 04 38 03",
+		"zoomfocus_direct": "01 04 47 0p 0p 0p 0p 0q 0q 0q 0q",
+		"move_stop": "01 06 01 01 01 03 03",
+		"move_left": "01 06 01 vv ww 01 03",
+		"move_right": "01 06 01 vv ww 02 03",
+		"move_up": "01 06 01 vv ww 03 01",
+		"move_down": "01 06 01 vv ww 03 02",
+		"move_upleft": "01 06 01 vv ww 01 01",
+		"move_upright": "01 06 01 vv ww 02 01",
+		"move_downleft": "01 06 01 vv ww 01 02",
+		"move_downright": "01 06 01 vv ww 02 02",
+		"move_to": "01 06 02 vv ww {pan} {tilt}",
+		"pantilt_drive": "01 06 01 vv ww pp qq",
+		"home": "01 06 04",
+		"reset": "01 06 05",
+		"picture_effect": "01 04 63 pp",
+		"white_balance": "01 04 35 pp",
+		"white_balance_trigger": "01 04 10 05",
+		"red_gain": "01 04 43 00 00 0p 0p",
+		"red_gain_reset": "01 04 03 00",
+		"red_gain_up": "01 04 03 02",
+		"red_gain_down": "01 04 03 03",
+		"blue_gain": "01 04 44 00 00 0p 0p",
+		"blue_gain_reset": "01 04 04 00",
+		"blue_gain_up": "01 04 04 02",
+		"blue_gain_down": "01 04 04 03",
+		"ae_mode": "01 04 39 pp",
+		"title_clear": "01 7E 01 13 00",
+		"title_position": "01 7E 01 10 pp qq rr 00 00 00 00 00 00 00",
+		"title_line1": "01 7E 01 11 gg hh ii jj kk ll mm nn oo pp",
+		"title_line2": "01 7E 01 12 gg hh ii jj kk ll mm nn oo pp",
+		"title_on": "01 7E 01 13 02",
+		"video_system": "01 06 35 00 pp",
+		"freeze_on": "01 04 62 02",
+		"freeze_off": "01 04 62 03",
+		"preset_freeze_on": "01 04 62 22",
+		"preset_freeze_off": "01 04 62 23",
+		"pan_reverse": "01 7E 01 06 00 pp",
+		"tilt_reverse": "01 7E 01 09 00 pp",
+		"flip_on": "01 04 66 02",
+		"flip_off": "01 04 66 03",
+		"reverse_on": "01 04 61 02",
+		"reverse_off": "01 04 61 03",
+		"preset_recall": "01 04 3F 02 pp",
+		"preset_set": "01 04 3F 01 pp",
+		"preset_reset": "01 04 3F 00 pp",
+		"tally_on": "01 7E 01 0A 00 02",
+		"tally_off": "01 7E 01 0A 00 03",
+		"cancel": "2s",
+		"menu_on": "01 06 06 02",
+		"menu_off": "01 06 06 03",
+		"menu_back": "01 06 06 10",
+		"menu_ok": "01 7E 01 02 00 01",
+		"wide_on": "01 04 60 02",
+		"wide_off": "01 04 60 00",
+		"shutter": "01 04 4A 00 00 0p 0p",
+		"shutter_reset": "01 04 0A 00",
+		"shutter_up": "01 04 0A 02",
+		"shutter_down": "01 04 0A 03",
+		"iris": "01 04 4B 00 00 0p 0p",
+		"iris_reset": "01 04 0B 00",
+		"iris_up": "01 04 0B 02",
+		"iris_down": "01 04 0B 03",
+		"gain": "01 04 4C 00 00 0p 0p",
+		"gain_reset": "01 04 0C 00",
+		"gain_up": "01 04 0C 02",
+		"gain_down": "01 04 0C 03",
+		"brightness": "01 04 4D 00 00 0p 0p",
+		"brightness_reset": "01 04 0D 00",
+		"brightness_up": "01 04 0D 02",
+		"brightness_down": "01 04 0D 03",
+		"exp": "01 04 4E 00 00 0p 0p",
+		"exp_reset": "01 04 0E 00",
+		"exp_up": "01 04 0E 02",
+		"exp_down": "01 04 0E 03",
+		"aperture": "01 04 42 00 00 0p 0p",
+		"aperture_reset": "01 04 02 00",
+		"aperture_up": "01 04 02 02",
+		"aperture_down": "01 04 02 03",
+		"backlight_on": "01 04 33 02",
+		"backlight_off": "01 04 33 03",
+	}
+
+	# How long past its own timeouts a reply is waited for before the handle is given up on,
+	# should nothing finish it (the reader thread having died, say)
+	REPLY_MARGIN = 1
+
+	# Commands queued ahead of settings (Command.NORMAL) and inquiries (Command.LOW)
+	PRIORITIES = {
+		"move_stop": Command.STOP,
+		"zoom_stop": Command.STOP,
+		"focus_stop": Command.STOP,
+		"move_left": Command.MOTION,
+		"move_right": Command.MOTION,
+		"move_up": Command.MOTION,
+		"move_down": Command.MOTION,
+		"move_upleft": Command.MOTION,
+		"move_upright": Command.MOTION,
+		"move_downleft": Command.MOTION,
+		"move_downright": Command.MOTION,
+		"move_to": Command.MOTION,
+		"pantilt_drive": Command.MOTION,
+		"home": Command.MOTION,
+		"zoom_tele": Command.MOTION,
+		"zoom_wide": Command.MOTION,
+		"zoom_direct": Command.MOTION,
+		"focus_far": Command.MOTION,
+		"focus_near": Command.MOTION,
+		"focus_far_variable": Command.MOTION,
+		"focus_near_variable": Command.MOTION,
+		"focus_direct": Command.MOTION,
+		"zoomfocus_direct": Command.MOTION,
+		"preset_recall": Command.MOTION,
+		"tally_on": Command.MOTION,
+		"tally_off": Command.MOTION,
+	}
+
+	# Every inquiry, named after the property it answers (which is also its StateCache
+	# field), with a decoder from codec or the name of a _decode method
+	INQUIRIES = {
+		"power_on": Inquiry("09 04 00", Flag()),
+		"autofocus": Inquiry("09 04 38", Flag()),
+		"picture_effect": Inquiry("09 04 63", Lookup(PictureEffects)),
+		"preset": Inquiry("09 04 3F", "_decodepreset"),
+		"tally_on": Inquiry("09 7E 01 0A", Flag()),
+		"white_balance": Inquiry("09 04 35", Lookup(WhiteBalance)),
+		"ae_mode": Inquiry("09 04 39", Lookup(AutoExposure)),
+		"image_flip": Inquiry("09 04 66", Flag()),
+		"pan_reverse": Inquiry("09 7E 01 06", Flag(0x01, 0x00)),
+		"tilt_reverse": Inquiry("09 7E 01 09", Flag(0x01, 0x00)),
+		"pantilt": Inquiry("09 06 12", "_decodepantilt", False),
+		"zoom_position": Inquiry("09 04 47", Nibbles(1, 4), False),
+		"focus_position": Inquiry("09 04 48", Nibbles(1, 4), False),
+		"version": Inquiry("09 00 02", "_decodeversion", False),
+		"red_gain": Inquiry("09 04 43", Nibbles(3, 2)),
+		"blue_gain": Inquiry("09 04 44", Nibbles(3, 2)),
+		"widescreen": Inquiry("09 04 60", "_decodewidescreen"),
+		"shutter": Inquiry("09 04 4A", Nibbles(3, 2)),
+		"iris": Inquiry("09 04 4B", Nibbles(3, 2)),
+		"gain": Inquiry("09 04 4C", Nibbles(3, 2)),
+		"brightness": Inquiry("09 04 4D", Nibbles(3, 2)),
+		"exp": Inquiry("09 04 4E", Nibbles(3, 2)),
+		"aperture": Inquiry("09 04 42", Nibbles(3, 2)),
+		"backlight": Inquiry("09 04 33", "_decodebacklight"),
+		"camera_block": Inquiry("09 7E 7E 01", "_decodecamerablock", False),
+	}
+
+	# Inquiries read by snapshot()
+	SNAPSHOT_INQUIRIES = ["white_balance", "ae_mode", "red_gain", "blue_gain", "shutter", "iris", "gain",
+		"brightness", "exp", "aperture", "backlight", "autofocus", "widescreen"]
+	# The camera block inquiry covers everything but these
+	SNAPSHOT_BLOCK_INQUIRIES = ["camera_block", "autofocus", "widescreen"]
+
+
+	def _dp(self, text, *args):
+		"""Logs text % args to the pyvisca logger at DEBUG level, and prints it in debug mode;
+		the formatting is only done if the message goes somewhere"""
 		if (self._debugmode):
-			print(text)
+			print(text % args if args else text)
+		if (log.isEnabledFor(logging.DEBUG)):
+			log.debug(text, *args)
 
-	def __init__(self, port, baudrate, address=1, pan_bytes=4, tilt_bytes=4, debugmode=False):
-		self._serial = serial.Serial(port=port, baudrate=baudrate, timeout=0)
+	def __init__(self, port=None, baudrate=None, address=1, pan_bytes=4, tilt_bytes=4, debugmode=False, transport=None, bus=None):
+		"""Opens the serial port at baudrate, unless a transport (such as a UDPTransport) or
+		a Bus shared with other cameras on the same daisy chain is given instead"""
 		self._debugmode = debugmode
-		self.camera_address = address
-		self.pan_bytes = pan_bytes
-		self.tilt_bytes = tilt_bytes
+		self._address = address
+		self._pan_bytes = pan_bytes
+		self._tilt_bytes = tilt_bytes
+		self._compile()
+		self._lock = threading.RLock() # guards the pipeline
+		self._pipeline = Pipeline()
+		self._camerablock = None # whether the camera answers block inquiries, None until we know
+		self.cache = None # optional StateCache of the camera's settings
+		self.metrics = None # optional Metrics of the commands sent
+		self.calibration = None # optional Calibration for the *_degrees/_ratio/_distance methods
+		self.capabilities = None # optional Capabilities of the camera's model, from a CapabilityRegistry
+		self._motion = None
+		self._telemetry = None
+		self._titleshown = {"position": None, "lines": [None, None], "on": None} # None where unknown
+		self._ownsbus = (bus == None)
+		if (bus == None):
+			bus = self._openbus(port, baudrate, transport)
+		self._bus = bus
+		bus.attach(self)
+
+	def _openbus(self, port, baudrate, transport):
+		"""Creates the bus for a camera that has the port to itself"""
+		return Bus(port, baudrate, transport, discover=False)
+
+	def _compile(self):
+		"""Picks up the command tables compiled for the camera's address and pan/tilt widths"""
+		self._codec = Codec.compile(self.COMMANDS, self.INQUIRIES, self._address, self._pan_bytes, self._tilt_bytes)
 
 	def _splitnibbles(self, v, n=4):
 		"""Splits an integer value into a list of individual nibbles"""
@@ -133,56 +366,336 @@ class Camera:
 
 	def _combinenibbles(self, v):
 		"""Combines a list of individual nibbles (0x00 to 0x0f) to an integer"""
-		r = 0
-		n = len(v)
-		if (n == 0):
-			return 0
-		for i in range(0, n):
-			c = v[i]
-			m = 16 ** (n - i - 1)
-			r += (c * m)
-		return r
+		return combine(v, 0, len(v))
+
 	def _map(self, x, in_min, in_max, out_min, out_max):
 		"""Maps a value within a range to the same position in a different range"""
 		return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
 
 	def _sendcommand(self, command):
-		"""Send the given command to a camera using the selected address"""
-		cmd = bytes([0x80 + self.camera_address] + command)
-		self._dp("COMMAND: " + str([hex(c) for c in list(cmd)]))
-		self._serial.write(cmd)
-		sleep(0.1)
-
-	def _getresponse(self, address=None, timeout=2):
-		"""Waits for a response from a camera"""
-		if (address == None): address = self.camera_address
-		starttime = time()
-		while(time() - starttime < timeout):
-			if (self._serial.in_waiting > 0):
-				readbytes = self._serial.read(self._serial.in_waiting)
-				inputs = readbytes.split(bytes([0xFF]))
-				for input in inputs:
-					if (len(input) > 0):
-						retaddress = (list(input)[:1][0] - 0x80) >> 4
-						if (retaddress == address): #ignore responses from other cameras
-							response = list(input)[1:]
-							if (len(response) > 1):
-								if (response[0] == 0x50): #only return actual inquiry responses
-									# valid response
-									return response
-								elif (response[0:1] == [0x60, 0x02]):
-									# command syntax error
-									self._dp("Syntax error")
-									return None
-								elif (response[0:1] == [0x61, 0x41]):
-									# command not executable
-									self._dp("Command not executable")
-									return None
-			else:
-				sleep(0.1)
-		self._dp("Timeout waiting for response")
-		return None # No response for this camera in the timeout period
-	
+		"""Queue the given command (a list of bytes after the address byte) to the camera, returns a Command handle"""
+		return self._submit(bytes([0x80 + self.camera_address] + command))
+
+	def _send(self, name, *values):
+		"""Queue the named command from COMMANDS with the given values, returns a Command handle"""
+		return self._submit(self._codec.commands[name].encode(*values), name=name)
+
+	def _submit(self, frame, inquiry=False, timeout=2, urgent=False, name=None, priority=None):
+		"""Queue a frame for the camera (ahead of everything queued if urgent) and write it
+		as soon as the pipeline has room; name is the COMMANDS or INQUIRIES entry it came
+		from, which sets its priority from PRIORITIES unless one is given"""
+		cmd = Command(frame, inquiry, timeout, name, priority if (priority != None) else self.PRIORITIES.get(name))
+		if (self.capabilities != None) and (not self.capabilities._admit(self, cmd)):
+			return cmd # failed already, the model being known not to take it
+		with self._lock:
+			self._pipeline.submit(cmd, urgent, monotonic())
+			if (self.metrics != None):
+				self.metrics._submitted(cmd, len(self._pipeline.queue))
+			self._pump()
+		return cmd
+
+	def _pump(self):
+		"""Writes any cancels the pipeline asks for, then the next queued frame if the camera
+		can take it (call with the lock held)"""
+		cmd = self._pipeline.next(monotonic())
+		while (len(self._pipeline.cancels) > 0):
+			self._bus.write(self._codec.commands["cancel"].encode(self._pipeline.cancels.popleft()))
+		if (cmd != None):
+			if (self._debugmode) or (log.isEnabledFor(logging.DEBUG)):
+				self._dp("COMMAND: %s", cmd.frame.hex(" "))
+			if (self.metrics != None):
+				self.metrics._written(len(cmd.frame), len(self._pipeline.queue))
+			self._bus.write(cmd.frame)
+
+	def _receive(self, response):
+		"""Applies a reply from this camera to the pipeline (called by the bus)"""
+		if (self.metrics != None):
+			self.metrics._read(len(response) + 2) # with the address byte and terminator
+		with self._lock:
+			self._pipeline.receive(response, monotonic())
+			self._pump()
+
+	def _expire(self):
+		"""Times out a frame the camera never answered and writes whatever can go next"""
+		with self._lock:
+			self._pipeline.expire(monotonic())
+			self._pump()
+
+	def cancel(self, handle):
+		"""Cancels a command: drops it if it is still queued, or sends the camera a cancel for
+		the socket it is executing in (its handle then fails with VISCAError.CANCELLED);
+		returns False if the command has already finished"""
+		with self._lock:
+			cancelled = self._pipeline.cancel(handle)
+			self._pump()
+		return cancelled
+
+	def capture(self, path):
+		"""Records all traffic on the camera's port to the file at path (see Capture) and
+		returns the Capture, or stops recording if path is None; on a shared bus this
+		includes the other cameras' traffic"""
+		return self._bus.capture(path)
+
+	def _after(self, delay, callback):
+		"""Calls callback after delay seconds on a timer thread, returns something to cancel() it with"""
+		timer = threading.Timer(delay, callback)
+		timer.daemon = True
+		timer.start()
+		return timer
+
+	def _abort(self, error):
+		"""Fails everything queued for or executing in the camera"""
+		with self._lock:
+			self._pipeline.abort(error)
+
+	def _query(self, name, timeout=2):
+		"""Sends the named inquiry from INQUIRIES, waits for the camera's reply and returns it decoded
+
+		The reply is None if the camera answered with an error or not at all.
+		"""
+		found, value = self._fromcache(name)
+		if (found):
+			return value
+		frame, inquiry = self._codec.inquiries[name]
+		return self._decode(name, self._reply(self._submit(frame, True, timeout, name=name)))
+
+	def _fromcache(self, name):
+		"""Looks an inquiry up in the cache, returns (found, value)"""
+		if (self.cache == None) or (not self.INQUIRIES[name].cached):
+			return (False, None)
+		return self.cache.get(name)
+
+	def _decode(self, name, ret):
+		"""Decodes the reply to the named inquiry, storing the value in the cache if there was an actual reply"""
+		inquiry = self.INQUIRIES[name]
+		decode = inquiry.decode
+		value = getattr(self, decode)(ret) if isinstance(decode, str) else decode(ret)
+		if (ret != None) and (inquiry.cached) and (self.cache != None):
+			self.cache.put(name, value)
+		return value
+
+	def _setting(self, field, value, handle):
+		"""Writes the value a command sets field to through to the cache, returns the command's handle"""
+		cache = self.cache
+		if (cache != None):
+			cache.put(field, value)
+			def rejected(handle):
+				if (not handle.wait(0)):
+					cache.invalidate(field) # the camera didn't take it, so we don't know the value
+			handle.add_done_callback(rejected)
+		return handle
+
+	def _change(self, handle, *fields):
+		"""Marks fields (or anything, if none are given) as changed by a command in a way
+		we can't predict, so they are read afresh next time; returns the command's handle"""
+		cache = self.cache
+		if (cache != None):
+			cache.invalidate(*fields)
+			handle.add_done_callback(lambda handle: cache.invalidate(*fields))
+		return handle
+
+	def _reply(self, handle):
+		"""Waits for an inquiry's reply, returning None if the camera answered with an error or not at all
+
+		The wait is bounded by the inquiry's timeout to be written, then to be
+		answered, and REPLY_MARGIN; past that the handle is failed with
+		VISCAError.TIMEOUT even if nothing is left to expire it.
+		"""
+		try:
+			try:
+				return handle.result(2 * handle.timeout + self.REPLY_MARGIN)
+			except FutureTimeoutError:
+				self._giveup(handle, VISCAError(VISCAError.TIMEOUT))
+				return handle.result(0)
+		except VISCAError as e:
+			self._dp("%s", e)
+			return None
+
+	def _giveup(self, handle, error):
+		"""Takes a handle out of the pipeline and fails it with error, unless it has finished"""
+		with self._lock:
+			self._pipeline.fail(handle, error)
+			self._pump()
+
+	def _inquiremany(self, names, rejected=None):
+		"""Sends the named inquiries back to back, then waits for all the replies and
+		returns a dict of the decoded values; the names the camera answered with a
+		syntax error are added to the set rejected, if given"""
+		handles = [self._submit(self._codec.inquiries[name][0], True, name=name) for name in names]
+		values = dict((name, self._decode(name, self._reply(handle))) for name, handle in zip(names, handles))
+		self._rejected(names, handles, rejected)
+		return values
+
+	def _rejected(self, names, handles, rejected):
+		"""Adds the names of the finished handles that failed with a syntax error to rejected"""
+		if (rejected == None):
+			return
+		for name, handle in zip(names, handles):
+			error = None if (handle.cancelled()) else handle.exception(0)
+			if (isinstance(error, VISCAError)) and (error.code == VISCAError.SYNTAX_ERROR):
+				rejected.add(name)
+
+	def _decodepantilt(self, ret):
+		pantilt = {"pan":0, "tilt":0}
+		if (ret != None):
+			if (len(ret) > 0):
+				if (ret[0] == 0x50):
+					pantilt["pan"] = combine(ret, 1, self._pan_bytes)
+					pantilt["tilt"] = combine(ret, 1 + self._pan_bytes, self._tilt_bytes)
+		return pantilt
+
+	def _decodepreset(self, ret):
+		if (ret != None) and (len(ret) > 1):
+			return ret[1]
+		else:
+			return 0
+
+	def _decodewidescreen(self, ret):
+		if (ret == None):
+			return None
+		if (len(ret) > 1):
+			if (ret[0] == 0x50):
+				return (ret[1] == 0x02)
+		return False
+
+	def _decodebacklight(self, ret):
+		return (ret == [0x50, 0x02])
+
+	_BLOCK_WHITEBALANCE = Lookup(WhiteBalance)
+	_BLOCK_AEMODE = Lookup(AutoExposure)
+
+	def _decodecamerablock(self, ret):
+		"""Decodes a camera block inquiry reply, y0 50 0p 0p 0q 0q 0r 0s tt 0u vv ww xx yy zz FF:
+		red gain, blue gain, white balance, aperture, AE mode, flags (backlight is bit 2),
+		shutter, iris, gain, bright and exposure compensation. None if the camera has no block inquiries."""
+		if (ret == None) or (len(ret) < 14) or (ret[0] != 0x50):
+			return None
+		return {
+			"red_gain": combine(ret, 1, 2),
+			"blue_gain": combine(ret, 3, 2),
+			"white_balance": self._BLOCK_WHITEBALANCE([0x50, ret[5]]),
+			"aperture": ret[6],
+			"ae_mode": self._BLOCK_AEMODE([0x50, ret[7]]),
+			"backlight": bool(ret[8] & 0x04),
+			"shutter": ret[9],
+			"iris": ret[10],
+			"gain": ret[11],
+			"brightness": ret[12],
+			"exp": ret[13],
+		}
+
+	def _decodesnapshot(self, fields, rejected=()):
+		"""Builds a Snapshot from the fields read by _inquiremany(), None if the block inquiry failed"""
+		if ("camera_block" in fields):
+			block = fields.pop("camera_block")
+			if (block == None):
+				if ("camera_block" in rejected):
+					self._camerablock = False # only a syntax error says so; a timeout may not happen again
+				return None
+			self._camerablock = True
+			fields.update(block)
+		return self.Snapshot(**fields)
+
+	def snapshot(self, blocks=True):
+		"""Reads all the image settings at once, pipelining the inquiries back to back
+
+		With blocks, the camera block inquiry (09 7E 7E 01) replaces most of the
+		individual inquiries; cameras that reject it with a syntax error are
+		remembered and read with individual inquiries instead.
+		"""
+		if (blocks) and (self._camerablock != False):
+			rejected = set()
+			snapshot = self._decodesnapshot(self._inquiremany(self.SNAPSHOT_BLOCK_INQUIRIES, rejected), rejected)
+			if (snapshot != None):
+				return snapshot
+		return self._decodesnapshot(self._inquiremany(self.SNAPSHOT_INQUIRIES))
+
+	def _decodeversion(self, ret):
+		version = {"vendor":None, "model":None, "rom":None, "sockets":0}
+		if (ret != None):
+			if (len(ret) > 7):
+				if (ret[0] == 0x50):
+					version = {}
+					version["vendor"] = combine(ret, 1, 2)
+					version["model"] = combine(ret, 3, 2)
+					version["rom"] = combine(ret, 5, 2)
+					version["sockets"] = ret[7]
+					if (version["sockets"] > 0):
+						self.sockets = version["sockets"]
+		return version
+
+	@property
+	def sockets(self):
+		"""Number of command sockets the camera executes at once"""
+		return self._pipeline.sockets
+	@sockets.setter
+	def sockets(self, count):
+		with self._lock:
+			self._pipeline.sockets = count
+			self._pump()
+
+	@property
+	def camera_address(self):
+		return self._address
+	@camera_address.setter
+	def camera_address(self, address):
+		self._bus.detach(self)
+		self._address = address
+		self._compile()
+		self._bus.attach(self)
+
+	@property
+	def pan_bytes(self):
+		return self._pan_bytes
+	@pan_bytes.setter
+	def pan_bytes(self, count):
+		self._pan_bytes = count
+		self._compile()
+
+	@property
+	def tilt_bytes(self):
+		return self._tilt_bytes
+	@tilt_bytes.setter
+	def tilt_bytes(self, count):
+		self._tilt_bytes = count
+		self._compile()
+
+	@property
+	def motion(self):
+		"""MotionController for driving the camera from joystick-style velocity set-points"""
+		if (self._motion == None):
+			self._motion = MotionController(self)
+		return self._motion
+
+	@property
+	def telemetry(self):
+		"""Telemetry poller for the camera's pan, tilt, zoom and focus positions"""
+		if (self._telemetry == None):
+			self._telemetry = Telemetry(self)
+		return self._telemetry
+
+	def tour(self, waypoints, loop=False, on_leg=None):
+		"""Starts a Tour through a list of Waypoints, returns it for its timings and abort()"""
+		return Tour(self, waypoints, loop, on_leg).start()
+
+	def add_listener(self, callback):
+		"""Calls callback(address, response) for every frame received on the camera's bus"""
+		self._bus.add_listener(callback)
+
+	def remove_listener(self, callback):
+		self._bus.remove_listener(callback)
+
+	def close(self):
+		"""Detaches from the bus, closing it if the camera opened it"""
+		if (self._motion != None):
+			self._motion.close()
+		if (self._telemetry != None):
+			self._telemetry.stop()
+		self._bus.detach(self)
+		self._abort(VISCAError(VISCAError.TIMEOUT))
+		if (self._ownsbus):
+			self._bus.close()
+
 	@property
 	def debug_mode(self):
 		return self._debugmode
@@ -192,270 +705,255 @@ class Camera:
 
 	def zoom_in(self, speed=4):
 		self._dp("Zooming in")
-		self._sendcommand([0x01, 0x04, 0x07, 0x20 + speed, 0xFF])
-		#self._sendcommand(self.ZOOMIN)
+		return self._send("zoom_tele", speed)
+
 
-		
 	def zoom_out(self, speed=4):
 		self._dp("Zooming out")
-		self._sendcommand([0x01, 0x04, 0x07, 0x30 + speed, 0xFF])
-		#self._sendcommand(self.ZOOMOUT)
+		return self._send("zoom_wide", speed)
 
 	def zoom_stop(self):
 		self._dp("Stopping zoom")
-		self._sendcommand(self.ZOOMSTOP)
+		return self._send("zoom_stop")
 
 	def zoom_to(self, percent):
 		amt = int(0x4000 * percent)
-		b = self._splitnibbles(amt, 4)
-		self._dp("Zooming to " + str(100 * percent) + " percent (" + "0x{:04x}".format(amt) + ")")
-		self._sendcommand([0x01, 0x04, 0x47, b[0], b[1], b[2], b[3], 0xFF])
+		self._dp("Zooming to %s percent (0x%04x)", 100 * percent, amt)
+		return self._send("zoom_direct", amt)
 
 	def focus_near(self):
 		self._dp("Focusing near")
-		#self._sendcommand([0x01, 0x04, 0x08, 0x30+self.focus_speed, 0xFF])
-		self._sendcommand(self.FOCUSNEAR)
+		return self._send("focus_near")
 
 	def focus_far(self):
 		self._dp("Focusing far")
-		#self._sendcommand([0x01, 0x04, 0x08, 0x20+self.focus_speed, 0xFF])
-		self._sendcommand(self.FOCUSFAR)
+		return self._send("focus_far")
 
 	def focus_stop(self):
 		self._dp("Stopping focus")
-		self._sendcommand(self.FOCUSSTOP)
+		return self._send("focus_stop")
 
 	def focus_auto(self):
 		self._dp("Autofocus")
-		self._sendcommand(self.ONEPUSHAF)
+		return self._send("focus_onepush")
 
 	def focus_infinity(self):
 		self._dp("Focusing to infinity")
-		self._sendcommand(self.FOCUSINF)
-		
+		return self._send("focus_infinity")
+
 	def focus_to(self, percent):
 		amt = int(0x4000 * percent)
-		b = self._splitnibbles(amt, 4)
-		self._dp("Focusing to " + str(100 * percent) + " percent (" + "0x{:04x}".format(amt) + ")")
-		self._sendcommand([0x01, 0x04, 0x48, b[0], b[1], b[2], b[3], 0xFF])
+		self._dp("Focusing to %s percent (0x%04x)", 100 * percent, amt)
+		return self._send("focus_direct", amt)
 
 	def zoomfocus_to(self, zoom, focus):
 		zamt = int(0x4000 * zoom)
 		famt = int(0x4000 * focus)
-		b1 = self._splitnibbles(zamt)
-		b2 = self._splitnibbles(famt)
-		self._dp("Zooming to " + str(100 * zoom) + " percent (" + "0x{:04x}".format(zamt) + ")")
-		self._dp("Focusing to " + str(100 * focus) + " percent (" + "0x{:04x}".format(famt) + ")")
-		self._sendcommand([0x01, 0x04, 0x47, b1[1], b1[1], b1[2], b1[3], b2[0], b2[1], b2[2], b2[3], 0xFF])
+		self._dp("Zooming to %s percent (0x%04x)", 100 * zoom, zamt)
+		self._dp("Focusing to %s percent (0x%04x)", 100 * focus, famt)
+		return self._send("zoomfocus_direct", zamt, famt)
 
 	def move_stop(self):
 		self._dp("Stopping movement")
-		self._sendcommand(self.MOVESTOP)
+		return self._send("move_stop")
 
 	def move_left(self, speed=0x07):
 		self._dp("Moving left")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x01, 0x03, 0xFF])
+		return self._send("move_left", speed, speed)
 
 	def move_right(self, speed=0x07):
 		self._dp("Moving right")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x02, 0x03, 0xFF])
+		return self._send("move_right", speed, speed)
 
 	def move_up(self, speed=0x07):
 		self._dp("Moving up")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x03, 0x01, 0xFF])
+		return self._send("move_up", speed, speed)
 
 	def move_down(self, speed=0x07):
 		self._dp("Moving down")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x03, 0x02, 0xFF])
+		return self._send("move_down", speed, speed)
 
 	def move_upleft(self, speed=0x07):
 		self._dp("Moving up-left")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x01, 0x01, 0xFF])
+		return self._send("move_upleft", speed, speed)
 
 	def move_upright(self, speed=0x07):
 		self._dp("Moving up-right")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x02, 0x01, 0xFF])
+		return self._send("move_upright", speed, speed)
 
 	def move_downleft(self, speed=0x07):
 		self._dp("Moving down-left")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x01, 0x02, 0xFF])
+		return self._send("move_downleft", speed, speed)
 
 	def move_downright(self, speed=0x07):
 		self._dp("Moving down-right")
-		self._sendcommand([0x01, 0x06, 0x01, speed, speed, 0x02, 0x02, 0xFF])
+		return self._send("move_downright", speed, speed)
 
 	def move_to(self, speed=0x07, pan=0, tilt=0):
-		self._dp("Moving to " + hex(pan) + " by " + hex(tilt))
-		self._sendcommand([0x01, 0x06, 0x02, speed, speed] + self._splitnibbles(pan, self.pan_bytes) + self._splitnibbles(tilt, self.tilt_bytes) + [0xff])
+		self._dp("Moving to %#x by %#x", pan, tilt)
+		return self._send("move_to", speed, speed, pan, tilt)
+
+	def _calibrated(self):
+		if (self.calibration == None):
+			raise ValueError("Give the camera a Calibration first")
+		return self.calibration
+
+	def move_to_degrees(self, pan, tilt, speed=0x07):
+		"""Moves to pan and tilt in degrees (right and up positive), through the camera's calibration"""
+		calibration = self._calibrated()
+		return self.move_to(speed, calibration.pan_raw(pan), calibration.tilt_raw(tilt))
+
+	def zoom_to_ratio(self, ratio):
+		"""Zooms to a magnification (1.0 being the wide end), through the camera's calibration"""
+		return self._send("zoom_direct", self._calibrated().zoom_raw(ratio))
+
+	def focus_to_distance(self, metres):
+		"""Focuses at a distance in metres (inf for infinity), through the camera's calibration"""
+		return self._send("focus_direct", self._calibrated().focus_raw(metres))
 
 	def get_pantilt(self):
-		pantilt = {"pan":0, "tilt":0}
-		self._sendcommand(self.INQ_PANTILT)
-		ret = self._getresponse()
-		if (ret != None):
-			if (len(ret) > 0):
-				if (ret[0] == 0x50):
-					pan = ret[1:self.pan_bytes+1]
-					tilt = ret[self.pan_bytes+1:self.pan_bytes+1+self.tilt_bytes]                
-					pantilt["pan"] = self._combinenibbles(pan)
-					pantilt["tilt"] = self._combinenibbles(tilt)
-		return pantilt
+		return self._query("pantilt")
+
+	def get_zoom_position(self):
+		"""Returns the zoom position, 0 (wide) to 0x4000 (optical tele) or beyond with digital zoom"""
+		return self._query("zoom_position")
+
+	def get_focus_position(self):
+		return self._query("focus_position")
 
 	@property
 	def picture_effect(self):
-		self._sendcommand(self.INQ_PICTUREEFFECT)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x00]):
-			return self.PictureEffects.NONE
-		elif (ret == [0x50, 0x02]):
-			return self.PictureEffects.NEGATIVE_ART
-		elif (ret == [0x50, 0x04]):
-			return self.PictureEffects.BLACK_AND_WHITE
-		else:
-			return 0
+		return self._query("picture_effect")
 
 	@picture_effect.setter
 	def picture_effect(self, effect):
-		self._dp("Setting picture effect to " + str(effect))
-		self._sendcommand([0x01, 0x04, 0x63, int(effect), 0xFF])
+		self._dp("Setting picture effect to %s", effect)
+		return self._setting("picture_effect", effect, self._send("picture_effect", int(effect)))
 
 	@property
 	def white_balance(self):
-		self._sendcommand(self.INQ_WHITEBALANCE)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x00]):
-			return self.WhiteBalance.AUTO
-		elif (ret == [0x50, 0x01]):
-			return self.WhiteBalance.INDOOR
-		elif (ret == [0x50, 0x02]):
-			return self.WhiteBalance.OUTDOOR
-		elif (ret == [0x50, 0x03]):
-			return self.WhiteBalance.ONEPUSH
-		elif (ret == [0x50, 0x05]):
-			return self.WhiteBalance.MANUAL
-		else:
-			return 0
+		return self._query("white_balance")
 
 	@white_balance.setter
 	def white_balance(self, mode):
-		self._dp("Setting white balance to " + str(mode))
-		self._sendcommand([0x01, 0x04, 0x35, mode, 0xFF])
+		self._dp("Setting white balance to %s", mode)
+		handle = self._setting("white_balance", mode, self._send("white_balance", int(mode)))
 		if (mode == self.WhiteBalance.ONEPUSH):
-			sleep(0.1)
-			self._sendcommand(self.WBONEPUSHTRIGGER)
+			handle = self._send("white_balance_trigger")
+		return handle
 
 	@property
 	def red_gain(self):
-		self._sendcommand(self.INQ_REDGAIN)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-		
+		return self._query("red_gain")
+
 	@red_gain.setter
 	def red_gain(self, red):
-		self._sendcommand([0x01, 0x04, 0x43, 0x00, 0x00] + self._splitnibbles(red, 2) + [0xFF])
+		return self._setting("red_gain", red, self._send("red_gain", red))
 
 	def reset_red_gain(self):
-		self._sendcommand(self.REDGAINRESET)
+		return self._change(self._send("red_gain_reset"), "red_gain")
 
 	def increase_red_gain(self):
-		self._sendcommand(self.REDGAINUP)
+		return self._change(self._send("red_gain_up"), "red_gain")
 
 	def decrease_red_gain(self):
-		self._sendcommand(self.REDGAINDOWN)
+		return self._change(self._send("red_gain_down"), "red_gain")
 
 	@property
 	def blue_gain(self):
-		self._sendcommand(self.INQ_BLUEGAIN)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-		
+		return self._query("blue_gain")
+
 	@blue_gain.setter
 	def blue_gain(self, blue):
-		self._sendcommand([0x01, 0x04, 0x44, 0x00, 0x00] + self._splitnibbles(blue, 2) + [0xFF])
+		return self._setting("blue_gain", blue, self._send("blue_gain", blue))
 
 	def reset_blue_gain(self):
-		self._sendcommand(self.BLUEGAINRESET)
+		return self._change(self._send("blue_gain_reset"), "blue_gain")
 
 	def increase_blue_gain(self):
-		self._sendcommand(self.BLUEGAINUP)
+		return self._change(self._send("blue_gain_up"), "blue_gain")
 
 	def decrease_blue_gain(self):
-		self._sendcommand(self.BLUEGAINDOWN)
+		return self._change(self._send("blue_gain_down"), "blue_gain")
 
 	@property
 	def ae_mode(self):
-		self._sendcommand(self.INQ_AEMODE)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x00]):
-			return self.AutoExposure.AUTO
-		elif (ret == [0x50, 0x03]):
-			return self.AutoExposure.MANUAL
-		elif (ret == [0x50, 0x0A]):
-			return self.AutoExposure.SHUTTER_PRIORITY
-		elif (ret == [0x50, 0x0B]):
-			return self.AutoExposure.IRIS_PRIORITY
-		elif (ret == [0x50, 0x0D]):
-			return self.AutoExposure.BRIGHT
-		else:
-			return 0
+		return self._query("ae_mode")
 
 	@ae_mode.setter
 	def ae_mode(self, mode):
-		self._dp("Setting autoexposure to " + str(mode))
-		self._sendcommand([0x01, 0x04, 0x39, mode, 0xFF])
+		self._dp("Setting autoexposure to %s", mode)
+		return self._setting("ae_mode", mode, self._send("ae_mode", int(mode)))
 
 	def title(self, title="", blink=False):
-		self._dp("Setting title to " + title)
-		#title clear
-		self._sendcommand([0x01, 0x7E, 0x01, 0x13, 0x00, 0xFF])
-		sleep(0.1)
-		
-		N = 10
-		P = 0
-		hPos = 0x00
-		vPos = 0x00
-		blinking = 0x01 if blink else 0x00
-		t1 = list(bytes(title[:10], "ascii"))
-		t2 = list(bytes(title[10:20], "ascii"))
-		t1 = (t1 + N * [P])[:N]
-		t2 = (t2 + N * [P])[:N]
-		
-		self._sendcommand([0x01, 0x7E, 0x01, 0x10, hPos, vPos, blinking, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xFF])
-		sleep(0.1)
-		self._sendcommand([0x01, 0x7E, 0x01, 0x11] + t1 + [0xFF])
-		sleep(0.1)
-		self._sendcommand([0x01, 0x7E, 0x01, 0x12] + t2 + [0xFF])
-		sleep(0.1)
-		#title on
-		self._sendcommand([0x01, 0x7E, 0x01, 0x13, 0x02, 0xFF])
+		"""Shows up to 20 characters of title on screen, 10 per line, or hides the title if it is empty"""
+		self._dp("Setting title to %s", title)
+		return self.set_title(title[:10], title[10:20], blink)
+
+	def set_title(self, line1="", line2="", blink=False, hpos=0x00, vpos=0x00):
+		"""Shows two lines of up to 10 characters on screen at the given position, or hides the
+		title if both are empty
+
+		Only what differs from what the camera is known to be showing is sent,
+		back to back, so updating one line costs one frame. Returns the handle
+		of the last frame sent (already finished if nothing needed sending).
+		"""
+		lines = [(list(bytes(line[:10], "ascii")) + 10 * [0x00])[:10] for line in (line1, line2)]
+		position = (hpos, vpos, 0x01 if blink else 0x00)
+		shown = self._titleshown
+		frames = []
+		with self._lock:
+			if (len(line1) == 0) and (len(line2) == 0):
+				if (shown["on"] != False):
+					frames.append(("title_clear",))
+					# some cameras blank the lines as well as hiding them
+					shown.update(on=False, lines=[None, None])
+			else:
+				if (shown["position"] != position):
+					frames.append(("title_position",) + position)
+					shown["position"] = position
+				for number, line in enumerate(lines):
+					if (shown["lines"][number] != line):
+						frames.append(("title_line" + str(number + 1),) + tuple(line))
+						shown["lines"][number] = line
+				if (shown["on"] != True):
+					frames.append(("title_on",))
+					shown["on"] = True
+			handles = [self._send(*frame) for frame in frames]
+		for handle in handles:
+			handle.add_done_callback(self._titlefailed)
+		if (len(handles) == 0):
+			handle = Command(b"")
+			handle.set_result(None)
+			return handle
+		return handles[-1]
+
+	def _titlefailed(self, handle):
+		"""Forgets what the title shows if a frame updating it didn't take, so it is all sent next time"""
+		if (not handle.wait(0)):
+			self._titleshown.update(position=None, lines=[None, None], on=None)
+
+	def clear_title(self):
+		"""Hides the title"""
+		return self.set_title("", "")
 
 	def command(self, command):
 		"""Send a custom command to the camera (do not include the camera address byte)"""
-		self._sendcommand(command)
-		
+		return self._change(self._sendcommand(command))
+
 	def home(self):
 		"""Return the camera to its home position"""
 		self._dp("Going home")
-		self._sendcommand(self.GOHOME)
+		return self._send("home")
 
 	def reset(self):
 		"""Reset the camera (as if powering off and on again)"""
 		self._dp("Resetting camera")
-		self._sendcommand(self.RESET)
+		return self._change(self._send("reset"))
 
 	def video_system(self, videosystem):
 		print("Setting video system to " + str(videosystem))
-		self._sendcommand([0x01, 0x06, 0x35, 0x00, videosystem, 0xFF])
+		return self._send("video_system", videosystem)
 
 	@property
 	def freeze(self):
@@ -465,10 +963,10 @@ class Camera:
 	def freeze(self, freeze=True):
 		if (freeze):
 			self._dp("Freezing image")
-			self._sendcommand(self.FREEZEON)
+			return self._send("freeze_on")
 		else:
 			self._dp("Unfreezing image")
-			self._sendcommand(self.FREEZEOFF)
+			return self._send("freeze_off")
 
 	@property
 	def preset_freeze(self):
@@ -477,358 +975,246 @@ class Camera:
 	@preset_freeze.setter
 	def preset_freeze(self, freeze=True):
 		if (freeze):
-			self._sendcommand(self.PRESETFREEZEON)
+			return self._send("preset_freeze_on")
 		else:
-			self._sendcommand(self.PRESETFREEZEOFF)    
+			return self._send("preset_freeze_off")
 
 	@property
 	def pan_reverse(self):
-		self._sendcommand(self.INQ_PANREVERSE)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x01]):
-			return True
-		elif (ret == [0x50, 0x00]):
-			return False
-		else:
-			return None
+		return self._query("pan_reverse")
 
 	@pan_reverse.setter
 	def pan_reverse(self, reverse=True):
 		if (reverse):
-			self._sendcommand([0x01, 0x7E, 0x01, 0x06, 0x00, 0x01, 0xFF])
+			return self._setting("pan_reverse", True, self._send("pan_reverse", 0x01))
 		else:
-			self._sendcommand([0x01, 0x7E, 0x01, 0x06, 0x00, 0x00, 0xFF])
+			return self._setting("pan_reverse", False, self._send("pan_reverse", 0x00))
 
 	@property
 	def tilt_reverse(self):
-		self._sendcommand(self.INQ_TILTREVERSE)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x01]):
-			return True
-		elif (ret == [0x50, 0x00]):
-			return False
-		else:
-			return None
+		return self._query("tilt_reverse")
 
 	@tilt_reverse.setter
 	def tilt_reverse(self, reverse=True):
 		if (reverse):
-			self._sendcommand([0x01, 0x7E, 0x01, 0x09, 0x00, 0x01, 0xFF])
+			return self._setting("tilt_reverse", True, self._send("tilt_reverse", 0x01))
 		else:
-			self._sendcommand([0x01, 0x7E, 0x01, 0x09, 0x00, 0x00, 0xFF])
+			return self._setting("tilt_reverse", False, self._send("tilt_reverse", 0x00))
 
 	@property
 	def power_on(self):
-		self._sendcommand(self.INQ_POWER)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x02]):
-			return True
-		elif (ret == [0x50, 0x03]):
-			return False
-		else:
-			return None
+		return self._query("power_on")
 
 	@power_on.setter
 	def power_on(self, on=True):
 		if (on):
 			self._dp("Powering camera on")
-			self._sendcommand(self.POWERON)
+			return self._setting("power_on", True, self._send("power_on"))
 		else:
 			self._dp("Powering camera off")
-			self._sendcommand(self.POWEROFF)
+			return self._setting("power_on", False, self._send("power_off"))
 
 	@property
 	def autofocus(self):
-		self._sendcommand(self.INQ_AUTOFOCUS)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x02]):
-			return True
-		elif (ret == [0x50, 0x03]):
-			return False
-		else:
-			return None        
+		return self._query("autofocus")
 
 	@autofocus.setter
 	def autofocus(self, af=True):
 		if (af):
 			self._dp("Autofocus on")
-			self._sendcommand(self.AFON)
+			return self._setting("autofocus", True, self._send("autofocus_on"))
 		else:
 			self._dp("Autofocus off")
-			self._sendcommand(self.AFOFF)
-			
+			return self._setting("autofocus", False, self._send("autofocus_off"))
+
 	@property
 	def image_flip(self):
-		self._sendcommand(self.INQ_IMAGEFLIP)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x02]):
-			return True
-		elif (ret == [0x50, 0x03]):
-			return False
-		else:
-			return None
-		
+		return self._query("image_flip")
+
 	@image_flip.setter
 	def image_flip(self, flip=True):
 		if (flip):
 			self._dp("Flipping image")
-			self._sendcommand(self.FLIPON)
+			return self._setting("image_flip", True, self._send("flip_on"))
 		else:
 			self._dp("Unflipping image")
-			self._sendcommand(self.FLIPOFF)
+			return self._setting("image_flip", False, self._send("flip_off"))
 
 	def image_reverse(self, reverse=True):
 		if (reverse):
 			self._dp("Reversing image")
-			self._sendcommand(self.REVERSEON)
+			return self._send("reverse_on")
 		else:
 			self._dp("Unreversing image")
-			self._sendcommand(self.REVERSEOFF)
+			return self._send("reverse_off")
 
 	@property
 	def preset(self):
-		self._sendcommand(self.INQ_PRESET)
-		ret = self._getresponse()
-		if (ret != None) and (len(ret) > 1):
-			return ret[1]
-		else:
-			return 0
+		return self._query("preset")
 
 	@preset.setter
 	def preset(self, slot):
-		self._sendcommand([0x01, 0x04, 0x3F, 0x02, slot, 0xFF])
+		return self.recall_preset(slot)
+
+	def recall_preset(self, slot):
+		"""Moves to a stored preset, returns the Command handle (which the preset property's setter can't)"""
+		return self._setting("preset", slot, self._send("preset_recall", slot))
 
 	def store_preset(self, slot):
-		self._sendcommand([0x01, 0x04, 0x3F, 0x01, slot, 0xFF])
-		
+		return self._send("preset_set", slot)
+
 	def clear_preset(self, slot):
-		self._sendcommand([0x01, 0x04, 0x3F, 0x00, slot, 0xFF])
+		return self._send("preset_reset", slot)
 
 	@property
 	def tally_on(self):
-		self._sendcommand(self.INQ_TALLY)
-		ret = self._getresponse()
-		if (ret == [0x50, 0x02]):
-			return True
-		elif (ret == [0x50, 0x03]):
-			return False
-		else:
-			return None
+		return self._query("tally_on")
 
 	@tally_on.setter
 	def tally_on(self, on=True):
 		if (on):
-			self._sendcommand(self.TALLYON)
+			return self._setting("tally_on", True, self._send("tally_on"))
 		else:
-			self._sendcommand(self.TALLYOFF)
+			return self._setting("tally_on", False, self._send("tally_off"))
 
 	def getVersionInfo(self):
-		version = {"vendor":None, "model":None, "rom":None, "sockets":0}
-		self._sendcommand(self.INQ_VERSION)
-		ret = self._getresponse()
-		if (ret != None):
-			if (len(ret) > 0):
-				if (ret[0] == 0x50):
-					version = {}
-					version["vendor"] = self._combinenibbles(ret[1:3])
-					version["model"] = self._combinenibbles(ret[3:5])
-					version["rom"] = self._combinenibbles(ret[5:7])
-					version["sockets"] = ret[7]
-		return version
+		return self._query("version")
 
 	def menu_show(self):
-		self._sendcommand(self.MENUON)
-		
+		return self._send("menu_on")
+
 	def menu_hide(self):
-		self._sendcommand(self.MENUOFF)
-		
+		return self._send("menu_off")
+
 	def menu_back(self):
-		self._sendcommand(self.MENUBACK)
-		
+		return self._send("menu_back")
+
 	def menu_ok(self):
-		self._sendcommand(self.MENUOK)
+		return self._change(self._send("menu_ok"))
 
 	@property
 	def widescreen(self):
-		self._sendcommand(self.INQ_WIDEMODE)
-		ret = self._getresponse()
-		if (ret == None):
-		   return None
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-			   if (ret[1] == 0x02):
-				   return True
-			   else:
-				   return False
-		return False
+		return self._query("widescreen")
 
 	@widescreen.setter
 	def widescreen(self, wide=True):
 		if (wide):
-			self._sendcommand(self.WIDEON)
+			return self._setting("widescreen", True, self._send("wide_on"))
 		else:
-			self._sendcommand(self.WIDEOFF)
+			return self._setting("widescreen", False, self._send("wide_off"))
 
 	@property
 	def shutter(self):
-		self._sendcommand(self.INQ_SHUTTER)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-		
+		return self._query("shutter")
+
 	@shutter.setter
 	def shutter(self, position):
-		self._sendcommand([0x01, 0x04, 0x4A, 0x00, 0x00] + self._splitnibbles(position, 2) + [0xFF])
+		return self._setting("shutter", position, self._send("shutter", position))
 
 	def reset_shutter(self):
-		self._sendcommand(self.SHUTTERRESET)
+		return self._change(self._send("shutter_reset"), "shutter")
 
 	def increase_shutter(self):
-		self._sendcommand(self.SHUTTERUP)
+		return self._change(self._send("shutter_up"), "shutter")
 
 	def decrease_shutter(self):
-		self._sendcommand(self.SHUTTERDOWN)
+		return self._change(self._send("shutter_down"), "shutter")
 
 	@property
 	def iris(self):
-		self._sendcommand(self.INQ_IRIS)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-		
+		return self._query("iris")
+
 	@iris.setter
 	def iris(self, position):
-		self._sendcommand([0x01, 0x04, 0x4B, 0x00, 0x00] + self._splitnibbles(position, 2) + [0xFF])
+		return self._setting("iris", position, self._send("iris", position))
 
 	def reset_iris(self):
-		self._sendcommand(self.IRISRESET)
+		return self._change(self._send("iris_reset"), "iris")
 
 	def increase_iris(self):
-		self._sendcommand(self.IRISUP)
+		return self._change(self._send("iris_up"), "iris")
 
 	def decrease_iris(self):
-		self._sendcommand(self.IRISDOWN)
+		return self._change(self._send("iris_down"), "iris")
 
 	@property
 	def gain(self):
-		self._sendcommand(self.INQ_GAIN)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-	
+		return self._query("gain")
+
 	@gain.setter
 	def gain(self, amount):
-		self._sendcommand([0x01, 0x04, 0x4B, 0x00, 0x00] + self._splitnibbles(amount, 2) + [0xFF])
+		return self._setting("gain", amount, self._send("gain", amount))
 
 	def reset_gain(self):
-		self._sendcommand(self.GAINRESET)
+		return self._change(self._send("gain_reset"), "gain")
 
 	def increase_gain(self):
-		self._sendcommand(self.GAINUP)
+		return self._change(self._send("gain_up"), "gain")
 
 	def decrease_gain(self):
-		self._sendcommand(self.GAINDOWN)
+		return self._change(self._send("gain_down"), "gain")
 
 	@property
 	def brightness(self):
-		self._sendcommand(self.INQ_BRIGHTNESS)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-	
+		return self._query("brightness")
+
 	@brightness.setter
 	def brightness(self, amount):
-		self._sendcommand([0x01, 0x04, 0x4D, 0x00, 0x00] + self._splitnibbles(amount, 2) + [0xFF])
+		return self._setting("brightness", amount, self._send("brightness", amount))
 
 	def reset_brightness(self):
-		self._sendcommand(self.BRIGHTNESSRESET)
+		return self._change(self._send("brightness_reset"), "brightness")
 
 	def increase_brightness(self):
-		self._sendcommand(self.BRIGHTNESSUP)
+		return self._change(self._send("brightness_up"), "brightness")
 
 	def decrease_brightness(self):
-		self._sendcommand(self.BRIGHTNESSDOWN)
+		return self._change(self._send("brightness_down"), "brightness")
 
 	@property
 	def exp(self):
-		self._sendcommand(self.INQ_EXP)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-	
+		return self._query("exp")
+
 	@exp.setter
 	def exp(self, amount):
-		self._sendcommand([0x01, 0x04, 0x4E, 0x00, 0x00] + self._splitnibbles(amount, 2) + [0xFF])
+		return self._setting("exp", amount, self._send("exp", amount))
 
 	def reset_exp(self):
-		self._sendcommand(self.EXPRESET)
+		return self._change(self._send("exp_reset"), "exp")
 
 	def increase_exp(self):
-		self._sendcommand(self.EXPUP)
+		return self._change(self._send("exp_up"), "exp")
 
 	def decrease_exp(self):
-		self._sendcommand(self.EXPDOWN)
+		return self._change(self._send("exp_down"), "exp")
 
 	@property
 	def aperture(self):
-		self._sendcommand(self.INQ_APERTURE)
-		ret = self._getresponse()
-		if (ret == None):
-			return 0
-		if (len(ret) > 0):
-			if (ret[0] == 0x50):
-				return self._combinenibbles(ret[3:5])
-		return 0
-	
+		return self._query("aperture")
+
 	@aperture.setter
 	def aperture(self, amount):
-		self._sendcommand([0x01, 0x04, 0x42, 0x00, 0x00] + self._splitnibbles(amount, 2) + [0xFF])
+		return self._setting("aperture", amount, self._send("aperture", amount))
 
 	def reset_aperture(self):
-		self._sendcommand(self.APERTURERESET)
+		return self._change(self._send("aperture_reset"), "aperture")
 
 	def increase_aperture(self):
-		self._sendcommand(self.APERTUREUP)
+		return self._change(self._send("aperture_up"), "aperture")
 
 	def decrease_aperture(self):
-		self._sendcommand(self.APERTUREDOWN)
+		return self._change(self._send("aperture_down"), "aperture")
 
 	@property
 	def backlight(self):
-		self._sendcommand(self.INQ_BACKLIGHT)
-		ret = self._getresponse()
-		if (ret != None):
-			if (len(ret) > 0):
-				if (ret == [0x50, 0x02]):
-					return True
-		return False
+		return self._query("backlight")
 
 	@backlight.setter
 	def backlight(self, value):
 		if (value):
-			self._sendcommand(self.BACKLIGHTON)
+			return self._setting("backlight", True, self._send("backlight_on"))
 		else:
-			self._sendcommand(self.BACKLIGHTOFF)
+			return self._setting("backlight", False, self._send("backlight_off"))
 
 #end class VISCA
 
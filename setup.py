@@ -15,4 +15,7 @@ setup(name='pyvisca',
 	  install_requires=[
 		  'pyserial'
 	  ],
+	  extras_require={
+		  'numpy': ['numpy']
+	  },
 	  zip_safe=False)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import random
+import pytest
+from pyvisca.parser import FrameParser
+
+SEEDS = range(50)
+
+def _frame(rng):
+	"""A valid reply frame without its terminator: a 0x90-0xF0 header and 1 to 14 payload bytes"""
+	header = (rng.randint(1, 7) + 8) << 4
+	return bytes([header] + [rng.randint(0x00, 0xFE) for i in range(rng.randint(1, 14))])
+
+def _garbage(rng):
+	"""Bytes that can't start a frame"""
+	return bytes(rng.randint(0x00, 0x7F) for i in range(rng.randint(1, 8)))
+
+def _chunks(rng, data):
+	"""Splits data at random points, including into empty and single-byte reads"""
+	chunks = []
+	start = 0
+	while (start < len(data)):
+		end = start + rng.choice([0, 1, 1, 2, 3, 5, 8, 13, 40])
+		chunks.append(data[start:end])
+		start = end
+	return chunks
+
+def _feed(parser, chunks):
+	frames = []
+	for chunk in chunks:
+		frames += parser.feed(chunk)
+	return frames
+
+def test_whole_frames():
+	parser = FrameParser()
+	assert parser.feed(b"\x90\x41\xff\x90\x51\xff") == [b"\x90\x41", b"\x90\x51"]
+	assert parser.stats() == {"frames": 2, "errors": 0, "discarded": 0}
+
+def test_frame_split_across_reads():
+	parser = FrameParser()
+	assert parser.feed(b"\x90\x50\x00") == []
+	assert parser.feed(b"\x01") == []
+	assert parser.feed(b"\x02\xff\x90") == [b"\x90\x50\x00\x01\x02"]
+	assert parser.feed(b"\x41\xff") == [b"\x90\x41"]
+	assert parser.errors == 0
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_chunking(seed):
+	rng = random.Random(seed)
+	frames = [_frame(rng) for i in range(200)]
+	parser = FrameParser()
+	assert _feed(parser, _chunks(rng, b"".join(frame + b"\xff" for frame in frames))) == frames
+	assert parser.stats() == {"frames": len(frames), "errors": 0, "discarded": 0}
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_interleaved_garbage(seed):
+	rng = random.Random(seed)
+	frames = []
+	data = b""
+	runs = 0
+	discarded = 0
+	for i in range(200):
+		if (rng.random() < 0.3):
+			garbage = _garbage(rng)
+			data += garbage
+			runs += 1
+			discarded += len(garbage)
+		frame = _frame(rng)
+		frames.append(frame)
+		data += frame + b"\xff"
+	parser = FrameParser()
+	assert parser.feed(data) == frames
+	assert parser.stats() == {"frames": len(frames), "errors": runs, "discarded": discarded}
+	# chunked, a run split across reads may count once per read, but the bytes are the same
+	parser = FrameParser()
+	assert _feed(parser, _chunks(rng, data)) == frames
+	assert parser.discarded == discarded
+	assert parser.errors >= runs
+
+def test_resync_on_next_header():
+	parser = FrameParser()
+	assert parser.feed(b"\x00\x41\x7f\x90\x50\x02\xff") == [b"\x90\x50\x02"]
+	assert parser.stats() == {"frames": 1, "errors": 1, "discarded": 3}
+
+def test_garbage_up_to_terminator():
+	parser = FrameParser()
+	assert parser.feed(b"\x01\x02\xff\x90\x41\xff") == [b"\x90\x41"]
+	assert parser.stats() == {"frames": 1, "errors": 1, "discarded": 3}
+
+@pytest.mark.parametrize("data, discarded", [(b"\xff", 1), (b"\x90\xff", 2), (b"\x01\xff", 2)])
+def test_runts(data, discarded):
+	parser = FrameParser()
+	assert parser.feed(data + b"\x90\x51\xff") == [b"\x90\x51"]
+	assert parser.stats() == {"frames": 1, "errors": 1, "discarded": discarded}
+
+def test_overlong_frame():
+	parser = FrameParser()
+	overlong = b"\x90" + bytes(range(0x10, 0x10 + 40)) + b"\xff"
+	assert parser.feed(overlong + b"\x90\x41\xff") == [b"\x90\x41"]
+	assert parser.stats() == {"frames": 1, "errors": 1, "discarded": len(overlong)}
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_overlong_frame_chunked(seed):
+	rng = random.Random(seed)
+	overlong = b"\x90" + bytes(rng.randint(0x00, 0xFE) for i in range(rng.randint(FrameParser.MAX_FRAME, 100))) + b"\xff"
+	frame = _frame(rng)
+	parser = FrameParser()
+	assert _feed(parser, _chunks(rng, overlong + frame + b"\xff")) == [frame]
+	assert parser.stats() == {"frames": 1, "errors": 1, "discarded": len(overlong)}
+
+def test_longest_frame():
+	parser = FrameParser()
+	longest = b"\x90" + bytes(FrameParser.MAX_FRAME - 2)
+	assert parser.feed(longest + b"\xff") == [longest]
+	assert parser.errors == 0
+
+def test_reset_drops_partial_frame():
+	parser = FrameParser()
+	assert parser.feed(b"\x90\x50\x01") == []
+	parser.reset()
+	assert parser.feed(b"\x90\x41\xff") == [b"\x90\x41"]
+	assert parser.errors == 0